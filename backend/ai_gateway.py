@@ -0,0 +1,243 @@
+import json
+import time
+import heapq
+import random
+import asyncio
+import hashlib
+import logging
+import itertools
+from openrouter_client import OpenRouterError
+
+# Lower numbers are served first when the upstream is saturated
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+class PriorityLimiter:
+    """At most ``max_concurrent`` holders overall and ``per_session`` per session.
+
+    Waiters are served by (priority, arrival); a waiter whose session is at its
+    own limit is skipped so it cannot hold up other sessions.
+    """
+
+    def __init__(self, max_concurrent=4, per_session=2):
+        self.max_concurrent = max_concurrent
+        self.per_session = per_session
+        self.active = 0
+        self._sessions = {}
+        self._waiters = []
+        self._order = itertools.count()
+
+    def _eligible(self, session):
+        return self.active < self.max_concurrent and self._sessions.get(session, 0) < self.per_session
+
+    def _take(self, session):
+        self.active += 1
+        self._sessions[session] = self._sessions.get(session, 0) + 1
+
+    async def acquire(self, session=None, priority=PRIORITY_NORMAL):
+        if self._eligible(session) and not self._waiters:
+            self._take(session)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), session, future))
+        # The queued waiters may all be held back by their own session's limit
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: hand the slot on
+                self.release(session)
+            else:
+                self._waiters = [w for w in self._waiters if w[3] is not future]
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self, session=None):
+        self.active -= 1
+        count = self._sessions.get(session, 0) - 1
+        if count > 0:
+            self._sessions[session] = count
+        else:
+            self._sessions.pop(session, None)
+        self._wake()
+
+    def _wake(self):
+        skipped = []
+        while self._waiters and self.active < self.max_concurrent:
+            waiter = heapq.heappop(self._waiters)
+            _, _, session, future = waiter
+            if future.done():
+                continue
+            if not self._eligible(session):
+                skipped.append(waiter)
+                continue
+            self._take(session)
+            future.set_result(None)
+        for waiter in skipped:
+            heapq.heappush(self._waiters, waiter)
+
+    def waiting(self):
+        return sum(1 for w in self._waiters if not w[3].done())
+
+class CircuitBreaker:
+    """Fails fast after ``threshold`` consecutive upstream failures.
+
+    After ``cooldown`` seconds one trial call is let through; its success
+    closes the breaker and its failure opens it again. A trial that ends
+    either way (e.g. cancelled) hands the trial on via ``release``.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def check(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial):
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            raise OpenRouterError("AI service temporarily unavailable (circuit open)", 503, max(remaining, 1.0))
+        if state == "half-open":
+            self._trial = True
+            return True
+        return False
+
+    def release(self, trial):
+        """End a call; ``trial`` is what ``check`` returned for it."""
+        if trial:
+            self._trial = False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+class AIGateway:
+    """Front door for model calls: coalescing, limits, retries and a circuit breaker.
+
+    Identical requests in flight at the same time share one upstream call.
+    Calls take a slot from a priority limiter; rate limits, server errors and
+    network errors are retried with exponential backoff that honours
+    Retry-After; repeated failures open the circuit breaker.
+    """
+
+    def __init__(self, chat, stream_chat=None, max_concurrent=4, per_session=2, max_retries=3,
+                 base_delay=1.0, max_delay=30.0, breaker_threshold=5, breaker_cooldown=30.0):
+        self._chat = chat
+        self._stream_chat = stream_chat
+        self.limiter = PriorityLimiter(max_concurrent, per_session)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.logger = logging.getLogger(__name__)
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    async def chat(self, messages, *, session=None, priority=PRIORITY_NORMAL, **kwargs):
+        key = hashlib.sha256(json.dumps([messages, kwargs], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._call(messages, session, priority, kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key, None) if self._inflight.get(key) is done else None)
+        # One requester going away must not cancel the call the others wait on
+        return await asyncio.shield(task)
+
+    async def _call(self, messages, session, priority, kwargs):
+        attempt = 0
+        while True:
+            trial = self.breaker.check()
+            try:
+                await self.limiter.acquire(session, priority)
+                try:
+                    self.calls += 1
+                    result = await self._chat(messages, **kwargs)
+                except OpenRouterError as e:
+                    error = e
+                else:
+                    self.breaker.success()
+                    return result
+                finally:
+                    self.limiter.release(session)
+                if not error.retryable:
+                    # The upstream answered; the request itself was at fault
+                    self.breaker.success()
+                    raise error
+                self.breaker.failure()
+            finally:
+                self.breaker.release(trial)
+            if attempt >= self.max_retries:
+                raise error
+            await asyncio.sleep(self._delay(attempt, error))
+            attempt += 1
+            self.retries += 1
+
+    async def stream(self, messages, *, session=None, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Relay ``stream_chat`` under the same limits; retried only before the first token."""
+        attempt = 0
+        while True:
+            trial = self.breaker.check()
+            try:
+                await self.limiter.acquire(session, priority)
+                started = False
+                try:
+                    self.calls += 1
+                    async for delta in self._stream_chat(messages, **kwargs):
+                        started = True
+                        yield delta
+                    self.breaker.success()
+                    return
+                except OpenRouterError as e:
+                    if not e.retryable:
+                        self.breaker.success()
+                        raise
+                    self.breaker.failure()
+                    if started or attempt >= self.max_retries:
+                        raise
+                    error = e
+                finally:
+                    self.limiter.release(session)
+            finally:
+                # Also reached when the client goes away mid-stream
+                self.breaker.release(trial)
+            await asyncio.sleep(self._delay(attempt, error))
+            attempt += 1
+            self.retries += 1
+
+    def _delay(self, attempt, error):
+        if error.retry_after is not None:
+            return min(error.retry_after, self.max_delay)
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "in_flight": len(self._inflight),
+            "active": self.limiter.active,
+            "waiting": self.limiter.waiting(),
+            "breaker_open": int(self.breaker.state != "closed"),
+        }
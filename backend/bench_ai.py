@@ -0,0 +1,122 @@
+"""Load benchmark for the AI endpoints.
+
+Drives /api/ai/chat (or /api/ai/chat/stream) and /api/ai/concept-map on a
+running backend at a fixed concurrency and reports latency percentiles,
+throughput and errors. Run the backend against mock_openrouter.py to
+measure offline:
+
+    python mock_openrouter.py --latency lognormal:0.5 &
+    OPENROUTER_BASE_URL=http://127.0.0.1:8100/api/v1 OPENROUTER_API_KEY=mock python main.py &
+    python bench_ai.py --endpoint chat --requests 200 --concurrency 16 --stream
+
+--unique sets the share of requests with distinct payloads; the rest repeat
+a small pool, which exercises coalescing and the concept map cache.
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import httpx
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(name, latencies, first_tokens, errors, elapsed):
+    total = len(latencies) + sum(errors.values())
+    result = {
+        "endpoint": name,
+        "requests": total,
+        "ok": len(latencies),
+        "errors": dict(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    for label, values in (("latency_ms", latencies), ("first_token_ms", first_tokens)):
+        if values:
+            result[label] = {f"p{p}": round(percentile(values, p) * 1000, 1) for p in (50, 95, 99)}
+            result[label]["max"] = round(max(values) * 1000, 1)
+    return result
+
+def make_payload(endpoint, i, unique, rng):
+    # Repeated payloads come from a pool of eight so some requests hit caches
+    n = i if rng.random() < unique else rng.randrange(8)
+    if endpoint == "chat":
+        return {"messages": [{"role": "user", "content": f"Suggest a title for chapter {n} of my novel."}],
+                "session_id": f"bench-{i % 32}"}
+    text = " ".join(f"Paragraph {n}-{k} about lighthouses, storms and the keeper's daughter." for k in range(6))
+    return {"text": text, "session_id": f"bench-{i % 32}"}
+
+async def _request(client, endpoint, payload, stream):
+    if endpoint == "chat" and stream:
+        first = None
+        started = time.perf_counter()
+        async with client.stream("POST", "/api/ai/chat/stream", json=payload) as response:
+            response.raise_for_status()
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    if first is None:
+                        first = time.perf_counter() - started
+                    if event == "error":
+                        raise RuntimeError(json.loads(line[5:]).get("detail") or "stream error")
+        return first
+    path = "/api/ai/chat" if endpoint == "chat" else "/api/ai/concept-map"
+    response = await client.post(path, json=payload)
+    response.raise_for_status()
+    return None
+
+async def run(base_url, endpoint, requests, concurrency, unique=1.0, stream=False, timeout=120.0, seed=None):
+    rng = random.Random(seed)
+    payloads = [make_payload(endpoint, i, unique, rng) for i in range(requests)]
+    latencies, first_tokens, errors = [], [], {}
+    queue = iter(payloads)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker():
+            for payload in queue:
+                started = time.perf_counter()
+                try:
+                    first = await _request(client, endpoint, payload, stream)
+                except httpx.HTTPStatusError as e:
+                    key = str(e.response.status_code)
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+                except (httpx.HTTPError, RuntimeError) as e:
+                    key = type(e).__name__
+                    errors[key] = errors.get(key, 0) + 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if first is not None:
+                    first_tokens.append(first)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    name = "chat/stream" if endpoint == "chat" and stream else endpoint
+    return summarize(name, latencies, first_tokens, errors, elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AI endpoints")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", choices=("chat", "concept-map", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--unique", type=float, default=1.0, help="share of requests with distinct payloads")
+    parser.add_argument("--stream", action="store_true", help="use /api/ai/chat/stream and report time to first token")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    endpoints = ("chat", "concept-map") if args.endpoint == "both" else (args.endpoint,)
+    for endpoint in endpoints:
+        report = asyncio.run(run(args.url, endpoint, args.requests, args.concurrency,
+                                 args.unique, args.stream, args.timeout, args.seed))
+        print(json.dumps(report, indent=2))
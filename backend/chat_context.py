@@ -0,0 +1,124 @@
+import json
+import hashlib
+import logging
+from lru_cache import LRUCache
+from openrouter_client import SYSTEM_PROMPT, OpenRouterError
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a writer and their assistant. "
+    "Merge the previous summary with the new turns into one concise summary (at most ~200 words) that keeps "
+    "names, plot points, decisions, open questions and the user's preferences. Reply with the summary only."
+)
+# Per-message framing the API adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token for English prose."""
+    return (len(text) + 3) // 4
+
+def message_tokens(message):
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+class ChatContext:
+    """Fits a chat history into a token budget.
+
+    The system prompt and the newest turns are sent as they are; turns that
+    no longer fit are folded into a running summary sent in their place.
+    Summaries are cached by a hash chain over the dropped prefix, so each new
+    turn only summarizes the messages that fell out since the last one.
+    ``summarize`` is an async callable taking chat messages and returning text.
+    """
+
+    def __init__(self, summarize, budget_tokens=6000, summary_tokens=400, cache_entries=256):
+        self.summarize = summarize
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.logger = logging.getLogger(__name__)
+        self._summaries = LRUCache(max_bytes=8 * 1024 * 1024, max_entries=cache_entries)
+
+    async def prepare(self, messages):
+        """Return (messages to send, stats) for a client-supplied history."""
+        system = [m for m in messages if m.get("role") == "system"]
+        turns = [m for m in messages if m.get("role") != "system"]
+        if not system:
+            system = [{"role": "system", "content": SYSTEM_PROMPT}]
+        system_tokens = sum(message_tokens(m) for m in system)
+
+        # Newest turns first until the budget (less room for a summary) runs out;
+        # the latest turn is always sent
+        available = self.budget_tokens - system_tokens
+        kept = []
+        used = 0
+        for message in reversed(turns):
+            cost = message_tokens(message)
+            if kept and used + cost > available - self.summary_tokens:
+                break
+            kept.append(message)
+            used += cost
+        kept.reverse()
+        dropped = turns[:len(turns) - len(kept)]
+
+        stats = {
+            "messages_in": len(messages),
+            "dropped": len(dropped),
+            "budget_tokens": self.budget_tokens,
+            "summary_cached": False,
+            "summary_failed": False,
+        }
+        prepared = list(system)
+        if dropped:
+            summary, cached = await self._summary(dropped, stats)
+            if summary:
+                prepared.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+                stats["summary_cached"] = cached
+        prepared.extend(kept)
+        stats["messages_sent"] = len(prepared)
+        stats["estimated_tokens"] = sum(message_tokens(m) for m in prepared)
+        return prepared, stats
+
+    async def _summary(self, dropped, stats):
+        chain = _prefix_hashes(dropped)
+        summary = self._summaries.get(chain[-1])
+        if summary is not None:
+            return summary, True
+        # Start from the longest prefix summarized before and add only the rest
+        start, previous = 0, ""
+        for i in range(len(chain) - 2, -1, -1):
+            found = self._summaries.get(chain[i])
+            if found is not None:
+                start, previous = i + 1, found
+                break
+        try:
+            # Up to a budget's worth of characters of new turns go to the summarizer
+            summary = await self.summarize(summary_messages(previous, dropped[start:], self.budget_tokens * 4))
+        except OpenRouterError as e:
+            self.logger.warning("chat summary failed dropped=%d error=%s", len(dropped), e)
+            stats["summary_failed"] = True
+            return previous, False
+        summary = summary.strip()
+        self._summaries.put(chain[-1], summary, len(summary))
+        return summary, False
+
+def summary_messages(previous, turns, limit):
+    """Messages asking the model to fold ``turns`` into ``previous``."""
+    lines = []
+    size = 0
+    for message in reversed(turns):
+        line = f"{message.get('role', 'user')}: {message.get('content') or ''}"
+        if size + len(line) > limit:
+            line = line[:max(0, limit - size)]
+        lines.append(line)
+        size += len(line)
+        if size >= limit:
+            break
+    lines.reverse()
+    body = f"Previous summary:\n{previous or '(none)'}\n\nNew turns:\n" + "\n\n".join(lines)
+    return [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": body}]
+
+def _prefix_hashes(messages):
+    hashes = []
+    h = ""
+    for message in messages:
+        h = hashlib.sha256((h + json.dumps([message.get("role"), message.get("content")])).encode("utf-8")).hexdigest()
+        hashes.append(h)
+    return hashes
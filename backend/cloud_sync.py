@@ -1,4 +1,5 @@
 import os
+import logging
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
@@ -6,6 +7,8 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import pickle
 
+logger = logging.getLogger(__name__)
+
 class CloudSync:
     def __init__(self):
         self.synced = False
@@ -50,7 +53,7 @@ class CloudSync:
             ).execute()
             return file.get('id')
         except Exception as e:
-            print(f"Error uploading file: {str(e)}")
+            logger.error("drive upload failed path=%s error=%s", file_path, e)
             return False
 
     def toggle_sync(self, value):
@@ -0,0 +1,134 @@
+"""Negotiated response compression (br when the brotli package is installed, else gzip).
+
+Streamed bodies are compressed chunk by chunk with a sync flush after each,
+so progressive responses still reach the client as they are produced.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level):
+        # wbits=31 writes a gzip header/trailer
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._z.compress(data) + self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self, data=b""):
+        return self._c.process(data) + self._c.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                # First body message: decide whether this response gets compressed
+                state["start"] = None
+                headers = start.get("headers", [])
+                whole_and_small = not more_body and len(body) < self.minimum_size
+                if whole_and_small or not self._compressible(start["status"], headers):
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+                state["compressor"] = compressor
+                headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": headers})
+
+            compressor = state["compressor"]
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+    def _negotiate(self, scope):
+        accepted = {}
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                for part in value.decode("latin-1").split(","):
+                    name, _, params = part.strip().partition(";")
+                    q = 1.0
+                    if params.strip().startswith("q="):
+                        try:
+                            q = float(params.strip()[2:])
+                        except ValueError:
+                            q = 0.0
+                    accepted[name.strip().lower()] = q
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def _compressible(status, headers):
+        if status < 200 or status in (204, 304):
+            return False
+        content_type = b""
+        for key, value in headers:
+            key = key.lower()
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value.lower()
+        # Server-sent events are left alone so proxies never hold them back
+        if content_type.startswith(b"text/event-stream"):
+            return False
+        return any(content_type.startswith(t.encode()) for t in COMPRESSIBLE_TYPES)
@@ -0,0 +1,499 @@
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from lru_cache import LRUCache
+from metrics import SQLITE_QUERY_SECONDS
+
+CONCEPT_MAP_SYSTEM = """You are an expert at analyzing text and extracting key concepts and their relationships for a concept map or outline.
+Your ONLY job is to return valid JSON and nothing else (no markdown, no explanation).
+Output format:
+{
+  "nodes": [
+    { "title": "short concept label (max ~60 chars)", "type": "character" | "theme" | "idea" | "place" | "default" }
+  ],
+  "links": [
+    { "sourceIndex": 0, "targetIndex": 1, "type": "causes" | "supports" | "conflicts" | "relates-to" | "contrasts" | "extends", "label": "optional short label" }
+  ]
+}
+Rules: Use 0-based indices for sourceIndex/targetIndex (they refer to the nodes array). Extract 4–20 key concepts. Create 3–15 links where relationships are clear. Node types: use "character" for people/names, "place" for locations, "theme" for recurring ideas, "idea" for abstract concepts, "default" otherwise. Link types: causes, supports, conflicts, relates-to, contrasts, extends."""
+
+CONCEPT_MAP_USER = "Analyze this text and output ONLY the JSON concept map (no other text):\n\n{text}"
+
+# Any change to the prompts yields a new version, so cached maps from the old prompt are not served
+PROMPT_VERSION = hashlib.sha256((CONCEPT_MAP_SYSTEM + CONCEPT_MAP_USER).encode("utf-8")).hexdigest()[:12]
+
+MAX_TEXT_CHARS = 12000
+# A merged whole-manuscript map keeps the concepts that recur across the most chunks
+MAX_MERGED_NODES = 60
+MAX_MERGED_LINKS = 90
+NODE_TYPES = ("character", "theme", "idea", "place", "default")
+LINK_TYPES = ("causes", "supports", "conflicts", "relates-to", "contrasts", "extends")
+
+def normalize_text(text, limit=MAX_TEXT_CHARS):
+    """The text as sent to the model: NFC, whitespace runs collapsed, truncated to ``limit``."""
+    text = " ".join(unicodedata.normalize("NFC", text or "").split())
+    return text if limit is None else text[:limit]
+
+def cache_key(text, model, temperature, mode="single"):
+    h = hashlib.sha256()
+    h.update(json.dumps([PROMPT_VERSION, model, temperature, mode]).encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+async def build_concept_map(text, chat, model, temperature=0.3):
+    """Ask the model for a concept map of ``text`` (already normalized) and validate it.
+
+    Raises ValueError when the reply holds no usable JSON; errors from ``chat`` propagate.
+    """
+    messages = [
+        {"role": "system", "content": CONCEPT_MAP_SYSTEM},
+        {"role": "user", "content": CONCEPT_MAP_USER.format(text=text)},
+    ]
+    reply = await chat(messages, model=model, temperature=temperature, max_tokens=2000)
+    return parse_concept_map(reply)
+
+def parse_concept_map(reply):
+    extractor = ConceptMapExtractor()
+    extractor.feed(reply)
+    return extractor.close()
+
+async def iter_concept_map(text, stream_chat, model, temperature=0.3):
+    """Like build_concept_map, but streams the reply and yields (graph, complete)
+    each time a node or link arrives; the last item is the validated map.
+    """
+    messages = [
+        {"role": "system", "content": CONCEPT_MAP_SYSTEM},
+        {"role": "user", "content": CONCEPT_MAP_USER.format(text=text)},
+    ]
+    extractor = ConceptMapExtractor()
+    tokens = stream_chat(messages, model=model, temperature=temperature, max_tokens=2000)
+    try:
+        async for delta in tokens:
+            if extractor.feed(delta):
+                yield extractor.graph(), False
+    finally:
+        await tokens.aclose()
+    yield extractor.close(), True
+
+# Outside a string only brackets and quotes matter; inside one only quotes and escapes
+_STRUCTURE = re.compile(r'[{}\[\]"]')
+_STRING_END = re.compile(r'["\\]')
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}]')
+
+class ConceptMapExtractor:
+    """Finds the concept map object in a model reply as it arrives, in one pass.
+
+    ``feed`` scans only the new text, tracking strings and bracket depth, and
+    decodes each element of the "nodes" and "links" arrays with ``raw_decode``
+    as soon as its closing brace arrives. Text around the object (prose,
+    markdown fences) is skipped. ``graph`` returns the nodes and links
+    validated so far; ``close`` returns the final map, marked "partial" when
+    the reply ended before the object closed.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = ""
+        self._pos = 0
+        self._reset()
+        self.result = None
+        # First JSON object without nodes or links, used if nothing better turns up
+        self._other = None
+
+    def _reset(self):
+        self._depth = 0
+        self._in_string = False
+        self._start = None
+        self._string_start = None
+        self._key = None
+        self._section = None
+        self._item_start = None
+        self.nodes = []
+        self._links = []
+
+    def feed(self, chunk):
+        """Add reply text; True when new nodes or links were extracted."""
+        if self.result is not None or not chunk:
+            return False
+        self._text += chunk
+        before = (len(self.nodes), len(self._links))
+        self._scan()
+        return (len(self.nodes), len(self._links)) != before
+
+    def _scan(self):
+        text = self._text
+        pos = self._pos
+        while self.result is None:
+            if self._in_string:
+                match = _STRING_END.search(text, pos)
+                if match is None:
+                    pos = len(text)
+                    break
+                i = match.start()
+                if text[i] == "\\":
+                    if i + 1 >= len(text):
+                        # The escaped character has not arrived yet
+                        pos = i
+                        break
+                    pos = i + 2
+                    continue
+                self._in_string = False
+                if self._depth == 1:
+                    self._key = text[self._string_start:i + 1]
+                pos = i + 1
+                continue
+            if self._depth == 0:
+                i = text.find("{", pos)
+                if i == -1:
+                    pos = len(text)
+                    break
+                self._start = i
+                self._depth = 1
+                pos = i + 1
+                continue
+            match = _STRUCTURE.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            i = match.start()
+            char = text[i]
+            pos = i + 1
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and char == "[":
+                    self._section = _section(self._key)
+                elif self._depth == 3 and char == "{" and self._section:
+                    self._item_start = i
+            else:
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None:
+                    self._item(text[self._item_start:i + 1])
+                    self._item_start = None
+                elif self._depth == 1:
+                    self._section = None
+                elif self._depth == 0:
+                    pos = self._finish_object(i)
+        self._pos = pos
+
+    def _decode(self, raw):
+        # Decode a slice rather than at an offset into the whole reply: building
+        # a JSONDecodeError counts lines up to the offset
+        try:
+            return self._decoder.raw_decode(raw)[0]
+        except ValueError:
+            return None
+
+    def _item(self, raw):
+        item = self._decode(raw)
+        if item is None:
+            return
+        if self._section == "nodes":
+            self.nodes.append(_valid_node(item))
+        elif isinstance(item, dict):
+            self._links.append(item)
+
+    def _finish_object(self, end):
+        out = self._decode(self._text[self._start:end + 1])
+        if isinstance(out, dict) and ("nodes" in out or "links" in out):
+            self.result = out
+            return end + 1
+        if isinstance(out, dict) and self._other is None:
+            self._other = out
+        # Not the concept map (e.g. braces in prose); keep looking after it
+        self._reset()
+        return end + 1
+
+    @property
+    def complete(self):
+        """Whether the concept map object has closed."""
+        return self.result is not None
+
+    def graph(self):
+        n = len(self.nodes)
+        links = []
+        for item in self._links:
+            link = _valid_link(item, n)
+            if link is not None:
+                links.append(link)
+        return {"nodes": list(self.nodes), "links": links}
+
+    def close(self):
+        """The validated map. Raises ValueError when the reply holds none."""
+        if self.complete:
+            return validate_concept_map(self.result.get("nodes"), self.result.get("links"))
+        if self.nodes:
+            # Truncated reply: keep what arrived complete, but callers must not cache it
+            return {**self.graph(), "partial": True}
+        if self._start is not None:
+            # An unbalanced brace in prose swallowed the object: take the first
+            # closed object that holds nodes or links
+            opened = []
+            for match in _TOKEN.finditer(self._text, self._start + 1):
+                if match.group() == "{":
+                    opened.append(match.start())
+                elif match.group() == "}" and opened:
+                    out = self._decode(self._text[opened.pop():match.end()])
+                    if isinstance(out, dict) and ("nodes" in out or "links" in out):
+                        return validate_concept_map(out.get("nodes"), out.get("links"))
+        if self._other is not None:
+            return validate_concept_map(self._other.get("nodes"), self._other.get("links"))
+        raise ValueError("AI did not return valid JSON for concept map")
+
+def _section(key):
+    try:
+        key = json.loads(key) if key else None
+    except ValueError:
+        return None
+    return key if key in ("nodes", "links") else None
+
+def _valid_node(item):
+    if not isinstance(item, dict):
+        return {"title": "Concept", "type": "default"}
+    title = (item.get("title") or "").strip()[:80] or "Concept"
+    t = (item.get("type") or "default").lower()
+    if t not in NODE_TYPES:
+        t = "default"
+    return {"title": title, "type": t}
+
+def _valid_link(item, n):
+    if not isinstance(item, dict):
+        return None
+    si = item.get("sourceIndex", -1)
+    ti = item.get("targetIndex", -1)
+    if not isinstance(si, int) or not isinstance(ti, int) or si == ti:
+        return None
+    if not (0 <= si < n and 0 <= ti < n):
+        return None
+    link_type = (item.get("type") or "relates-to").lower()
+    if link_type not in LINK_TYPES:
+        link_type = "relates-to"
+    return {
+        "sourceIndex": si,
+        "targetIndex": ti,
+        "type": link_type,
+        "label": (item.get("label") or "").strip()[:40] or None,
+    }
+
+def validate_concept_map(nodes, links):
+    if not isinstance(nodes, list):
+        nodes = []
+    if not isinstance(links, list):
+        links = []
+    valid_nodes = [_valid_node(item) for item in nodes]
+    n = len(valid_nodes)
+    valid_links = [link for link in (_valid_link(item, n) for item in links) if link is not None]
+    return {"nodes": valid_nodes, "links": valid_links}
+
+_HEADING = re.compile(r"^\s*(?:#{1,6}\s|(?:chapter|part|book|prologue|epilogue)\b)", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def split_chunks(text, max_chars=MAX_TEXT_CHARS):
+    """Split ``text`` into normalized chunks of at most ``max_chars`` on paragraph boundaries.
+
+    A chapter heading starts a new chunk once the current one is half full;
+    paragraphs longer than a chunk are split between sentences.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        heading = bool(_HEADING.match(paragraph))
+        paragraph = normalize_text(paragraph, None)
+        if not paragraph:
+            continue
+        for piece in _pieces(paragraph, max_chars):
+            if current and (size + len(piece) + 1 > max_chars or (heading and size >= max_chars // 2)):
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+            heading = False
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def _pieces(paragraph, max_chars):
+    if len(paragraph) <= max_chars:
+        return [paragraph]
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _title_key(title):
+    # "The Ring", "ring" and "Ring!" are one concept
+    key = re.sub(r"[^\w\s]", "", title.casefold())
+    key = re.sub(r"^(?:the|a|an)\s+", "", key.strip())
+    return " ".join(key.split())
+
+def merge_concept_maps(maps):
+    """Merge per-chunk maps into one graph, deduplicating nodes by normalized title.
+
+    The result is "partial" when any of the maps is.
+    """
+    merged = {}  # title key -> {"title", "type", "count", "order"}
+    links = {}   # (source key, target key, type) -> {"label", "count"}
+    for graph in maps:
+        keys = []
+        for node in graph["nodes"]:
+            key = _title_key(node["title"]) or node["title"]
+            keys.append(key)
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {"title": node["title"], "type": node["type"], "count": 1, "order": len(merged)}
+            else:
+                entry["count"] += 1
+                if entry["type"] == "default":
+                    entry["type"] = node["type"]
+        for link in graph["links"]:
+            source, target = keys[link["sourceIndex"]], keys[link["targetIndex"]]
+            if source == target:
+                continue
+            entry = links.setdefault((source, target, link["type"]), {"label": link["label"], "count": 0})
+            entry["count"] += 1
+            entry["label"] = entry["label"] or link["label"]
+
+    kept = sorted(merged.items(), key=lambda item: (-item[1]["count"], item[1]["order"]))[:MAX_MERGED_NODES]
+    kept.sort(key=lambda item: item[1]["order"])
+    index = {key: i for i, (key, _) in enumerate(kept)}
+    nodes = [{"title": entry["title"], "type": entry["type"]} for _, entry in kept]
+    ranked = sorted(
+        ((source, target, link_type, entry) for (source, target, link_type), entry in links.items()
+         if source in index and target in index),
+        key=lambda item: -item[3]["count"],
+    )[:MAX_MERGED_LINKS]
+    result = {
+        "nodes": nodes,
+        "links": [
+            {"sourceIndex": index[source], "targetIndex": index[target], "type": link_type, "label": entry["label"]}
+            for source, target, link_type, entry in ranked
+        ],
+    }
+    if any(graph.get("partial") for graph in maps):
+        result["partial"] = True
+    return result
+
+async def iter_chunked_concept_map(chunks, chat, model, temperature=0.3, concurrency=4, cache=None, run=None):
+    """Map each chunk concurrently (at most ``concurrency`` model calls at once) and
+    yield (done, failed, merged graph) every time a chunk completes.
+
+    With a ``cache``, chunks already mapped are not sent again, so editing one
+    chapter only re-maps that chapter. ``run`` executes the cache's blocking
+    calls (e.g. ``IOExecutor.run``).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    run = run or (lambda fn, *args: asyncio.get_running_loop().run_in_executor(None, fn, *args))
+    logger = logging.getLogger(__name__)
+
+    async def map_chunk(i, chunk):
+        key = cache_key(chunk, model, temperature)
+        if cache is not None:
+            cached = await run(cache.get, key)
+            if cached is not None:
+                return i, cached
+        async with semaphore:
+            result = await build_concept_map(chunk, chat, model, temperature)
+        if cache is not None and not result.get("partial"):
+            await run(cache.put, key, result)
+        return i, result
+
+    results = {}
+    failed = 0
+    tasks = [asyncio.ensure_future(map_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                i, result = await next_done
+                results[i] = result
+            except Exception as e:
+                failed += 1
+                logger.warning("concept map chunk failed error=%s", e)
+            # Merge in document order so node order does not depend on timing
+            yield len(results) + failed, failed, merge_concept_maps([results[i] for i in sorted(results)])
+    finally:
+        for task in tasks:
+            task.cancel()
+
+class ConceptMapCache:
+    """Validated concept maps by cache key: an in-memory LRU in front of a SQLite table.
+
+    Entries expire ``ttl`` seconds after they were generated, in both tiers.
+    """
+
+    def __init__(self, db_path="concept_maps.db", ttl=7 * 24 * 3600, memory_bytes=8 * 1024 * 1024, memory_entries=512):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.logger = logging.getLogger(__name__)
+        self._memory = LRUCache(max_bytes=memory_bytes, max_entries=memory_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.create_table()
+
+    def create_table(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS concept_maps (key TEXT PRIMARY KEY, result TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_concept_maps_expires ON concept_maps (expires)")
+
+    def get(self, key):
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires, result = entry
+            if expires > now:
+                return result
+            self._memory.pop(key)
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="concept_cache", query="get"):
+            row = self._conn.execute("SELECT result, expires FROM concept_maps WHERE key = ? AND expires > ?", (key, now)).fetchone()
+            if row is None:
+                self.disk_misses += 1
+                return None
+            self.disk_hits += 1
+        result = json.loads(row[0])
+        self._memory.put(key, (row[1], result), len(row[0]))
+        return result
+
+    def put(self, key, result):
+        expires = time.time() + self.ttl
+        data = json.dumps(result)
+        self._memory.put(key, (expires, result), len(data))
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="concept_cache", query="put"), self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO concept_maps (key, result, expires) VALUES (?, ?, ?)", (key, data, expires))
+            self._conn.execute("DELETE FROM concept_maps WHERE expires <= ?", (time.time(),))
+
+    def stats(self):
+        stats = {"memory_" + name: value for name, value in self._memory.stats().items()}
+        stats.update({"disk_hits": self.disk_hits, "disk_misses": self.disk_misses})
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
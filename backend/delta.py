@@ -0,0 +1,133 @@
+"""Line-based deltas between two versions of a text.
+
+A delta is a list of ops that rebuilds the target from the base: ``[i, n]``
+copies n lines of the base starting at line i, and a string inserts that
+text. Encoded deltas are zlib-compressed JSON, so an edit costs roughly the
+size of the changed lines however long the document is.
+
+Lines are matched patience-style: common leading and trailing lines are
+trimmed, then lines that occur exactly once on both sides anchor the match
+and the gaps between anchors are diffed the same way. Prose repeats few
+lines apart from blanks, so this stays near linear on long manuscripts.
+"""
+import json
+import zlib
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+# Gaps with no unique line to anchor on are diffed with SequenceMatcher up to
+# this many cells (lines x lines); larger ones are stored as inserted text
+MAX_DENSE_CELLS = 250_000
+
+def make_delta(base, target):
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops = []
+    j = 0
+    for i1, j1, n in _matching_blocks(base_lines, target_lines):
+        if j1 > j:
+            ops.append("".join(target_lines[j:j1]))
+        if ops and not isinstance(ops[-1], str) and sum(ops[-1]) == i1:
+            ops[-1][1] += n
+        else:
+            ops.append([i1, n])
+        j = j1 + n
+    if j < len(target_lines):
+        ops.append("".join(target_lines[j:]))
+    return ops
+
+def _matching_blocks(a, b):
+    """(i, j, n) runs of equal lines, in order of both i and j."""
+    blocks = []
+    # Work items are regions to diff or blocks to emit, popped in order
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 3:
+            blocks.append(item)
+            continue
+        alo, ahi, blo, bhi = item
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            blocks.append((start, blo - (alo - start), alo - start))
+        end = ahi
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        tail = (ahi, bhi, end - ahi) if end > ahi else None
+        pending = [tail] if tail else []
+        if alo < ahi and blo < bhi:
+            anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+            if anchors:
+                # Gaps and anchors in reverse so the stack pops them in order
+                i_next, j_next = ahi, bhi
+                for i, j in reversed(anchors):
+                    pending.append((i + 1, i_next, j + 1, j_next))
+                    pending.append((i, j, 1))
+                    i_next, j_next = i, j
+                pending.append((alo, i_next, blo, j_next))
+            elif (ahi - alo) * (bhi - blo) <= MAX_DENSE_CELLS:
+                matcher = SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+                for i, j, n in reversed(matcher.get_matching_blocks()[:-1]):
+                    pending.append((alo + i, blo + j, n))
+        stack.extend(pending)
+    return blocks
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Lines found exactly once in both ranges, as (i, j) pairs forming the
+    longest run that is increasing on both sides."""
+    counts = {}
+    for i in range(alo, ahi):
+        entry = counts.get(a[i])
+        counts[a[i]] = [i, None] if entry is None else [None, None]
+    seen = set()
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is None or entry[0] is None:
+            continue
+        if b[j] in seen:
+            entry[0] = None
+        else:
+            seen.add(b[j])
+            entry[1] = j
+    pairs = sorted((j, i) for i, j in counts.values() if i is not None and j is not None)
+    # Longest increasing subsequence of i over pairs ordered by j (patience sort)
+    tails, tail_index, previous = [], [], [None] * len(pairs)
+    for k, (_, i) in enumerate(pairs):
+        pos = bisect_left(tails, i)
+        if pos:
+            previous[k] = tail_index[pos - 1]
+        if pos == len(tails):
+            tails.append(i)
+            tail_index.append(k)
+        else:
+            tails[pos] = i
+            tail_index[pos] = k
+    anchors = []
+    k = tail_index[-1] if tail_index else None
+    while k is not None:
+        j, i = pairs[k]
+        anchors.append((i, j))
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+def apply_delta(base, ops):
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            start, count = op
+            parts.extend(base_lines[start:start + count])
+    return "".join(parts)
+
+def encode_delta(ops):
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+def decode_delta(data):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
@@ -1,27 +1,202 @@
+import zlib
 import sqlite3
+import difflib
+import threading
+from delta import make_delta, apply_delta, encode_delta, decode_delta
+from file_manager import content_hash
+from metrics import SQLITE_QUERY_SECONDS
 
 class DraftTracker:
-    def __init__(self, db_path="drafts.db"):
+    """Draft log plus a version store for draft contents.
+
+    Contents live in ``draft_blobs`` keyed by their hash, so identical
+    revisions are stored once. The newest revision of a file is kept whole;
+    when a newer one arrives it is rewritten as a reverse delta against it,
+    except every ``keyframe_interval``-th revision, which stays a full
+    snapshot so rebuilding an old revision never walks a long delta chain.
+    """
+
+    def __init__(self, db_path="drafts.db", keyframe_interval=50):
         self.db_path = db_path
+        self.keyframe_interval = keyframe_interval
+        self._write_lock = threading.Lock()
+        # One persistent connection per thread instead of a connect per call
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self.create_table()
 
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL stays consistent on power loss and only risks the last commits
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
     def create_table(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute(
                 "CREATE TABLE IF NOT EXISTS drafts (id INTEGER PRIMARY KEY, filename TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)"
             )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(drafts)")}
+            # Databases from before revisions were stored only have the log columns
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE drafts ADD COLUMN content_hash TEXT")
+            if "size" not in columns:
+                conn.execute("ALTER TABLE drafts ADD COLUMN size INTEGER")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS draft_blobs (hash TEXT PRIMARY KEY, base_hash TEXT, data BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_drafts_filename_timestamp ON drafts (filename, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_drafts_timestamp ON drafts (timestamp)")
 
-    def add_draft(self, filename):
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("INSERT INTO drafts (filename) VALUES (?)", (filename,))
+    def add_draft(self, filename, content=None):
+        """Log a draft of ``filename``; with ``content`` it is also stored as a revision.
 
-    def get_drafts(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM drafts ORDER BY timestamp DESC")
-            return cursor.fetchall()
+        Returns the id of the new row.
+        """
+        if content is None:
+            with SQLITE_QUERY_SECONDS.time(store="drafts", query="add_draft"), self._connect() as conn:
+                return conn.execute("INSERT INTO drafts (filename) VALUES (?)", (filename,)).lastrowid
 
-    def close(self):
-        pass
+        digest = content_hash(content)
+        with self._write_lock, SQLITE_QUERY_SECONDS.time(store="drafts", query="add_revision"), self._connect() as conn:
+            previous = conn.execute(
+                "SELECT id, content_hash FROM drafts WHERE filename = ? AND content_hash IS NOT NULL ORDER BY id DESC LIMIT 1",
+                (filename,),
+            ).fetchone()
+            exists = conn.execute("SELECT 1 FROM draft_blobs WHERE hash = ?", (digest,)).fetchone()
+            if not exists:
+                conn.execute(
+                    "INSERT INTO draft_blobs (hash, base_hash, data) VALUES (?, NULL, ?)",
+                    (digest, zlib.compress(content.encode("utf-8"))),
+                )
+                if previous and previous[1] != digest:
+                    self._demote(conn, filename, previous[0], previous[1], content, digest)
+            return conn.execute(
+                "INSERT INTO drafts (filename, content_hash, size) VALUES (?, ?, ?)",
+                (filename, digest, len(content.encode("utf-8"))),
+            ).lastrowid
+
+    def _demote(self, conn, filename, previous_id, previous_hash, content, digest):
+        # Turn the previous full snapshot into a reverse delta from the new one,
+        # unless it is due to stay a keyframe
+        row = conn.execute("SELECT base_hash, data FROM draft_blobs WHERE hash = ?", (previous_hash,)).fetchone()
+        if row is None or row[0] is not None:
+            return
+        older = conn.execute(
+            "SELECT b.base_hash FROM drafts d JOIN draft_blobs b ON b.hash = d.content_hash "
+            "WHERE d.filename = ? AND d.id < ? ORDER BY d.id DESC LIMIT ?",
+            (filename, previous_id, self.keyframe_interval - 1),
+        ).fetchall()
+        since_keyframe = 0
+        for (base_hash,) in older:
+            if base_hash is None:
+                break
+            since_keyframe += 1
+        if since_keyframe >= self.keyframe_interval - 1:
+            return
+        previous_content = zlib.decompress(row[1]).decode("utf-8")
+        data = encode_delta(make_delta(content, previous_content))
+        if len(data) < len(row[1]):
+            conn.execute("UPDATE draft_blobs SET base_hash = ?, data = ? WHERE hash = ?", (digest, data, previous_hash))
+
+    def add_drafts(self, filenames):
+        """Record several drafts in one transaction."""
+        with SQLITE_QUERY_SECONDS.time(store="drafts", query="add_drafts"), self._connect() as conn:
+            conn.executemany("INSERT INTO drafts (filename) VALUES (?)", [(name,) for name in filenames])
 
-    
\ No newline at end of file
+    def get_drafts(self, limit=None, after=None, filename=None):
+        """Drafts newest first as (id, filename, timestamp) rows.
+
+        Pages are keyset-based: pass the id of the last row of the previous
+        page as ``after`` to continue after it.
+        """
+        sql = "SELECT id, filename, timestamp FROM drafts"
+        where = []
+        params = []
+        if filename is not None:
+            where.append("filename = ?")
+            params.append(filename)
+        if after is not None:
+            where.append("(timestamp, id) < (SELECT timestamp, id FROM drafts WHERE id = ?)")
+            params.append(after)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with SQLITE_QUERY_SECONDS.time(store="drafts", query="get_drafts"):
+            return self._connect().execute(sql, params).fetchall()
+
+    def list_revisions(self, filename, limit=None, after=None):
+        """Stored revisions of ``filename`` newest first, paged like ``get_drafts``."""
+        sql = "SELECT id, filename, timestamp, content_hash, size FROM drafts WHERE filename = ? AND content_hash IS NOT NULL"
+        params = [filename]
+        if after is not None:
+            sql += " AND id < ?"
+            params.append(after)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with SQLITE_QUERY_SECONDS.time(store="drafts", query="list_revisions"):
+            rows = self._connect().execute(sql, params).fetchall()
+        return [
+            {"id": rid, "filename": name, "timestamp": ts, "hash": digest, "size": size}
+            for rid, name, ts, digest, size in rows
+        ]
+
+    def get_revision(self, revision_id):
+        """The revision as a dict including its ``content``, or None if there is no such revision."""
+        with SQLITE_QUERY_SECONDS.time(store="drafts", query="get_revision"):
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT id, filename, timestamp, content_hash, size FROM drafts WHERE id = ? AND content_hash IS NOT NULL",
+                (revision_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            content = self._load_blob(conn, row[3])
+        rid, name, ts, digest, size = row
+        return {"id": rid, "filename": name, "timestamp": ts, "hash": digest, "size": size, "content": content}
+
+    def _load_blob(self, conn, digest):
+        # Follow base links up to the nearest full snapshot, then replay the deltas back down
+        deltas = []
+        while True:
+            base_hash, data = conn.execute("SELECT base_hash, data FROM draft_blobs WHERE hash = ?", (digest,)).fetchone()
+            if base_hash is None:
+                content = zlib.decompress(data).decode("utf-8")
+                break
+            deltas.append(data)
+            digest = base_hash
+        for data in reversed(deltas):
+            content = apply_delta(content, decode_delta(data))
+        return content
+
+    def diff_revisions(self, from_id, to_id):
+        """Unified diff between two revisions, or None if either does not exist."""
+        old = self.get_revision(from_id)
+        new = self.get_revision(to_id)
+        if old is None or new is None:
+            return None
+        return "".join(difflib.unified_diff(
+            old["content"].splitlines(keepends=True),
+            new["content"].splitlines(keepends=True),
+            fromfile=f"{old['filename']}@{old['id']}",
+            tofile=f"{new['filename']}@{new['id']}",
+        ))
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
@@ -0,0 +1,206 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import zipfile
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+FORMATS = ("pdf", "txt", "zip")
+
+class ExportCancelled(Exception):
+    pass
+
+class ExportJob:
+    def __init__(self, job_id, fmt, filenames, name):
+        self.id = job_id
+        self.format = fmt
+        self.filenames = filenames
+        self.name = name
+        self.status = "queued"
+        self.done = 0
+        self.error = None
+        self.path = None
+        self.created = time.time()
+        self.finished = None
+        self.cancelled = threading.Event()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "format": self.format,
+            "status": self.status,
+            "progress": {"done": self.done, "total": len(self.filenames)},
+            "error": self.error,
+            "download": self.name if self.status == "completed" else None,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+class ExportJobs:
+    """Background exports of many documents to one PDF, one text file or a ZIP of PDFs.
+
+    Jobs run on ``max_concurrent`` worker threads; the rest wait their turn.
+    Cancellation is checked between documents. Finished jobs and their output
+    are dropped ``ttl`` seconds after they end, by a sweeper thread that runs
+    every ``sweep_interval`` seconds (at most a minute by default).
+    """
+
+    def __init__(self, file_mgr, pdf_exporter, output_dir, max_concurrent=2, ttl=3600, sweep_interval=None):
+        self.file_mgr = file_mgr
+        self.pdf_exporter = pdf_exporter
+        self.output_dir = output_dir
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval or min(ttl, 60)
+        os.makedirs(output_dir, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="export")
+        self._stop = threading.Event()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="export-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def resolve(self, filenames=None, notebook=None):
+        """Documents to export: the given files, or every .txt file in ``notebook``."""
+        if filenames:
+            return list(filenames)
+        if not notebook:
+            raise ValueError("filenames or notebook is required")
+        prefix = notebook.rstrip("/" + os.sep) + os.sep
+        return [path for path in self.file_mgr.list_files(notebook, sort="name")
+                if path.startswith(prefix) and path.endswith(".txt")]
+
+    def submit(self, filenames, fmt="pdf", name=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        if not filenames:
+            raise ValueError("Nothing to export")
+        filenames = [_document_path(filename) for filename in filenames]
+        self.expire()
+        base = (name or "export").replace("/", "_").replace(os.sep, "_")
+        job = ExportJob(uuid.uuid4().hex, fmt, filenames, f"{base}.{fmt}")
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        self.expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancelled.set()
+        if job.status == "queued":
+            # Not picked up yet; the worker will skip it
+            job.status = "cancelled"
+            job.finished = time.time()
+        return job
+
+    def _run(self, job):
+        if job.cancelled.is_set():
+            return
+        job.status = "running"
+        output = os.path.join(self.output_dir, f"{job.id}.{job.format}")
+        try:
+            if job.format == "txt":
+                self._write_text(job, output)
+            elif job.format == "pdf":
+                self._write_pdf(job, output)
+            else:
+                self._write_zip(job, output)
+            job.path = output
+            job.status = "completed"
+        except ExportCancelled:
+            job.status = "cancelled"
+            _remove(output)
+        except Exception as e:
+            self.logger.error("export job failed id=%s error=%s", job.id, e)
+            job.status = "failed"
+            job.error = str(e)
+            _remove(output)
+        finally:
+            job.finished = time.time()
+
+    def _sections(self, job):
+        for name in job.filenames:
+            if job.cancelled.is_set():
+                raise ExportCancelled()
+            yield name, self.file_mgr.load_file(name)
+            job.done += 1
+
+    def _write_text(self, job, output):
+        with open(output, "w", encoding="utf-8") as f:
+            for name, content in self._sections(job):
+                f.write(f"--- {name} ---\n{content}\n")
+
+    def _write_pdf(self, job, output):
+        content = "".join(f"--- {name} ---\n{content}\n" for name, content in self._sections(job))
+        _copy(self.pdf_exporter.export_blocking(content), output)
+
+    def _write_zip(self, job, output):
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as bundle:
+            for name, content in self._sections(job):
+                arcname = posixpath.splitext(name.replace(os.sep, "/"))[0] + ".pdf"
+                bundle.write(self.pdf_exporter.export_blocking(content), arcname)
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.expire()
+            except Exception as e:
+                self.logger.error("export sweep failed error=%s", e)
+
+    def expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished is not None and now - job.finished > self.ttl]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job.path:
+                _remove(job.path)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running", "completed", "failed", "cancelled")}
+
+    def shutdown(self):
+        self._stop.set()
+        self._sweeper.join()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancelled.set()
+        self._pool.shutdown(wait=True)
+        for job in jobs:
+            if job.path:
+                _remove(job.path)
+
+def _document_path(filename):
+    # Normalized so ZIP entries and reads stay inside the documents folder
+    if not isinstance(filename, str) or not filename:
+        raise ValueError("filenames must be non-empty strings")
+    path = os.path.normpath(filename)
+    if os.path.isabs(path) or path == os.pardir or path.startswith(os.pardir + os.sep):
+        raise ValueError(f"Invalid filename: {filename}")
+    return path
+
+def _copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
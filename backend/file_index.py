@@ -0,0 +1,295 @@
+import os
+import json
+import logging
+import threading
+
+SORT_KEYS = ("name", "mtime", "size")
+# Exported binaries saved next to the documents (e.g. PDF exports) are not documents
+SKIPPED_EXTENSIONS = (".pdf",)
+
+class FileIndex:
+    """In-memory index of the documents tree.
+
+    Each directory node records its own mtime, its files as name -> (mtime_ns, size)
+    and the names of its subdirectories. A refresh re-lists directories whose
+    mtime changed (files added, removed or renamed) and stats the files of the
+    others, since editing a file in place does not touch its directory. The
+    watcher checks directory mtimes every ``watch_interval`` seconds and stats
+    files only every ``stat_files_every`` checks. FileManager reports its own
+    writes, deletes and renames directly; changes found by later refreshes are
+    passed to ``on_change(rel_path, meta)``, with meta None for removed files.
+    """
+
+    def __init__(self, base_path, snapshot_path=None, watch_interval=None, on_change=None, stat_files_every=6):
+        self.base_path = base_path
+        self.snapshot_path = snapshot_path
+        self.watch_interval = watch_interval
+        self.stat_files_every = stat_files_every
+        self.on_change = on_change
+        self.logger = logging.getLogger(__name__)
+        self._dirs = {}  # rel dir ("" for root) -> {"mtime_ns", "files", "subdirs"}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+        self._load_snapshot()
+        # Whatever changed while we were down is picked up by the callers' own startup sync
+        self.refresh(notify=False)
+        if watch_interval:
+            self._watcher = threading.Thread(target=self._watch_loop, name="file-index-watcher", daemon=True)
+            self._watcher.start()
+
+    def refresh(self, notify=True, stat_files=True):
+        """Bring the index in line with the disk, re-listing only changed directories.
+
+        With ``stat_files`` False only directory mtimes are checked, which misses
+        files edited in place.
+        """
+        changes = []
+        with self._lock:
+            self._refresh_dir("", changes, stat_files)
+        if notify and self.on_change is not None:
+            for rel_path, meta in changes:
+                try:
+                    self.on_change(rel_path, meta)
+                except Exception as e:
+                    self.logger.error("file index change handler failed path=%s error=%s", rel_path, e)
+
+    def entries(self):
+        """Every indexed file as rel_path -> (mtime_ns, size)."""
+        with self._lock:
+            return {
+                os.path.join(rel_dir, name) if rel_dir else name: meta
+                for rel_dir, node in self._dirs.items()
+                for name, meta in node["files"].items()
+            }
+
+    def close(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+        self.save_snapshot()
+
+    def add(self, rel_path):
+        """Record a file FileManager has just written."""
+        rel_dir, name = os.path.split(os.path.normpath(rel_path))
+        if name.lower().endswith(SKIPPED_EXTENSIONS):
+            return
+        full_path = os.path.join(self.base_path, rel_path)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return
+        if os.path.isdir(full_path):
+            # A renamed directory: re-list the affected directories
+            self.refresh(notify=False)
+            return
+        with self._lock:
+            node = self._ensure_dir(rel_dir)
+            node["files"][name] = (st.st_mtime_ns, st.st_size)
+            self._touch(rel_dir)
+
+    def remove(self, rel_path):
+        """Forget a file FileManager has just deleted."""
+        rel_dir, name = os.path.split(os.path.normpath(rel_path))
+        with self._lock:
+            node = self._dirs.get(rel_dir)
+            if node is not None and node["files"].pop(name, None) is not None:
+                self._touch(rel_dir)
+
+    def move(self, old_rel_path, new_rel_path):
+        self.remove(old_rel_path)
+        self.add(new_rel_path)
+
+    def list(self, notebook=None, sort=None, reverse=False, offset=0, limit=None, extra=None):
+        """Return (page, total) of relative file paths.
+
+        Root files are always included; files below the root are included when
+        their path starts with ``notebook``. ``extra`` maps paths not yet on disk
+        to (mtime_ns, size) and is merged in. ``sort`` is one of SORT_KEYS or
+        None for root files first, then the tree in name order.
+        """
+        if sort is not None and sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        entries = {}
+        with self._lock:
+            for rel_dir in self._matching_dirs(notebook):
+                for name, meta in self._dirs[rel_dir]["files"].items():
+                    if not rel_dir:
+                        entries[name] = meta
+                        continue
+                    rel_path = os.path.join(rel_dir, name)
+                    if not notebook or rel_path.startswith(notebook):
+                        entries[rel_path] = meta
+        for rel_path, meta in (extra or {}).items():
+            rel_path = os.path.normpath(rel_path)
+            if os.sep in rel_path and notebook and not rel_path.startswith(notebook):
+                continue
+            entries[rel_path] = meta
+
+        if sort == "mtime":
+            files = sorted(entries, key=lambda p: (entries[p][0], p), reverse=reverse)
+        elif sort == "size":
+            files = sorted(entries, key=lambda p: (entries[p][1], p), reverse=reverse)
+        elif sort == "name":
+            files = sorted(entries, reverse=reverse)
+        else:
+            files = sorted(entries, key=lambda p: (os.sep in p, p), reverse=reverse)
+        total = len(files)
+        end = None if limit is None else offset + limit
+        return files[offset:end], total
+
+    def save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            data = {
+                rel_dir: {
+                    "mtime_ns": node["mtime_ns"],
+                    "files": node["files"],
+                    "subdirs": sorted(node["subdirs"]),
+                }
+                for rel_dir, node in self._dirs.items()
+            }
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"base_path": os.path.abspath(self.base_path), "dirs": data}, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("base_path") != os.path.abspath(self.base_path):
+                return
+            self._dirs = {
+                rel_dir: {
+                    "mtime_ns": node["mtime_ns"],
+                    "files": {name: tuple(meta) for name, meta in node["files"].items()},
+                    "subdirs": set(node["subdirs"]),
+                }
+                for rel_dir, node in data["dirs"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning("ignoring unreadable file index snapshot path=%s error=%s", self.snapshot_path, e)
+            self._dirs = {}
+
+    def _watch_loop(self):
+        ticks = 0
+        while not self._stop.wait(self.watch_interval):
+            ticks += 1
+            try:
+                self.refresh(stat_files=ticks % self.stat_files_every == 0)
+            except Exception as e:
+                self.logger.error("file index refresh failed error=%s", e)
+
+    def _refresh_dir(self, rel_dir, changes, stat_files):
+        full_dir = os.path.join(self.base_path, rel_dir) if rel_dir else self.base_path
+        try:
+            mtime_ns = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            self._drop_dir(rel_dir, changes)
+            return
+        node = self._dirs.get(rel_dir)
+        if node is None or node["mtime_ns"] != mtime_ns:
+            node = self._scan_dir(rel_dir, full_dir, mtime_ns, node, changes)
+        elif stat_files:
+            self._stat_files(rel_dir, full_dir, node, changes)
+        for subdir in list(node["subdirs"]):
+            self._refresh_dir(os.path.join(rel_dir, subdir) if rel_dir else subdir, changes, stat_files)
+
+    def _scan_dir(self, rel_dir, full_dir, mtime_ns, old_node, changes):
+        files = {}
+        subdirs = set()
+        with os.scandir(full_dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    # Hidden directories hold caches, not documents
+                    if not entry.name.startswith("."):
+                        subdirs.add(entry.name)
+                elif entry.is_file():
+                    # Skip temp files left mid-write by atomic saves
+                    if entry.name.startswith(".") and entry.name.endswith(".tmp"):
+                        continue
+                    if entry.name.lower().endswith(SKIPPED_EXTENSIONS):
+                        continue
+                    st = entry.stat()
+                    files[entry.name] = (st.st_mtime_ns, st.st_size)
+        old_files = old_node["files"] if old_node is not None else {}
+        for name, meta in files.items():
+            if old_files.get(name) != meta:
+                changes.append((os.path.join(rel_dir, name), meta))
+        for name in old_files.keys() - files.keys():
+            changes.append((os.path.join(rel_dir, name), None))
+        if old_node is not None:
+            for gone in old_node["subdirs"] - subdirs:
+                self._drop_dir(os.path.join(rel_dir, gone), changes)
+        node = {"mtime_ns": mtime_ns, "files": files, "subdirs": subdirs}
+        self._dirs[rel_dir] = node
+        return node
+
+    def _stat_files(self, rel_dir, full_dir, node, changes):
+        files = node["files"]
+        for name, old_meta in list(files.items()):
+            try:
+                st = os.stat(os.path.join(full_dir, name))
+            except OSError:
+                del files[name]
+                changes.append((os.path.join(rel_dir, name), None))
+                continue
+            meta = (st.st_mtime_ns, st.st_size)
+            if meta != old_meta:
+                files[name] = meta
+                changes.append((os.path.join(rel_dir, name), meta))
+
+    def _drop_dir(self, rel_dir, changes):
+        node = self._dirs.pop(rel_dir, None)
+        if node is None:
+            return
+        for name in node["files"]:
+            changes.append((os.path.join(rel_dir, name), None))
+        for subdir in node["subdirs"]:
+            self._drop_dir(os.path.join(rel_dir, subdir), changes)
+        parent, name = os.path.split(rel_dir)
+        if parent in self._dirs:
+            self._dirs[parent]["subdirs"].discard(name)
+
+    def _ensure_dir(self, rel_dir):
+        node = self._dirs.get(rel_dir)
+        if node is None:
+            node = {"mtime_ns": None, "files": {}, "subdirs": set()}
+            self._dirs[rel_dir] = node
+            if rel_dir:
+                parent, name = os.path.split(rel_dir)
+                self._ensure_dir(parent)["subdirs"].add(name)
+                self._touch(parent)
+        return node
+
+    def _touch(self, rel_dir):
+        # Our own change bumped the directory mtime; record it so the next
+        # refresh does not re-list the directory for nothing
+        full_dir = os.path.join(self.base_path, rel_dir) if rel_dir else self.base_path
+        try:
+            self._dirs[rel_dir]["mtime_ns"] = os.stat(full_dir).st_mtime_ns
+        except OSError:
+            pass
+
+    def _matching_dirs(self, notebook):
+        # Walk from the root, pruning subtrees that cannot hold a path
+        # starting with the notebook prefix
+        yield ""
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            node = self._dirs.get(rel_dir)
+            if node is None:
+                continue
+            for subdir in node["subdirs"]:
+                child = os.path.join(rel_dir, subdir) if rel_dir else subdir
+                if notebook and not (child.startswith(notebook) or notebook.startswith(child + os.sep)):
+                    continue
+                stack.append(child)
+                yield child
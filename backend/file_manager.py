@@ -1,107 +1,396 @@
 import os
+import gzip
+import hashlib
 import logging
+import tempfile
+import threading
+import time
+from lru_cache import LRUCache
+from file_index import FileIndex
+from metrics import FILE_OP_SECONDS
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd storage falls back to gzip
+    zstandard = None
+
+# Compressed files are recognised by their codec's own magic number, which
+# can never start a plain UTF-8 text file, so old plain files keep loading.
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def content_hash(content):
+    """Version hash clients send back as the base of a patch."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class PatchConflict(Exception):
+    """Raised when a patch was made against a different version of the file."""
+    def __init__(self, current_hash):
+        super().__init__("Patch base does not match the current file")
+        self.current_hash = current_hash
 
 class FileManager:
-    def __init__(self, base_path="documents"):
+    def __init__(self, base_path="documents", write_behind=False, flush_interval=2.0, cache_bytes=32 * 1024 * 1024,
+                 index_snapshot=None, watch_interval=None, compression=None, compression_min_bytes=4096):
         self.base_path = base_path
         os.makedirs(base_path, exist_ok=True)
-        logging.basicConfig(level=logging.DEBUG)
         self.logger = logging.getLogger(__name__)
 
+        # Optional compressed-at-rest storage for files of at least compression_min_bytes
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            self.logger.warning("zstandard is not installed; storing documents with gzip")
+            compression = "gzip"
+        self.compression = compression
+        self.compression_min_bytes = compression_min_bytes
+
+        # Loaded file contents keyed by full path, validated by (mtime_ns, size)
+        self._cache = LRUCache(max_bytes=cache_bytes)
+        # Callbacks told about every saved, deleted or renamed document
+        self._listeners = []
+        # Listing comes from an index of the tree instead of walking it per call
+        self._index = FileIndex(base_path, snapshot_path=index_snapshot, watch_interval=watch_interval,
+                                on_change=self._on_external_change)
+
+        # Write-behind state: filename -> latest unsaved content. Successive
+        # saves of the same file overwrite each other here and reach the disk
+        # once per flush interval.
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self._dirty = {}
+        self._inflight = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.RLock()
+        # Saves and patches of the same file are serialized by one of these
+        # (picked by filename) and do their disk I/O outside self._lock
+        self._file_locks = [threading.Lock() for _ in range(64)]
+        self._stop = threading.Event()
+        self._flusher = None
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="file-manager-flusher", daemon=True)
+            self._flusher.start()
+
+    def _file_lock(self, filename):
+        return self._file_locks[hash(filename) % len(self._file_locks)]
+
     def save_file(self, filename, content):
+        # Ensure content is a string
+        if not isinstance(content, str):
+            content = str(content)
+        with self._file_lock(filename):
+            self._save(filename, content)
+
+    def _save(self, filename, content):
+        if self.write_behind:
+            with self._lock:
+                self._dirty[filename] = content
+            return
+
+        full_path = os.path.join(self.base_path, filename)
+        self.logger.debug("save_file path=%s chars=%d", full_path, len(content))
         try:
-            # Create directory if it doesn't exist
-            full_path = os.path.join(self.base_path, filename)
-            directory = os.path.dirname(full_path)
-            os.makedirs(directory, exist_ok=True)
-            
-            print(f"Saving to path: {full_path}")  # Debug log
-            print(f"Content length: {len(content)}")  # Debug log
-            print(f"Content type: {type(content)}")  # Debug log
-            print(f"Content preview: {content[:100]}")  # Debug log
-            
-            # Ensure content is a string
-            if not isinstance(content, str):
-                content = str(content)
-            
-            # Save the file
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-                f.flush()  # Force write to disk
-                os.fsync(f.fileno())  # Ensure it's written to disk
-            
-            # Verify the file was written
-            if os.path.exists(full_path):
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    saved_content = f.read()
-                    print(f"Verified content length: {len(saved_content)}")  # Debug log
-                    print(f"Verified content preview: {saved_content[:100]}")  # Debug log
-                    if len(saved_content) != len(content):
-                        raise Exception(f"Content verification failed - content length mismatch. Expected: {len(content)}, Got: {len(saved_content)}")
-            else:
-                print(f"File was not created: {full_path}")  # Debug log
-                raise FileNotFoundError(f"Failed to create file: {full_path}")
-                
+            self._write_files([(full_path, content)])
         except Exception as e:
-            print(f"Error saving file: {str(e)}")  # Debug log
+            self.logger.error("save_file failed path=%s error=%s", full_path, e)
+            raise
+
+    def apply_patch(self, filename, base_hash, ops):
+        """Apply edit operations to the stored content of ``filename``.
+
+        ``ops`` is a list of {"op": "insert", "pos", "text"},
+        {"op": "delete", "pos", "length"} or {"op": "replace", "pos", "length", "text"},
+        applied in order; each position refers to the text as left by the
+        previous operation. Positions and lengths count UTF-16 code units, as
+        the editor's JavaScript strings do. Raises FileNotFoundError for a
+        missing file, PatchConflict if ``base_hash`` is not the hash of the
+        current content and ValueError for malformed operations. Returns the
+        hash of the patched content.
+        """
+        with self._file_lock(filename):
+            if not self.exists(filename):
+                raise FileNotFoundError(filename)
+            content = self.load_file(filename)
+            current = content_hash(content)
+            if base_hash != current:
+                raise PatchConflict(current)
+            # Two bytes per code unit, so code unit offsets index it directly
+            units = bytearray(content.encode("utf-16-le"))
+            for op in ops:
+                if not isinstance(op, dict):
+                    raise ValueError("Each operation must be an object")
+                kind = op.get("op")
+                pos = op.get("pos")
+                length = op.get("length", 0) if kind != "insert" else 0
+                text = op.get("text", "") if kind != "delete" else ""
+                if kind not in ("insert", "delete", "replace"):
+                    raise ValueError(f"Unknown operation: {kind}")
+                if (not isinstance(pos, int) or not isinstance(length, int) or isinstance(pos, bool)
+                        or isinstance(length, bool) or not isinstance(text, str)):
+                    raise ValueError("Operation has invalid pos, length or text")
+                if pos < 0 or length < 0 or pos + length > len(units) // 2:
+                    raise ValueError(f"Operation range {pos}:{pos + length} is outside the document")
+                units[pos * 2:(pos + length) * 2] = text.encode("utf-16-le")
+            try:
+                content = units.decode("utf-16-le")
+            except UnicodeDecodeError:
+                raise ValueError("Operations split a character in two") from None
+            self._save(filename, content)
+            return content_hash(content)
+
+    def add_listener(self, callback):
+        """Register ``callback(event, path, content=None, meta=None, new_path=None)``.
+
+        Events are "saved" (with content and (mtime_ns, size) meta) once the
+        content is on disk, "deleted", and "renamed" (with new_path). Changes
+        made outside this class are reported once the index notices them.
+        """
+        self._listeners.append(callback)
+
+    def file_metadata(self):
+        """Every file on disk as relative path -> (mtime_ns, size)."""
+        return self._index.entries()
+
+    def _notify(self, event, path, **kwargs):
+        for callback in self._listeners:
+            try:
+                callback(event, os.path.normpath(path), **kwargs)
+            except Exception as e:
+                self.logger.error("file listener failed event=%s path=%s error=%s", event, path, e)
+
+    def _on_external_change(self, rel_path, meta):
+        self._cache.pop(os.path.join(self.base_path, rel_path))
+        if meta is None:
+            self._notify("deleted", rel_path)
+        else:
+            self._notify("saved", rel_path, content=self.load_file(rel_path), meta=meta)
+
+    def flush(self, filename=None):
+        """Write pending write-behind saves to disk.
+
+        Flushes everything when ``filename`` is None, otherwise only that file.
+        Returns the number of files written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if filename is None:
+                    pending = self._dirty
+                    self._dirty = {}
+                elif filename in self._dirty:
+                    pending = {filename: self._dirty.pop(filename)}
+                else:
+                    pending = {}
+                if not pending:
+                    return 0
+                # Keep the content readable while it is being written
+                self._inflight = pending
+            try:
+                self._write_files([(os.path.join(self.base_path, name), content) for name, content in pending.items()])
+            except Exception:
+                with self._lock:
+                    # Put the content back unless a newer save arrived meanwhile
+                    for name, content in pending.items():
+                        self._dirty.setdefault(name, content)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = {}
+            return len(pending)
+
+    def close(self):
+        """Stop the background flusher and write out anything still pending."""
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        self._index.close()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error("background flush failed error=%s", e)
+
+    def _write_files(self, items):
+        with FILE_OP_SECONDS.time(op="write"):
+            self._write_batch(items)
+        self.logger.debug("wrote files count=%d", len(items))
+
+    def _write_batch(self, items):
+        # Write every file to a temp sibling, fsync them as one group, then
+        # atomically swap them into place and fsync each parent directory once.
+        staged = []
+        try:
+            for full_path, content in items:
+                directory = os.path.dirname(full_path) or "."
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+                staged.append((tmp_path, full_path))
+                data = self._compress(content)
+                if data is None:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        f.write(content)
+                        f.flush()
+                        os.fsync(f.fileno())
+                else:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+            directories = set()
+            for tmp_path, full_path in staged:
+                self._cache.pop(full_path)
+                os.replace(tmp_path, full_path)
+                directories.add(os.path.dirname(full_path) or ".")
+        except Exception:
+            for tmp_path, _ in staged:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
             raise
+        for directory in directories:
+            self._fsync_directory(directory)
+        # What was just written is what the next load will ask for
+        for full_path, content in items:
+            st = os.stat(full_path)
+            rel_path = os.path.relpath(full_path, self.base_path)
+            self._cache_content(full_path, content, st)
+            self._index.add(rel_path)
+            self._notify("saved", rel_path, content=content, meta=(st.st_mtime_ns, st.st_size))
+
+    @staticmethod
+    def _fsync_directory(directory):
+        # Directory fsync makes the rename durable; not supported on Windows
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
 
     def load_file(self, filename):
+        with self._lock:
+            if filename in self._dirty:
+                return self._dirty[filename]
+            if filename in self._inflight:
+                return self._inflight[filename]
+        full_path = os.path.join(self.base_path, filename)
         try:
-            full_path = os.path.join(self.base_path, filename)
-            print(f"Loading from path: {full_path}")  # Debug log
-            
-            if not os.path.exists(full_path):
-                print(f"File does not exist: {full_path}")  # Debug log
-                return ""
-            
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                print(f"Loaded content length: {len(content)}")  # Debug log
-                return content
-        except Exception as e:
-            print(f"Error loading file: {str(e)}")  # Debug log
+            st = os.stat(full_path)
+        except OSError:
+            self.logger.debug("load_file missing path=%s", full_path)
             return ""
 
-    def list_files(self, notebook=None):
+        content = self._cache.get(full_path, validator=(st.st_mtime_ns, st.st_size))
+        if content is not None:
+            return content
         try:
-            files = []
-            # First check root directory
-            root_files = [f for f in os.listdir(self.base_path) if os.path.isfile(os.path.join(self.base_path, f))]
-            files.extend(root_files)
-            
-            # Then check subdirectories
-            for root, _, filenames in os.walk(self.base_path):
-                if root == self.base_path:  # Skip root directory as we already processed it
-                    continue
-                for filename in filenames:
-                    rel_path = os.path.relpath(os.path.join(root, filename), self.base_path)
-                    if notebook:
-                        if rel_path.startswith(notebook):
-                            files.append(rel_path)
-                    else:
-                        files.append(rel_path)
-            return files
+            with FILE_OP_SECONDS.time(op="read"), open(full_path, 'rb') as f:
+                data = f.read()
+                st = os.fstat(f.fileno())
+            content = self._decompress(data)
+            if content is None:
+                # Plain text, with the newline translation text-mode reads always did
+                content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
         except Exception as e:
-            print(f"Error listing files: {str(e)}")  # Debug log
-            return []
+            self.logger.error("load_file failed path=%s error=%s", full_path, e)
+            return ""
+        self._cache_content(full_path, content, st)
+        return content
 
-    def delete_file(self, filename):
+    def exists(self, filename):
+        """Whether ``filename`` is stored or has a save pending (load_file returns "" either way when it is missing)."""
+        with self._lock:
+            if filename in self._dirty or filename in self._inflight:
+                return True
+        return os.path.isfile(os.path.join(self.base_path, filename))
+
+    def pending_count(self):
+        """Number of write-behind saves not yet on disk."""
+        with self._lock:
+            return len(self._dirty) + len(self._inflight)
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters and current size of the content cache."""
+        return self._cache.stats()
+
+    def _cache_content(self, full_path, content, st):
+        # Charge the cache for the text's bytes, not the (maybe compressed) file
+        # nor its length in characters, which undercounts non-ASCII text
+        self._cache.put(full_path, content, len(content.encode("utf-8")), validator=(st.st_mtime_ns, st.st_size))
+
+    def is_compressed(self, filename):
+        """Whether the file on disk is stored compressed."""
         try:
-            os.remove(os.path.join(self.base_path, filename))
-            return True
-        except FileNotFoundError:
+            with open(os.path.join(self.base_path, filename), 'rb') as f:
+                head = f.read(4)
+        except OSError:
             return False
+        return head.startswith(GZIP_MAGIC) or head.startswith(ZSTD_MAGIC)
+
+    def _compress(self, content):
+        if self.compression is None:
+            return None
+        raw = content.encode('utf-8')
+        if len(raw) < self.compression_min_bytes:
+            return None
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(raw)
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+
+    @staticmethod
+    def _decompress(data):
+        if data.startswith(GZIP_MAGIC):
+            return gzip.decompress(data).decode('utf-8')
+        if data.startswith(ZSTD_MAGIC):
+            if zstandard is None:
+                raise OSError("File is zstd-compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(data, max_output_size=1 << 31).decode('utf-8')
+        return None
+
+    def list_files(self, notebook=None, sort=None, reverse=False, offset=0, limit=None):
+        return self.list_files_page(notebook, sort, reverse, offset, limit)[0]
+
+    def list_files_page(self, notebook=None, sort=None, reverse=False, offset=0, limit=None):
+        """Return (files, total) for one page of the listing; see FileIndex.list."""
+        # Include write-behind saves that have not reached the disk yet
+        with self._lock:
+            pending = {name: (time.time_ns(), len(content)) for name, content in {**self._inflight, **self._dirty}.items()}
+        with FILE_OP_SECONDS.time(op="list"):
+            return self._index.list(notebook, sort=sort, reverse=reverse, offset=offset, limit=limit, extra=pending)
+
+    def delete_file(self, filename):
+        with self._flush_lock, self._lock:
+            pending = self._dirty.pop(filename, None) is not None
+            self._cache.pop(os.path.join(self.base_path, filename))
+            try:
+                with FILE_OP_SECONDS.time(op="delete"):
+                    os.remove(os.path.join(self.base_path, filename))
+                self._index.remove(filename)
+                self._notify("deleted", filename)
+                return True
+            except FileNotFoundError:
+                return pending
 
     def rename_file(self, old_filename, new_filename):
-        try:
-            old_path = os.path.join(self.base_path, old_filename)
-            new_path = os.path.join(self.base_path, new_filename)
-            
-            # Create directory for new file if it doesn't exist
-            os.makedirs(os.path.dirname(new_path), exist_ok=True)
-            
-            os.rename(old_path, new_path)
-            return True
-        except (FileNotFoundError, OSError):
-            return False
+        with self._flush_lock:
+            # A pending save has to land before it can be moved
+            self.flush(old_filename)
+            try:
+                old_path = os.path.join(self.base_path, old_filename)
+                new_path = os.path.join(self.base_path, new_filename)
+
+                # Create directory for new file if it doesn't exist
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+
+                self._cache.pop(old_path)
+                self._cache.pop(new_path)
+                with FILE_OP_SECONDS.time(op="rename"):
+                    os.rename(old_path, new_path)
+                self._index.move(old_filename, new_filename)
+                self._notify("renamed", old_filename, new_path=os.path.normpath(new_filename))
+                return True
+            except (FileNotFoundError, OSError):
+                return False
@@ -1,12 +1,271 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from lru_cache import LRUCache
+
+# Commonly confused or weak phrasings -> suggested replacement
+CONFUSED = {
+    "bad": "poor",
+    "alot": "a lot",
+    "irregardless": "regardless",
+    "could of": "could have",
+    "should of": "should have",
+    "would of": "would have",
+    "must of": "must have",
+    "might of": "might have",
+    "more then": "more than",
+    "less then": "less than",
+    "better then": "better than",
+    "rather then": "rather than",
+    "other then": "other than",
+    "your welcome": "you're welcome",
+    "its been": "it's been",
+    "loose the": "lose the",
+    "very unique": "unique",
+    "in regards to": "regarding",
+    "for all intensive purposes": "for all intents and purposes",
+}
+# Repetitions that are usually deliberate
+ALLOWED_REPEATS = {"had", "that"}
+IRREGULAR_PARTICIPLES = (
+    "made built done seen known told given taken found thought held kept left lost paid sent shown "
+    "written brought bought caught taught felt heard meant sold spent won broken chosen driven eaten "
+    "forgotten forgiven hidden spoken stolen beaten shaken thrown drawn born worn torn"
+).split()
+
+def _phrases(phrases):
+    # Longest first so "could of" wins over a shorter overlapping entry
+    return "|".join(r"\s+".join(map(re.escape, p.split())) for p in sorted(phrases, key=len, reverse=True))
+
+# All rules as one alternation: a single pass over a paragraph finds every
+# match, and the named group that matched says which rule fired
+_RULES = re.compile(
+    r"(?P<confused>\b(?:" + _phrases(CONFUSED) + r")\b)"
+    r"|(?P<repeated>\b(?P<word>\w+)\s+(?P=word)\b)"
+    r"|(?P<passive>\b(?:am|is|are|was|were|be|been|being)\s+(?:\w{2,}ed|" + "|".join(IRREGULAR_PARTICIPLES) + r")\b)"
+    r"|(?P<space_before>[ \t]+(?=[,.;:!?](?:\s|$)))"
+    r"|(?P<no_space_after>[,;](?=[^\W\d_]))"
+    r"|(?P<doubled>(?P<mark>[,;!?])(?P=mark)+)"
+    r"|(?P<spaces>(?<=\S) {2,}(?=\S))",
+    re.IGNORECASE,
+)
+# Cached results from another rule set must not be served
+RULES_VERSION = hashlib.sha256(_RULES.pattern.encode("utf-8")).hexdigest()[:12]
+_SENTENCE = re.compile(r"[^.!?]+(?:[.!?]+|$)")
+_WORD = re.compile(r"\w+(?:'\w+)?")
+_LINE = re.compile(r"[^\n]+")
 
 class GrammarChecker:
+    """Offline grammar and style checks.
+
+    Text is checked a paragraph (line) at a time and each paragraph's issues
+    are cached by its hash, so re-checking a document after an edit only
+    scans the paragraphs that changed. Offsets in the result are character
+    offsets into the full text.
+    """
+
+    def __init__(self, max_sentence_words=40, cache_bytes=16 * 1024 * 1024):
+        self.max_sentence_words = max_sentence_words
+        self._cache = LRUCache(max_bytes=cache_bytes)
+
     def check(self, text: str) -> dict:
-        # Simulated grammar corrections
         corrections = []
-        if "bad" in text:
-            corrections.append({"original": "bad", "suggestion": "poor"})
-        return {"corrections": corrections}
+        paragraphs = 0
+        checked = 0
+        for match in _LINE.finditer(text or ""):
+            paragraph = match.group()
+            if not paragraph.strip():
+                continue
+            paragraphs += 1
+            key = hashlib.blake2b(paragraph.encode("utf-8"), digest_size=16).digest()
+            issues = self._cache.get(key)
+            if issues is None:
+                issues = self.check_paragraph(paragraph)
+                self._cache.put(key, issues, 64 + 160 * len(issues))
+                checked += 1
+            start = match.start()
+            corrections.extend({**issue, "offset": issue["offset"] + start} for issue in issues)
+        return {"corrections": corrections, "paragraphs": paragraphs, "checked": checked}
+
+    def check_paragraph(self, paragraph):
+        """Issues in one paragraph, offsets relative to its start."""
+        issues = []
+        for match in _RULES.finditer(paragraph):
+            issue = _issue(match)
+            if issue is not None:
+                issues.append(issue)
+        for match in _SENTENCE.finditer(paragraph):
+            words = len(_WORD.findall(match.group()))
+            if words > self.max_sentence_words:
+                sentence = match.group().strip()
+                issues.append({
+                    "original": sentence,
+                    "suggestion": None,
+                    "offset": match.start() + match.group().index(sentence[0]),
+                    "length": len(sentence),
+                    "rule": "long_sentence",
+                    "category": "style",
+                    "message": f"Long sentence ({words} words); consider splitting it",
+                })
+        issues.sort(key=lambda issue: issue["offset"])
+        return issues
+
+    def stats(self):
+        return self._cache.stats()
+
+def _issue(match):
+    rule = match.lastgroup
+    original = match.group()
+    if rule == "confused":
+        suggestion = _match_case(CONFUSED[" ".join(original.lower().split())], original)
+        category, message = "usage", f"Did you mean \"{suggestion}\"?"
+    elif rule == "repeated":
+        word = match.group("word")
+        if word.lower() in ALLOWED_REPEATS or word.isdigit():
+            return None
+        suggestion = word
+        category, message = "grammar", f"Repeated word \"{word}\""
+    elif rule == "passive":
+        suggestion = None
+        category, message = "style", "Passive voice; consider naming who acts"
+    elif rule == "space_before":
+        suggestion = ""
+        category, message = "punctuation", "Remove the space before the punctuation mark"
+    elif rule == "no_space_after":
+        suggestion = original + " "
+        category, message = "punctuation", "Add a space after the punctuation mark"
+    elif rule == "doubled":
+        suggestion = original[0]
+        category, message = "punctuation", "Repeated punctuation"
+    else:
+        suggestion = " "
+        category, message = "punctuation", "Use a single space between words"
+    return {
+        "original": original,
+        "suggestion": suggestion,
+        "offset": match.start(),
+        "length": len(original),
+        "rule": rule,
+        "category": category,
+        "message": message,
+    }
+
+def _match_case(suggestion, original):
+    if original.isupper() and len(original) > 1:
+        return suggestion.upper()
+    if original[:1].isupper():
+        return suggestion[:1].upper() + suggestion[1:]
+    return suggestion
+
+_default = GrammarChecker()
 
 def check_grammar(text):
-    # Dummy implementation for now
-    return [{"error": "Example mistake", "suggestion": "Example correction"}]
+    """Corrections for ``text`` from a shared checker (and its paragraph cache)."""
+    return _default.check(text)["corrections"]
+
+# One checker per worker process, created on its first document
+_worker = None
+
+def _check_in_worker(text, max_sentence_words):
+    global _worker
+    if _worker is None or _worker.max_sentence_words != max_sentence_words:
+        _worker = GrammarChecker(max_sentence_words)
+    result = _worker.check(text)
+    return {"corrections": result["corrections"], "paragraphs": result["paragraphs"]}
+
+class BatchGrammarChecker:
+    """Grammar checks over many documents on a pool of ``workers`` processes.
+
+    Results are cached by content hash, so re-checking a novel only sends the
+    chapters that changed to the pool. The pool is started on first use.
+    """
+
+    def __init__(self, file_mgr, workers=None, max_sentence_words=40, cache_bytes=64 * 1024 * 1024):
+        self.file_mgr = file_mgr
+        self.workers = workers or os.cpu_count() or 1
+        self.max_sentence_words = max_sentence_words
+        self.logger = logging.getLogger(__name__)
+        self._cache = LRUCache(max_bytes=cache_bytes)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def resolve(self, filenames=None, notebook=None):
+        """Documents to check: the given files, or every .txt file in ``notebook``."""
+        if filenames:
+            return list(filenames)
+        if not notebook:
+            raise ValueError("filenames or notebook is required")
+        prefix = notebook.rstrip("/" + os.sep) + os.sep
+        return [path for path in self.file_mgr.list_files(notebook, sort="name")
+                if path.startswith(prefix) and path.endswith(".txt")]
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Forking the threaded server could deadlock a worker on an inherited lock
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset_pool(self, pool):
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def check_files(self, filenames, run=None):
+        """Yield one result per document as each finishes; cached documents come first.
+
+        ``run`` executes the file reads (e.g. ``IOExecutor.run``).
+        """
+        loop = asyncio.get_running_loop()
+        run = run or (lambda fn, *args: loop.run_in_executor(None, fn, *args))
+
+        async def check(name):
+            try:
+                if not await run(self.file_mgr.exists, name):
+                    return {"filename": name, "error": "File not found"}
+                text = await run(self.file_mgr.load_file, name)
+                h = hashlib.blake2b(digest_size=16)
+                h.update(f"{RULES_VERSION}:{self.max_sentence_words}:".encode("utf-8"))
+                h.update(text.encode("utf-8"))
+                key = h.digest()
+                result = self._cache.get(key)
+                if result is not None:
+                    return {"filename": name, **result, "cached": True}
+                pool = self._executor()
+                try:
+                    result = await loop.run_in_executor(pool, _check_in_worker, text, self.max_sentence_words)
+                except BrokenProcessPool:
+                    self._reset_pool(pool)
+                    raise
+                self._cache.put(key, result, 64 + 160 * len(result["corrections"]))
+                return {"filename": name, **result, "cached": False}
+            except Exception as e:
+                self.logger.warning("grammar batch failed filename=%s error=%s", name, e)
+                return {"filename": name, "error": str(e) or type(e).__name__}
+
+        tasks = [asyncio.ensure_future(check(name)) for name in filenames]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self):
+        stats = {"workers": self.workers, "pool_started": int(self._pool is not None)}
+        stats.update({"cache_" + name: value for name, value in self._cache.stats().items()})
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -1,10 +1,124 @@
+import time
+import zlib
+import sqlite3
+import threading
+from delta import make_delta, apply_delta, encode_delta, decode_delta
+from metrics import SQLITE_QUERY_SECONDS
 
 class HistoryTracker:
-    def __init__(self):
-        self.history = []
+    """Bounded history of logged document contents, kept in SQLite.
+
+    Only the latest ``max_entries`` entries are kept. The newest entry of each
+    file is stored whole and earlier ones as reverse deltas against the next
+    entry of the same file (with a full keyframe every ``keyframe_interval``
+    entries), so dropping the oldest rows never breaks a chain.
+    """
+
+    def __init__(self, db_path=":memory:", max_entries=10000, keyframe_interval=50):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.keyframe_interval = keyframe_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_table()
+
+    def create_table(self):
+        with self._lock, self._conn:
+            # base_id is NULL for full snapshots, else the newer entry this one is a delta from
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT, "
+                "timestamp REAL NOT NULL, base_id INTEGER, size INTEGER, depth INTEGER NOT NULL DEFAULT 0, data BLOB NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_filename_id ON history (filename, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)")
 
     def log(self, filename, content):
-        self.history.append({"filename": filename, "content": content})
+        content = content or ""
+        compressed = zlib.compress(content.encode("utf-8"))
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="history", query="log"), self._conn:
+            previous = self._conn.execute(
+                "SELECT id, data, depth FROM history WHERE filename IS ? AND base_id IS NULL ORDER BY id DESC LIMIT 1",
+                (filename,),
+            ).fetchone()
+            entry_id = self._conn.execute(
+                "INSERT INTO history (filename, timestamp, size, data) VALUES (?, ?, ?, ?)",
+                (filename, time.time(), len(content), compressed),
+            ).lastrowid
+            # depth counts the deltas stored since this file's last keyframe
+            if previous and previous[2] + 1 < self.keyframe_interval:
+                previous_id, previous_data, depth = previous
+                old = zlib.decompress(previous_data).decode("utf-8")
+                data = encode_delta(make_delta(content, old))
+                if len(data) < len(previous_data):
+                    self._conn.execute("UPDATE history SET base_id = ?, data = ? WHERE id = ?", (entry_id, data, previous_id))
+                    self._conn.execute("UPDATE history SET depth = ? WHERE id = ?", (depth + 1, entry_id))
+            # Ring buffer: entries only ever depend on newer ones, so the oldest can go
+            self._conn.execute("DELETE FROM history WHERE id <= ?", (entry_id - self.max_entries,))
+        return entry_id
+
+    def get_history(self, filename=None, since=None, until=None, limit=None, offset=0, newest_first=False):
+        """Entries as {id, filename, timestamp, content}, optionally filtered by file and a
+        [since, until] range of unix timestamps and paged with limit/offset."""
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="history", query="get_history"):
+            rows = self._conn.execute(*self._query("SELECT id, filename, timestamp", filename, since, until, limit, offset, newest_first)).fetchall()
+            # Newest first, so each entry is one delta from the next newer entry
+            # of its file already decoded and every chain is walked once
+            contents = {}
+            newest = {}
+            for entry_id, name, _ in sorted(rows, reverse=True):
+                contents[entry_id] = self._content(entry_id, newest.get(name))
+                newest[name] = (entry_id, contents[entry_id])
+            return [
+                {"id": entry_id, "filename": name, "timestamp": ts, "content": contents[entry_id]}
+                for entry_id, name, ts in rows
+            ]
+
+    def count(self, filename=None, since=None, until=None):
+        with self._lock:
+            return self._conn.execute(*self._query("SELECT COUNT(*)", filename, since, until)).fetchone()[0]
+
+    def _query(self, select, filename=None, since=None, until=None, limit=None, offset=0, newest_first=None):
+        sql = select + " FROM history"
+        where = []
+        params = []
+        if filename is not None:
+            where.append("filename = ?")
+            params.append(filename)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("timestamp <= ?")
+            params.append(until)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if newest_first is not None:
+            sql += " ORDER BY id DESC" if newest_first else " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        return sql, params
+
+    def _content(self, entry_id, known=None):
+        """Content of ``entry_id``; ``known`` is an (id, content) pair of a newer
+        entry of the same file where the walk up its chain can stop."""
+        deltas = []
+        while True:
+            if known is not None and entry_id == known[0]:
+                content = known[1]
+                break
+            base_id, data = self._conn.execute("SELECT base_id, data FROM history WHERE id = ?", (entry_id,)).fetchone()
+            if base_id is None:
+                content = zlib.decompress(data).decode("utf-8")
+                break
+            deltas.append(data)
+            entry_id = base_id
+        for data in reversed(deltas):
+            content = apply_delta(content, decode_delta(data))
+        return content
 
-    def get_history(self):
-        return self.history
+    def close(self):
+        with self._lock:
+            self._conn.close()
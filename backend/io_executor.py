@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class IOExecutor:
+    """Bounded thread pool that async routes hand their blocking file I/O to.
+
+    Keeps the event loop free while a slow disk is busy and records how deep
+    the queue gets, so saturation shows up in the stats rather than as
+    mysterious latency.
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-io")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool and await its result."""
+        submitted = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += started - submitted
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.total_run += time.perf_counter() - started
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+
+        def on_done(future):
+            # A task cancelled before it started never left the queue
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+
+        future = self._pool.submit(task)
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queued": self.max_queued,
+                "avg_wait_seconds": self.total_wait / finished if finished else 0.0,
+                "avg_run_seconds": self.total_run / finished if finished else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
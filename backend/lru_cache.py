@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Least-recently-used cache bounded by total entry size.
+
+    Each entry carries an optional validator (e.g. a file's mtime and size);
+    a lookup with a different validator is treated as a miss and drops the
+    stale entry.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (validator, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, validator=None, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != validator:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, size, validator=None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Entries larger than the whole budget would only evict everything else
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (validator, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
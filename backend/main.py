@@ -1,82 +1,219 @@
 import json
-import re
+import logging
+import functools
+import os
+import sys
+import threading
+
+if __name__ == "__main__":
+    # Serve the imported module, never this script: spawned processes (uvicorn's
+    # reloader, the grammar and PDF pools) re-run the launching script as
+    # __mp_main__, and each would build its own copy of every service below
+    import subprocess
+    raise SystemExit(subprocess.call([
+        sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+        "--host", "127.0.0.1", "--port", "8000", "--reload",
+    ]))
+
 from fastapi import FastAPI, Request, HTTPException, Body
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
-from file_manager import FileManager
+from file_manager import FileManager, PatchConflict, content_hash
 from draft_tracker import DraftTracker
 from fingerprint import FingerprintAuth
 from session_manager import SessionManager
 from cloud_sync import CloudSync
+from search_index import SearchIndex
+from io_executor import IOExecutor
+from compiler import ManuscriptCompiler
+from pdf_export import PDFExporter
+from export_jobs import ExportJobs
+import metrics
+from compression import CompressionMiddleware
 from wifi_manager import scan_networks, get_status as wifi_get_status, connect as wifi_connect
 
+# Leveled key=value logging; TAGORE_LOG_LEVEL=DEBUG shows per-request file activity
+logging.basicConfig(
+    level=os.getenv("TAGORE_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s level=%(levelname)s logger=%(name)s msg=%(message)s",
+)
+logger = logging.getLogger("tagore")
+
 app = FastAPI()
+# gzip (or br when available) for large JSON and file responses
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("TAGORE_COMPRESS_MIN_BYTES", "1024")))
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Enable CORS for frontend access
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],  # Add production URL when deploying
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
     allow_headers=["*"],
 )
 
+UPLOAD_DIR = os.getenv("TAGORE_DOCUMENTS_DIR", os.path.join(os.path.dirname(__file__), "documents"))
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
 # Instantiate services      
-file_mgr = FileManager()
-tracker = DraftTracker()
+# Autosaves are buffered and written in batches; set TAGORE_WRITE_BEHIND=0 to write through
+file_mgr = FileManager(
+    base_path=UPLOAD_DIR,
+    write_behind=os.getenv("TAGORE_WRITE_BEHIND", "1") != "0",
+    flush_interval=float(os.getenv("TAGORE_FLUSH_INTERVAL", "2.0")),
+    index_snapshot=os.getenv("TAGORE_FILE_INDEX_SNAPSHOT") or None,
+    watch_interval=float(os.getenv("TAGORE_WATCH_INTERVAL", "5.0")),
+    # "gzip" or "zstd" stores large documents compressed; plain files still load
+    compression=os.getenv("TAGORE_STORAGE_COMPRESSION") or None,
+)
+# Every blocking document read/write from an async route goes through this pool
+io = IOExecutor(max_workers=int(os.getenv("TAGORE_IO_WORKERS", "8")))
+# Rendered PDFs are cached under a hidden directory the file index skips
+pdf_exporter = PDFExporter(
+    os.path.join(UPLOAD_DIR, ".pdf_cache"),
+    max_bytes=int(os.getenv("TAGORE_PDF_CACHE_BYTES", str(256 * 1024 * 1024))),
+    workers=int(os.getenv("TAGORE_PDF_WORKERS", "2")),
+)
+export_jobs = ExportJobs(
+    file_mgr, pdf_exporter, os.path.join(UPLOAD_DIR, ".exports"),
+    max_concurrent=int(os.getenv("TAGORE_EXPORT_WORKERS", "2")),
+    ttl=float(os.getenv("TAGORE_EXPORT_TTL", "3600")),
+)
+tracker = DraftTracker(db_path=os.getenv("TAGORE_DRAFTS_DB", "drafts.db"))
 auth = FingerprintAuth()
 session = SessionManager()
 cloud = CloudSync()
+search = SearchIndex(os.getenv("TAGORE_SEARCH_DB", os.path.join(os.path.dirname(__file__), "search.db")))
+file_mgr.add_listener(search.handle_file_event)
+
+@app.on_event("startup")
+def sync_search_index():
+    # Catch up on edits made while the server was down without blocking startup
+    threading.Thread(target=search.sync, args=(file_mgr,), name="search-sync", daemon=True).start()
+
+@app.on_event("shutdown")
+def flush_pending_saves():
+    file_mgr.close()
+    search.close()
+    tracker.close()
+    history.close()
+    export_jobs.shutdown()
+    pdf_exporter.shutdown()
+    io.shutdown()
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint."""
+    for component, stats in (("file_cache", file_mgr.cache_stats()), ("io_executor", io.stats()),
+                             ("pdf_cache", pdf_exporter.stats()), ("export_jobs", export_jobs.stats()),
+                             ("concept_map_cache", concept_maps.stats()), ("ai_gateway", ai_gateway.stats()),
+                             ("grammar_cache", grammar.stats()), ("spell_checker", spell.stats()),
+                             ("grammar_batch", grammar_batch.stats())):
+        for stat, value in stats.items():
+            metrics.COMPONENT_STATS.set(value, component=component, stat=stat)
+    metrics.COMPONENT_STATS.set(file_mgr.pending_count(), component="write_behind", stat="pending")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def root():
     return {"message": "Welcome to Tagore! FastAPI Backend is running."}
 
 @app.get("/api/files")
-def list_files(notebook: Optional[str] = None):
-    return {"files": file_mgr.list_files(notebook)}
+async def list_files(notebook: Optional[str] = None, sort: Optional[str] = None, order: str = "asc",
+                     offset: int = 0, limit: Optional[int] = None):
+    try:
+        files, total = await io.run(file_mgr.list_files_page, notebook, sort=sort, reverse=order == "desc",
+                                    offset=max(offset, 0), limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"files": files, "total": total}
+
+@app.get("/api/search")
+async def search_documents(q: str, notebook: Optional[str] = None, limit: int = 20, offset: int = 0):
+    """Ranked full-text search. Supports "quoted phrases" and prefix* terms."""
+    results = await io.run(search.search, q, notebook=notebook, limit=min(max(limit, 1), 100), offset=max(offset, 0))
+    return {"query": q, "results": results}
 
 @app.get("/api/file/{filename:path}")
-def get_file(filename: str):
-    print(f"Attempting to load file: {filename}")  # Debug log
+async def get_file(filename: str):
+    logger.debug("get_file filename=%s", filename)
     
     # Ensure the filename has .txt extension
     if not filename.endswith('.txt'):
         filename += '.txt'
     
     try:
-        content = file_mgr.load_file(filename)
+        content = await io.run(file_mgr.load_file, filename)
         if content == "":
             raise HTTPException(status_code=404, detail="File not found")
-        return {"filename": filename, "content": content}
+        return {"filename": filename, "content": content, "hash": content_hash(content)}
     except Exception as e:
-        print(f"Error in get_file: {str(e)}")  # Debug log
+        logger.error("get_file failed filename=%s error=%s", filename, e)
         raise HTTPException(status_code=500, detail=f"Failed to load file: {str(e)}")
 
+# Declared before save_file so the ":path" converter does not swallow "/flush"
+@app.post("/api/file/{filename:path}/flush")
+async def flush_file(filename: str):
+    """Force a buffered save to disk for durability-critical moments."""
+    if not filename.endswith('.txt'):
+        filename += '.txt'
+    try:
+        flushed = await io.run(file_mgr.flush, filename)
+        return {"status": "flushed", "filename": filename, "written": flushed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to flush file: {str(e)}")
+
 @app.post("/api/file/{filename:path}")
 async def save_file(filename: str, request: Request):
     data = await request.json()
     content = data.get("content", "")
     
-    print(f"Saving file: {filename}")  # Debug log
-    print(f"Content length: {len(content)}")  # Debug log
-    print(f"Content type: {type(content)}")  # Debug log
-    print(f"Content preview: {content[:100] if content else 'None'}")  # Debug log
+    logger.debug("save_file filename=%s chars=%d", filename, len(content))
     
     # Ensure the filename has .txt extension
     if not filename.endswith('.txt'):
         filename += '.txt'
     
     try:
-        file_mgr.save_file(filename, content)
-        return {"status": "saved", "filename": filename}
+        await io.run(file_mgr.save_file, filename, content)
+        return {"status": "saved", "filename": filename, "hash": content_hash(content)}
     except Exception as e:
-        print(f"Error in save_file: {str(e)}")  # Debug log
+        logger.error("save_file failed filename=%s error=%s", filename, e)
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
+@app.patch("/api/file/{filename:path}")
+async def patch_file(filename: str, request: Request):
+    """Apply edits to a stored file. Body: { base_hash, ops: [{op, pos, length?, text?}, ...] }.
+
+    pos and length count UTF-16 code units (JavaScript string offsets). Responds 404 for a missing file and 409 with the current hash when base_hash is stale so the client can resync.
+    """
+    data = await request.json()
+    base_hash = data.get("base_hash")
+    ops = data.get("ops")
+    if not base_hash or not isinstance(ops, list):
+        raise HTTPException(status_code=400, detail="base_hash and ops are required")
+
+    if not filename.endswith('.txt'):
+        filename += '.txt'
+
+    try:
+        new_hash = await io.run(file_mgr.apply_patch, filename, base_hash, ops)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except PatchConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "current_hash": e.current_hash})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("patch_file failed filename=%s error=%s", filename, e)
+        raise HTTPException(status_code=500, detail=f"Failed to patch file: {str(e)}")
+    return {"status": "saved", "filename": filename, "hash": new_hash}
+
 @app.delete("/api/file/{filename:path}")
-def delete_file(filename: str):
-    if file_mgr.delete_file(filename):
+async def delete_file(filename: str):
+    if await io.run(file_mgr.delete_file, filename):
         return {"status": "deleted"}
     raise HTTPException(status_code=404, detail="File not found")
 
@@ -87,13 +224,16 @@ async def rename_file(old_filename: str, request: Request):
     if not new_filename:
         raise HTTPException(status_code=400, detail="New filename not provided")
     
-    if file_mgr.rename_file(old_filename, new_filename):
+    if await io.run(file_mgr.rename_file, old_filename, new_filename):
         return {"status": "renamed"}
     raise HTTPException(status_code=404, detail="File not found")
 
 @app.get("/api/drafts")
-def get_drafts():
-    return {"drafts": tracker.get_drafts()}
+async def get_drafts(limit: Optional[int] = None, after: Optional[int] = None, filename: Optional[str] = None):
+    """Drafts newest first; pass the returned "next" as ?after= to get the following page."""
+    drafts = await io.run(tracker.get_drafts, limit=limit, after=after, filename=filename)
+    next_after = drafts[-1][0] if limit is not None and len(drafts) == limit else None
+    return {"drafts": drafts, "next": next_after}
 
 @app.post("/api/drafts")
 async def save_draft(request: Request):
@@ -103,15 +243,35 @@ async def save_draft(request: Request):
     if not filename or content is None:
         raise HTTPException(status_code=400, detail="Filename and content are required")
     
-    file_mgr.save_file(filename, content)
-    tracker.add_draft(filename)
-    return {"status": "saved"}
+    await io.run(file_mgr.save_file, filename, content)
+    revision_id = await io.run(tracker.add_draft, filename, content)
+    return {"status": "saved", "revision": revision_id}
 
 @app.get("/api/drafts/{filename:path}")
-def load_draft(filename: str):
-    content = file_mgr.load_file(filename)
+async def load_draft(filename: str):
+    content = await io.run(file_mgr.load_file, filename)
     return {"content": content}
 
+@app.get("/api/revisions/{filename:path}")
+async def list_revisions(filename: str, limit: Optional[int] = None, after: Optional[int] = None):
+    revisions = await io.run(tracker.list_revisions, filename, limit=limit, after=after)
+    next_after = revisions[-1]["id"] if limit is not None and len(revisions) == limit else None
+    return {"revisions": revisions, "next": next_after}
+
+@app.get("/api/revision/{revision_id}")
+async def get_revision(revision_id: int):
+    revision = await io.run(tracker.get_revision, revision_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return revision
+
+@app.get("/api/revision/{revision_id}/diff/{other_id}")
+async def diff_revisions(revision_id: int, other_id: int):
+    diff = await io.run(tracker.diff_revisions, revision_id, other_id)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"from": revision_id, "to": other_id, "diff": diff}
+
 @app.post("/api/session/{filename}")
 def switch_file(filename: str):
     session.switch_file(filename)
@@ -129,13 +289,79 @@ def toggle_sync(enabled: bool):
 
 
 from ai_assistant import AIAssistant
-from grammar_checker import GrammarChecker
+from grammar_checker import GrammarChecker, BatchGrammarChecker
+from spell_checker import SpellChecker
 from history_tracker import HistoryTracker
-from openrouter_client import chat as or_chat, OpenRouterError
+from concept_map import (
+    ConceptMapCache, build_concept_map, iter_chunked_concept_map, iter_concept_map, split_chunks,
+    normalize_text as normalize_concept_text, cache_key as concept_cache_key,
+)
+import openrouter_client
+from openrouter_client import OpenRouterError
+from ai_gateway import AIGateway, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK
+from chat_context import ChatContext
 
 ai = AIAssistant()
 grammar = GrammarChecker()
-history = HistoryTracker()
+# Whole-notebook checks are CPU-bound, so they run on one process per core
+grammar_batch = BatchGrammarChecker(file_mgr, workers=int(os.getenv("TAGORE_GRAMMAR_WORKERS", "0")) or None)
+# The word list is compiled to a memory-mapped index on first start (or when
+# the list changes); set TAGORE_SPELL_WORDS where /usr/share/dict/words is missing
+spell = SpellChecker.open(
+    os.getenv("TAGORE_SPELL_WORDS", "/usr/share/dict/words"),
+    os.getenv("TAGORE_SPELL_INDEX", os.path.join(os.path.dirname(__file__), "spell.idx")),
+    user_db=os.getenv("TAGORE_SPELL_USER_DB", os.path.join(os.path.dirname(__file__), "user_words.db")),
+)
+compiler = ManuscriptCompiler(file_mgr, io, read_ahead=int(os.getenv("TAGORE_COMPILE_READ_AHEAD", "8")))
+history = HistoryTracker(
+    db_path=os.getenv("TAGORE_HISTORY_DB", os.path.join(os.path.dirname(__file__), "history.db")),
+    max_entries=int(os.getenv("TAGORE_HISTORY_MAX_ENTRIES", "10000")),
+)
+# Concept maps are cached by text, model, prompt version and temperature
+CONCEPT_MAP_TEMPERATURE = 0.3
+CONCEPT_CHUNK_CHARS = int(os.getenv("TAGORE_CONCEPT_CHUNK_CHARS", "12000"))
+CONCEPT_CONCURRENCY = int(os.getenv("TAGORE_CONCEPT_CONCURRENCY", "4"))
+concept_maps = ConceptMapCache(
+    db_path=os.getenv("TAGORE_CONCEPT_CACHE_DB", os.path.join(os.path.dirname(__file__), "concept_maps.db")),
+    ttl=float(os.getenv("TAGORE_CONCEPT_CACHE_TTL", str(7 * 24 * 3600))),
+)
+
+# Every model call goes through the gateway: identical in-flight requests are
+# coalesced, concurrency is limited globally and per session, and upstream
+# rate limits are retried with backoff behind a circuit breaker
+ai_gateway = AIGateway(
+    openrouter_client.achat, openrouter_client.astream_chat,
+    max_concurrent=int(os.getenv("TAGORE_AI_MAX_CONCURRENT", "4")),
+    per_session=int(os.getenv("TAGORE_AI_PER_SESSION", "2")),
+    max_retries=int(os.getenv("TAGORE_AI_MAX_RETRIES", "3")),
+    breaker_threshold=int(os.getenv("TAGORE_AI_BREAKER_THRESHOLD", "5")),
+    breaker_cooldown=float(os.getenv("TAGORE_AI_BREAKER_COOLDOWN", "30")),
+)
+or_chat = ai_gateway.chat
+or_stream_chat = ai_gateway.stream
+
+async def _summarize_chat(messages):
+    return await or_chat(messages, temperature=0.2, max_tokens=400, priority=PRIORITY_NORMAL)
+
+# Long chats send the newest turns plus a running summary of the rest
+chat_context = ChatContext(_summarize_chat, budget_tokens=int(os.getenv("TAGORE_CHAT_BUDGET_TOKENS", "6000")))
+
+def _ai_session(request, data):
+    return request.headers.get("x-session-id") or data.get("session_id") or (request.client.host if request.client else None)
+
+def _ai_error(e):
+    # Rate limiting and an open circuit are passed on so clients can back off
+    if e.status_code in (429, 503):
+        headers = {"Retry-After": str(int(e.retry_after or 1))}
+        return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+    return HTTPException(status_code=500, detail=str(e))
+
+@app.on_event("shutdown")
+async def close_ai_clients():
+    await openrouter_client.aclose()
+    concept_maps.close()
+    spell.close()
+    grammar_batch.shutdown()
 
 @app.post("/api/ai/assist")
 async def ai_assist(request: Request):
@@ -146,138 +372,276 @@ async def ai_assist(request: Request):
 
 @app.post("/api/ai/chat")
 async def ai_chat(request: Request):
-    """Chat endpoint expecting JSON: { messages: [{role, content}, ...] }"""
+    """Chat endpoint expecting JSON: { messages: [{role, content}, ...] }.
+
+    Histories over the token budget are trimmed; "context" in the response
+    reports what was sent.
+    """
     data = await request.json()
     messages = data.get("messages") or []
     if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
         raise HTTPException(status_code=400, detail="Invalid messages format")
     try:
-        reply = or_chat(messages)
-        return {"reply": reply}
+        prepared, context = await chat_context.prepare(messages)
+        reply = await or_chat(prepared, session=_ai_session(request, data), priority=PRIORITY_INTERACTIVE)
+        return {"reply": reply, "context": context}
     except OpenRouterError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _ai_error(e)
+
+@app.post("/api/ai/chat/stream")
+async def ai_chat_stream(request: Request):
+    """Streaming /api/ai/chat as server-sent events.
 
+    Each event's data is {"delta": "..."}; the stream ends with an "done"
+    event carrying the full reply and context stats, or an "error" event with {"detail"}.
+    """
+    data = await request.json()
+    messages = data.get("messages") or []
+    if not isinstance(messages, list) or not all(isinstance(m, dict) for m in messages):
+        raise HTTPException(status_code=400, detail="Invalid messages format")
 
-CONCEPT_MAP_SYSTEM = """You are an expert at analyzing text and extracting key concepts and their relationships for a concept map or outline.
-Your ONLY job is to return valid JSON and nothing else (no markdown, no explanation).
-Output format:
-{
-  "nodes": [
-    { "title": "short concept label (max ~60 chars)", "type": "character" | "theme" | "idea" | "place" | "default" }
-  ],
-  "links": [
-    { "sourceIndex": 0, "targetIndex": 1, "type": "causes" | "supports" | "conflicts" | "relates-to" | "contrasts" | "extends", "label": "optional short label" }
-  ]
-}
-Rules: Use 0-based indices for sourceIndex/targetIndex (they refer to the nodes array). Extract 4–20 key concepts. Create 3–15 links where relationships are clear. Node types: use "character" for people/names, "place" for locations, "theme" for recurring ideas, "idea" for abstract concepts, "default" otherwise. Link types: causes, supports, conflicts, relates-to, contrasts, extends."""
+    async def events():
+        parts = []
+        try:
+            prepared, context = await chat_context.prepare(messages)
+        except OpenRouterError as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        tokens = or_stream_chat(prepared, session=_ai_session(request, data), priority=PRIORITY_INTERACTIVE)
+        try:
+            async for delta in tokens:
+                if await request.is_disconnected():
+                    logger.info("ai_chat_stream client disconnected after chars=%d", sum(map(len, parts)))
+                    return
+                parts.append(delta)
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'reply': ''.join(parts), 'context': context})}\n\n"
+        except OpenRouterError as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            # Closes the upstream request so an abandoned reply stops generating
+            await tokens.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/api/ai/concept-map")
 async def ai_concept_map(request: Request):
-    """Generate concept map nodes and links from document text. Body: { \"text\": \"...\" }. Returns { nodes, links }."""
+    """Generate concept map nodes and links from document text. Body: { \"text\": \"...\", \"bypass_cache\"?: bool }. Returns { nodes, links, cached }.
+
+    With \"stream\": true the growing graph is sent as NDJSON while the model
+    replies, ending with a line marked \"complete\". With \"chunked\": true the
+    whole text is mapped chunk by chunk and the graphs merged (also streamable).
+    A map from a reply cut off mid-object is marked \"partial\" and not cached.
+    """
     data = await request.json()
-    text = (data.get("text") or "").strip()
+    if data.get("chunked"):
+        return await _chunked_concept_map(data, _ai_session(request, data))
+    text = normalize_concept_text(data.get("text") or "")
     if not text:
         raise HTTPException(status_code=400, detail="text is required")
-    messages = [
-        {"role": "system", "content": CONCEPT_MAP_SYSTEM},
-        {"role": "user", "content": f"Analyze this text and output ONLY the JSON concept map (no other text):\n\n{text[:12000]}"},
-    ]
+    key = concept_cache_key(text, openrouter_client.DEFAULT_MODEL, CONCEPT_MAP_TEMPERATURE)
+    if not data.get("bypass_cache"):
+        cached = await io.run(concept_maps.get, key)
+        if cached is not None:
+            if data.get("stream"):
+                return StreamingResponse(iter([json.dumps({**cached, "complete": True, "cached": True}) + "\n"]),
+                                         media_type="application/x-ndjson")
+            return {**cached, "cached": True}
+    if data.get("stream"):
+        stream_chat = functools.partial(or_stream_chat, session=_ai_session(request, data), priority=PRIORITY_INTERACTIVE)
+        return StreamingResponse(_streamed_concept_map(text, key, stream_chat), media_type="application/x-ndjson")
     try:
-        reply = or_chat(messages, temperature=0.3, max_tokens=2000)
+        chat = functools.partial(or_chat, session=_ai_session(request, data), priority=PRIORITY_NORMAL)
+        result = await build_concept_map(text, chat, openrouter_client.DEFAULT_MODEL, CONCEPT_MAP_TEMPERATURE)
     except OpenRouterError as e:
+        raise _ai_error(e)
+    except ValueError as e:
         raise HTTPException(status_code=500, detail=str(e))
-    raw = reply.strip()
-    # Try to extract JSON from markdown code block first
-    json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", raw)
-    if json_match:
-        raw = json_match.group(1).strip()
-    # If that fails, try to find the first JSON object in the string
-    def find_first_json(text):
-        import json
-        import re
-        # Find the first curly brace
-        start = text.find('{')
-        if start == -1:
-            return None
-        # Try to parse JSON from every '{' position
-        for i in range(start, len(text)):
-            if text[i] == '{':
-                try:
-                    return json.loads(text[i:])
-                except Exception:
-                    continue
-        return None
+    if not result.get("partial"):
+        await io.run(concept_maps.put, key, result)
+    return {**result, "cached": False}
+
+async def _streamed_concept_map(text, key, stream_chat):
+    graphs = iter_concept_map(text, stream_chat, openrouter_client.DEFAULT_MODEL, CONCEPT_MAP_TEMPERATURE)
     try:
-        out = json.loads(raw)
-    except json.JSONDecodeError:
-        out = find_first_json(raw)
-        if out is None:
-            raise HTTPException(status_code=500, detail="AI did not return valid JSON for concept map")
-    nodes = out.get("nodes") or []
-    links = out.get("links") or []
-    if not isinstance(nodes, list):
-        nodes = []
-    if not isinstance(links, list):
-        links = []
-    valid_nodes = []
-    for i, item in enumerate(nodes):
-        if not isinstance(item, dict):
-            valid_nodes.append({"title": "Concept", "type": "default"})
-            continue
-        title = (item.get("title") or "").strip()[:80] or "Concept"
-        t = (item.get("type") or "default").lower()
-        if t not in ("character", "theme", "idea", "place", "default"):
-            t = "default"
-        valid_nodes.append({"title": title, "type": t})
-    n = len(valid_nodes)
-    valid_links = []
-    for item in links:
-        if not isinstance(item, dict):
-            continue
-        si = item.get("sourceIndex", -1)
-        ti = item.get("targetIndex", -1)
-        if not isinstance(si, int) or not isinstance(ti, int) or si == ti:
-            continue
-        if 0 <= si < n and 0 <= ti < n:
-            link_type = (item.get("type") or "relates-to").lower()
-            if link_type not in ("causes", "supports", "conflicts", "relates-to", "contrasts", "extends"):
-                link_type = "relates-to"
-            valid_links.append({
-                "sourceIndex": si,
-                "targetIndex": ti,
-                "type": link_type,
-                "label": (item.get("label") or "").strip()[:40] or None,
-            })
-    return {"nodes": valid_nodes, "links": valid_links}
+        async for graph, complete in graphs:
+            if complete:
+                if not graph.get("partial"):
+                    await io.run(concept_maps.put, key, graph)
+                yield json.dumps({**graph, "complete": True, "cached": False}) + "\n"
+            else:
+                yield json.dumps({**graph, "complete": False}) + "\n"
+    except (OpenRouterError, ValueError) as e:
+        yield json.dumps({"error": str(e)}) + "\n"
+    finally:
+        await graphs.aclose()
+
+async def _chunked_concept_map(data, session):
+    text = data.get("text") or ""
+    chunks = split_chunks(text, CONCEPT_CHUNK_CHARS)
+    if not chunks:
+        raise HTTPException(status_code=400, detail="text is required")
+    model = openrouter_client.DEFAULT_MODEL
+    key = concept_cache_key(normalize_concept_text(text, None), model, CONCEPT_MAP_TEMPERATURE, mode="chunked")
+    bypass = bool(data.get("bypass_cache"))
+    if not bypass:
+        cached = await io.run(concept_maps.get, key)
+        if cached is not None:
+            if data.get("stream"):
+                line = {"done": len(chunks), "failed": 0, "total": len(chunks), **cached, "complete": True, "cached": True}
+                return StreamingResponse(iter([json.dumps(line) + "\n"]), media_type="application/x-ndjson")
+            return {**cached, "chunks": len(chunks), "cached": True}
+
+    def progress():
+        return iter_chunked_concept_map(
+            chunks, functools.partial(or_chat, session=session, priority=PRIORITY_BULK), model,
+            CONCEPT_MAP_TEMPERATURE, concurrency=CONCEPT_CONCURRENCY,
+            cache=None if bypass else concept_maps, run=io.run,
+        )
+
+    async def finish(graph, failed):
+        # Only a map built whole from every chunk is worth caching
+        if failed == 0 and not graph.get("partial"):
+            await io.run(concept_maps.put, key, graph)
+
+    if data.get("stream"):
+        async def lines():
+            graph, failed = {"nodes": [], "links": []}, 0
+            async for done, failed, graph in progress():
+                yield json.dumps({"done": done, "failed": failed, "total": len(chunks), **graph}) + "\n"
+            if failed == len(chunks):
+                yield json.dumps({"error": "Concept map generation failed for every chunk"}) + "\n"
+                return
+            await finish(graph, failed)
+            yield json.dumps({"done": len(chunks), "failed": failed, "total": len(chunks), **graph, "complete": True, "cached": False}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    graph, failed = None, 0
+    async for _, failed, graph in progress():
+        pass
+    if failed == len(chunks):
+        raise HTTPException(status_code=500, detail="Concept map generation failed for every chunk")
+    await finish(graph, failed)
+    return {**graph, "chunks": len(chunks), "failed": failed, "cached": False}
 
 @app.post("/api/grammar-check")
 async def grammar_check(request: Request):
+    """Body: { "text": "..." }. Returns { corrections: [{original, suggestion, offset, length, rule, category, message}] }.
+
+    Unchanged paragraphs are served from the checker's cache, so the editor can
+    send the whole document on every pause.
+    """
     data = await request.json()
     text = data.get("text", "")
-    return grammar.check(text)
+    return await io.run(grammar.check, text)
+
+@app.post("/api/grammar-check/batch")
+async def grammar_check_batch(request: Request):
+    """Body: { filenames? | notebook? }. Streams NDJSON: one line per document as it
+    finishes ({filename, corrections, paragraphs, cached} or {filename, error}),
+    then a summary line with "complete": true.
+    """
+    data = await request.json()
+    try:
+        filenames = await io.run(grammar_batch.resolve, data.get("filenames"), data.get("notebook"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def lines():
+        cached = failed = 0
+        results = grammar_batch.check_files(filenames, run=io.run)
+        try:
+            async for result in results:
+                cached += bool(result.get("cached"))
+                failed += "error" in result
+                yield json.dumps(result) + "\n"
+        finally:
+            await results.aclose()
+        yield json.dumps({"complete": True, "total": len(filenames), "cached": cached, "failed": failed}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _require_spell():
+    if not spell.available:
+        raise HTTPException(status_code=503, detail="Spell checking needs a word list (set TAGORE_SPELL_WORDS)")
+
+@app.post("/api/spell-check")
+async def spell_check(request: Request):
+    """Body: { "text": "...", "user"?: "..." }. Returns { misspellings: [{word, offset, length, suggestions}], words, unique }.
+
+    The whole document is checked in one pass; "user" adds that user's custom words.
+    """
+    _require_spell()
+    data = await request.json()
+    return await io.run(spell.check, data.get("text") or "", data.get("user"))
+
+@app.get("/api/spell/suggest")
+async def spell_suggest(word: str, user: Optional[str] = None, limit: int = 5):
+    _require_spell()
+    known = await io.run(spell.known, word, user)
+    suggestions = [] if known else await io.run(spell.suggest, word, user, min(max(limit, 1), 20))
+    return {"word": word, "known": known, "suggestions": suggestions}
+
+@app.get("/api/spell/dictionary")
+async def get_user_dictionary(user: str):
+    return {"user": user, "words": await io.run(spell.user_words, user)}
+
+@app.post("/api/spell/dictionary")
+async def add_user_words(request: Request):
+    """Body: { "user": "...", "words": [...] }. Adds words to the user's dictionary."""
+    data = await request.json()
+    if not data.get("user") or not isinstance(data.get("words"), list):
+        raise HTTPException(status_code=400, detail="user and words are required")
+    return {"user": data["user"], "words": await io.run(spell.add_words, data["user"], data["words"])}
+
+@app.delete("/api/spell/dictionary")
+async def remove_user_words(request: Request):
+    data = await request.json()
+    if not data.get("user") or not isinstance(data.get("words"), list):
+        raise HTTPException(status_code=400, detail="user and words are required")
+    return {"user": data["user"], "words": await io.run(spell.remove_words, data["user"], data["words"])}
 
 @app.post("/api/history/log")
 async def log_history(request: Request):
     data = await request.json()
     filename = data.get("filename")
     content = data.get("content")
-    history.log(filename, content)
+    await io.run(history.log, filename, content)
     return {"status": "logged"}
 
 @app.get("/api/history")
-def get_history():
-    return {"history": history.get_history()}
+async def get_history(filename: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+                      limit: int = 100, offset: int = 0):
+    """Logged history newest first; since/until are unix timestamps."""
+    limit = min(max(limit, 1), 1000)
+    offset = max(offset, 0)
+    entries = await io.run(history.get_history, filename=filename, since=since, until=until,
+                           limit=limit, offset=offset, newest_first=True)
+    total = await io.run(history.count, filename=filename, since=since, until=until)
+    return {"history": entries, "total": total, "offset": offset, "limit": limit}
 
 @app.post("/api/compile")
 async def compile_notes(request: Request):
+    """Body: { filenames?, manifest?, stream?, format? }.
+
+    With "stream": true the manuscript is sent section by section as plain
+    text, or as one JSON object per line when "format" is "ndjson".
+    """
     data = await request.json()
-    filenames = data.get("filenames", [])
-    compiled = ""
-    for name in filenames:
-        compiled += f"--- {name} ---\n"
-        compiled += file_mgr.load_file(name) + "\n"
-    return {"compiled": compiled}
+    try:
+        filenames = await io.run(compiler.resolve, data.get("filenames", []), data.get("manifest"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not data.get("stream"):
+        return {"compiled": await compiler.compile(filenames)}
+    if data.get("format") == "ndjson":
+        return StreamingResponse(compiler.stream_ndjson(filenames), media_type="application/x-ndjson")
+    return StreamingResponse(compiler.stream_text(filenames), media_type="text/plain; charset=utf-8")
 
 @app.post("/api/auth/unlock")
 async def unlock_device(request: Request):
@@ -323,21 +687,31 @@ import os
 import shutil
 import sqlite3
 
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "documents")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 @app.post("/api/upload")
 async def upload_file(file: UploadFile = File(...)):
     """Upload a raw file into documents directory (utility endpoint)."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename missing")
     file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+
+    def write_upload():
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+    await io.run(write_upload)
     return {"filename": file.filename}
 
 @app.get("/api/download/{filename}")
-def download_file(filename: str):
+async def download_file(filename: str):
+    await io.run(file_mgr.flush, filename)
+    if await io.run(file_mgr.is_compressed, filename):
+        # Hand out the text, not the compressed storage format
+        content = await io.run(file_mgr.load_file, filename)
+        return Response(
+            content.encode('utf-8'),
+            media_type="text/plain; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{os.path.basename(filename)}"'},
+        )
     path = os.path.join(UPLOAD_DIR, filename)
     return FileResponse(path, filename=filename)
 
@@ -351,11 +725,12 @@ async def save_journal(request: Request):
         raise HTTPException(status_code=400, detail="Filename and content are required")
     if not filename.endswith('.txt'):
         filename += '.txt'
-    file_mgr.save_file(filename, content)
+    await io.run(file_mgr.save_file, filename, content)
     return {"status": "saved", "filename": filename}
 
 @app.post("/api/export/pdf")
 async def export_to_pdf(request: Request):
+    """Body: { filename, content, options? } where options may set font, font_size, line_height and margin."""
     data = await request.json()
     filename = data.get("filename")
     content = data.get("content")
@@ -366,33 +741,16 @@ async def export_to_pdf(request: Request):
     if not filename.endswith('.pdf'):
         filename += '.pdf'
     
-    # Save the content as PDF in the documents folder
+    # Rendered off the event loop, or served straight from the cache for unchanged content
     pdf_path = os.path.join(UPLOAD_DIR, filename)
     try:
-        from fpdf import FPDF
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        
-        # Split content into lines and add to PDF
-        for line in content.split('\n'):
-            # Handle long lines by wrapping them
-            if len(line) > 100:
-                words = line.split()
-                current_line = ""
-                for word in words:
-                    if len(current_line) + len(word) + 1 <= 100:
-                        current_line += word + " "
-                    else:
-                        # Use positional args to avoid pylance named param warning
-                        pdf.cell(200, 10, current_line.strip(), 0, 1)
-                        current_line = word + " "
-                if current_line:
-                    pdf.cell(200, 10, current_line.strip(), 0, 1)
-            else:
-                pdf.cell(200, 10, line, 0, 1)
-        
-        pdf.output(pdf_path)
+        options = pdf_exporter.options(data.get("options"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid PDF options: {str(e)}")
+    try:
+        cached_path = await pdf_exporter.export(content, options)
+        # Keep a copy in the documents folder as before
+        await io.run(_publish_pdf, cached_path, pdf_path)
         
         # Return the file as a response
         return FileResponse(
@@ -401,8 +759,55 @@ async def export_to_pdf(request: Request):
             filename=filename
         )
     except Exception as e:
+        logger.error("export_to_pdf failed filename=%s error=%s", filename, e)
         raise HTTPException(status_code=500, detail=f"Failed to create PDF: {str(e)}")
 
+@app.post("/api/export/jobs", status_code=202)
+async def submit_export_job(request: Request):
+    """Body: { filenames? | notebook?, format: "pdf" | "txt" | "zip", name? }. Poll the returned job for progress."""
+    data = await request.json()
+    try:
+        filenames = await io.run(export_jobs.resolve, data.get("filenames"), data.get("notebook"))
+        job = export_jobs.submit(filenames, data.get("format", "pdf"), data.get("name") or data.get("notebook"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+@app.get("/api/export/jobs/{job_id}")
+def get_export_job(job_id: str):
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+@app.get("/api/export/jobs/{job_id}/download")
+def download_export_job(job_id: str):
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    media_types = {"pdf": "application/pdf", "txt": "text/plain; charset=utf-8", "zip": "application/zip"}
+    return FileResponse(job.path, media_type=media_types[job.format], filename=job.name)
+
+@app.delete("/api/export/jobs/{job_id}")
+def cancel_export_job(job_id: str):
+    job = export_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+def _publish_pdf(cached_path, pdf_path):
+    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    # Per-thread dot-name so concurrent exports don't collide and the file index ignores it
+    tmp_path = os.path.join(os.path.dirname(pdf_path), f".{os.path.basename(pdf_path)}.{threading.get_ident()}.tmp")
+    try:
+        # A hard link costs nothing; the cache may evict its name without affecting this one
+        os.link(cached_path, tmp_path)
+    except OSError:
+        shutil.copyfile(cached_path, tmp_path)
+    os.replace(tmp_path, pdf_path)
+
 @app.get("/cloud-sync/status")
 def get_sync_status():
     return {
@@ -427,71 +832,76 @@ async def upload_to_drive(filename: str):
     if not cloud.service:
         raise HTTPException(status_code=401, detail="Not authenticated with Google Drive")
     
+    await io.run(file_mgr.flush, filename)
     file_path = os.path.join(UPLOAD_DIR, filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
     
-    file_id = cloud.upload_file(file_path)
+    file_id = await io.run(_upload_to_drive, filename, file_path)
     if not file_id:
         raise HTTPException(status_code=500, detail="Failed to upload file to Google Drive")
     
     return {"file_id": file_id}
 
+def _upload_to_drive(filename, file_path):
+    if not file_mgr.is_compressed(filename):
+        return cloud.upload_file(file_path)
+    # Drive gets the text, not the compressed storage format
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain_path = os.path.join(tmp_dir, os.path.basename(filename))
+        with open(plain_path, 'w', encoding='utf-8') as f:
+            f.write(file_mgr.load_file(filename))
+        return cloud.upload_file(plain_path)
+
 @app.get("/api/novel/load/{filename:path}")
 async def load_novel_content(filename: str):
-    print(f"Loading novel file: {filename}")  # Debug log
+    logger.debug("load_novel_content filename=%s", filename)
     
     # Ensure the filename has .txt extension
     if not filename.endswith('.txt'):
         filename += '.txt'
     
     try:
-        # Try to load from the documents folder first
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            print(f"Loaded content length: {len(content)}")  # Debug log
-            return {"content": content}
-        
-        # If not found in documents, try the file manager
-        content = file_mgr.load_file(filename)
-        if content == "":
-            print(f"File not found: {filename}")  # Debug log
+        # The file manager serves buffered saves and cached content
+        content = await io.run(file_mgr.load_file, filename)
+        if content == "" and not os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+            logger.debug("load_novel_content missing filename=%s", filename)
             raise HTTPException(status_code=404, detail="File not found")
-        
-        print(f"Loaded content length: {len(content)}")  # Debug log
         return {"content": content}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error in load_novel_content: {str(e)}")  # Debug log
+        logger.error("load_novel_content failed filename=%s error=%s", filename, e)
         raise HTTPException(status_code=500, detail=f"Failed to load file: {str(e)}")
 
 @app.get("/api/journal/{day}")
-def get_journal_entries(day: str):
+async def get_journal_entries(day: str):
     try:
-        # Create directory for the day if it doesn't exist
-        day_dir = os.path.join(UPLOAD_DIR, day.lower())
-        os.makedirs(day_dir, exist_ok=True)
-        
-        # Get all entries for the day
-        entries = []
-        if os.path.exists(day_dir):
-            for filename in os.listdir(day_dir):
-                if filename.endswith('.txt'):
-                    with open(os.path.join(day_dir, filename), 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        entry_id = filename.replace('.txt', '')
-                        entries.append({
-                            'id': entry_id,
-                            'title': f'Entry {len(entries) + 1}',
-                            'content': content,
-                            'date': os.path.getmtime(os.path.join(day_dir, filename))
-                        })
-        
-        return {"entries": entries}
+        return {"entries": await io.run(_read_journal_day, day)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load journal entries: {str(e)}")
 
+def _read_journal_day(day):
+    file_mgr.flush()
+    # Create directory for the day if it doesn't exist
+    day_dir = os.path.join(UPLOAD_DIR, day.lower())
+    os.makedirs(day_dir, exist_ok=True)
+    
+    # Get all entries for the day
+    entries = []
+    for filename in os.listdir(day_dir):
+        if filename.endswith('.txt'):
+            content = file_mgr.load_file(os.path.join(day.lower(), filename))
+            entry_id = filename.replace('.txt', '')
+            entries.append({
+                'id': entry_id,
+                'title': f'Entry {len(entries) + 1}',
+                'content': content,
+                'date': os.path.getmtime(os.path.join(day_dir, filename))
+            })
+    return entries
+
 @app.post("/api/journal/save-entry")
 async def save_journal_entry(request: Request):
     data = await request.json()
@@ -502,15 +912,7 @@ async def save_journal_entry(request: Request):
         raise HTTPException(status_code=400, detail="Filename and content are required")
     
     try:
-        # Ensure the directory exists
-        directory = os.path.dirname(os.path.join(UPLOAD_DIR, filename))
-        os.makedirs(directory, exist_ok=True)
-        
-        # Save the file
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
+        await io.run(file_mgr.save_file, filename, content)
         return {"status": "saved", "filename": filename}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save journal entry: {str(e)}")
@@ -524,9 +926,7 @@ async def delete_journal_entry(request: Request):
         raise HTTPException(status_code=400, detail="Filename is required")
     
     try:
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if await io.run(file_mgr.delete_file, filename):
             return {"status": "deleted"}
         else:
             raise HTTPException(status_code=404, detail="File not found")
@@ -536,34 +936,34 @@ async def delete_journal_entry(request: Request):
 @app.get("/api/novel/chapters")
 async def get_novel_chapters():
     try:
-        # Get all .txt files from the documents folder
-        files = [f for f in os.listdir(UPLOAD_DIR) if f.endswith('.txt')]
-        # Sort files by creation time
-        files.sort(key=lambda x: os.path.getctime(os.path.join(UPLOAD_DIR, x)), reverse=True)
-        return {"chapters": files}
+        return {"chapters": await io.run(_list_chapters)}
     except Exception as e:
-        print(f"Error getting chapters: {str(e)}")
+        logger.error("get_novel_chapters failed error=%s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get chapters: {str(e)}")
 
+def _list_chapters():
+    file_mgr.flush()
+    # Get all .txt files from the documents folder
+    files = [f for f in os.listdir(UPLOAD_DIR) if f.endswith('.txt')]
+    # Sort files by creation time
+    files.sort(key=lambda x: os.path.getctime(os.path.join(UPLOAD_DIR, x)), reverse=True)
+    return files
+
 @app.post("/api/file/rename")
 async def rename_file_api(oldName: str = Body(...), newName: str = Body(...)):
     try:
         old_path = os.path.join(UPLOAD_DIR, oldName)
         new_path = os.path.join(UPLOAD_DIR, newName)
         
-        if not os.path.exists(old_path):
+        await io.run(file_mgr.flush, oldName)
+        if not await io.run(os.path.exists, old_path):
             raise HTTPException(status_code=404, detail="File not found")
             
-        if os.path.exists(new_path):
+        if await io.run(os.path.exists, new_path):
             raise HTTPException(status_code=400, detail="A file with the new name already exists")
             
-        os.rename(old_path, new_path)
+        await io.run(file_mgr.rename_file, oldName, newName)
         return {"status": "success", "message": "File renamed successfully"}
     except Exception as e:
-        print(f"Error renaming file: {str(e)}")
+        logger.error("rename_file_api failed old=%s new=%s error=%s", oldName, newName, e)
         raise HTTPException(status_code=500, detail=f"Failed to rename file: {str(e)}")
-
-    # Allow running with: python main.py
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,185 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Modules record into the shared metrics defined at the bottom of this file;
+``MetricsMiddleware`` records per-route HTTP traffic and ``render()``
+produces the body served at /metrics.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + body + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and body sizes per route template."""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500}
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            route = self._route_template(scope)
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUEST_BYTES.observe(sizes["request"], method=method, route=route)
+            HTTP_RESPONSE_BYTES.observe(sizes["response"], method=method, route=route)
+
+    def _route_template(self, scope):
+        # Label by template ("/api/file/{filename:path}") so paths don't explode the label set
+        route = scope.get("route")
+        if route is not None and hasattr(route, "path"):
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            app = scope.get("app")
+            self._route_paths = {
+                getattr(r, "endpoint", None): r.path for r in getattr(app, "routes", []) if hasattr(r, "path")
+            }
+        return self._route_paths.get(endpoint, getattr(endpoint, "__name__", "unknown"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+REGISTRY = []
+
+HTTP_REQUESTS = Counter("tagore_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("tagore_http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+HTTP_REQUEST_BYTES = Histogram("tagore_http_request_size_bytes", "HTTP request body size.", ("method", "route"), SIZE_BUCKETS)
+HTTP_RESPONSE_BYTES = Histogram("tagore_http_response_size_bytes", "HTTP response body size.", ("method", "route"), SIZE_BUCKETS)
+FILE_OP_SECONDS = Histogram("tagore_file_op_duration_seconds", "FileManager disk operation latency.", ("op",))
+SQLITE_QUERY_SECONDS = Histogram("tagore_sqlite_query_duration_seconds", "SQLite query latency.", ("store", "query"))
+OPENROUTER_REQUESTS = Counter("tagore_openrouter_requests_total", "OpenRouter upstream calls by status.", ("status",))
+OPENROUTER_SECONDS = Histogram("tagore_openrouter_request_duration_seconds", "OpenRouter upstream latency.", ("status",))
+COMPONENT_STATS = Gauge("tagore_component_stat", "Point-in-time stats of caches, buffers and pools.", ("component", "stat"))
@@ -0,0 +1,137 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Serves POST /api/v1/chat/completions with the same response shapes as
+OpenRouter, including server-sent-event streaming, so the AI endpoints can
+be exercised and benchmarked offline:
+
+    python mock_openrouter.py --port 8100 --latency lognormal:0.8 --rate-limit 0.05
+    OPENROUTER_BASE_URL=http://127.0.0.1:8100/api/v1 OPENROUTER_API_KEY=mock python main.py
+
+Latency is "fixed:S", "uniform:LO:HI", "exponential:MEAN" or
+"lognormal:MEDIAN[:SIGMA]" in seconds. A share of requests can be answered
+with 429 (with Retry-After) or with a malformed body.
+"""
+import json
+import math
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+WORDS = ("the quick brown fox jumps over a lazy dog while the writer drafts "
+         "another chapter about memory, rivers and the cost of small decisions").split()
+
+class MockConfig:
+    def __init__(self, latency="fixed:0.05", rate_limit=0.0, malformed=0.0, retry_after=1,
+                 stream_chunks=20, reply_words=60, seed=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.malformed = malformed
+        self.retry_after = retry_after
+        self.stream_chunks = stream_chunks
+        self.reply_words = reply_words
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.rate_limited = 0
+        self.malformed_sent = 0
+
+    def delay(self):
+        kind, _, params = self.latency.partition(":")
+        values = [float(v) for v in params.split(":") if v]
+        if kind == "fixed":
+            return values[0] if values else 0.0
+        if kind == "uniform":
+            return self.random.uniform(values[0], values[1])
+        if kind == "exponential":
+            return self.random.expovariate(1.0 / values[0])
+        if kind == "lognormal":
+            sigma = values[1] if len(values) > 1 else 0.5
+            return self.random.lognormvariate(math.log(values[0]), sigma)
+        raise ValueError(f"Unknown latency distribution: {self.latency}")
+
+def create_app(config=None):
+    config = config or MockConfig()
+    app = FastAPI(title="Mock OpenRouter")
+    app.state.config = config
+
+    @app.post("/api/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        config.requests += 1
+        if config.random.random() < config.rate_limit:
+            config.rate_limited += 1
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Rate limit exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        malformed = config.random.random() < config.malformed
+        if malformed:
+            config.malformed_sent += 1
+        reply = _reply(body, config)
+        delay = config.delay()
+
+        if body.get("stream"):
+            return StreamingResponse(_stream(reply, delay, malformed, config), media_type="text/event-stream")
+        await asyncio.sleep(delay)
+        if malformed:
+            return PlainTextResponse('{"choices": [{"message": {"content": "truncated', media_type="application/json")
+        return {
+            "id": f"mock-{config.requests}",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        }
+
+    @app.get("/stats")
+    def stats():
+        return {"requests": config.requests, "rate_limited": config.rate_limited, "malformed": config.malformed_sent}
+
+    return app
+
+def _reply(body, config):
+    messages = body.get("messages") or []
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    if "concept map" in system:
+        # Titles come from the text so different documents get different maps
+        text = (messages[-1].get("content") or "") if messages else ""
+        words = sorted({w.strip(".,;:!?\"'()").title() for w in text.split() if len(w) > 5})[:8] or ["Idea", "Theme"]
+        nodes = [{"title": w, "type": "idea"} for w in words]
+        links = [{"sourceIndex": i, "targetIndex": i + 1, "type": "relates-to"} for i in range(len(nodes) - 1)]
+        return json.dumps({"nodes": nodes, "links": links})
+    return " ".join(config.random.choice(WORDS) for _ in range(config.reply_words))
+
+async def _stream(reply, delay, malformed, config):
+    yield ": OPENROUTER PROCESSING\n\n"
+    words = reply.split(" ")
+    size = max(1, math.ceil(len(words) / max(1, config.stream_chunks)))
+    pieces = [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "") for i in range(0, len(words), size)]
+    # Spread the latency over the stream: a quarter before the first token, the rest between pieces
+    await asyncio.sleep(delay / 4)
+    for i, piece in enumerate(pieces):
+        if malformed and i == len(pieces) // 2:
+            yield "data: {not json\n\n"
+        chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(delay * 0.75 / len(pieces))
+    yield "data: [DONE]\n\n"
+
+app = create_app()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenRouter API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:S | uniform:LO:HI | exponential:MEAN | lognormal:MEDIAN[:SIGMA]")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--malformed", type=float, default=0.0, help="share of replies with a malformed body")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--stream-chunks", type=int, default=20)
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    config = MockConfig(args.latency, args.rate_limit, args.malformed, args.retry_after,
+                        args.stream_chunks, args.reply_words, args.seed)
+    config.delay()  # fail fast on a bad --latency
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
@@ -1,8 +1,11 @@
 """OpenRouter chat client wrapper.
 
-Provides a simple `chat` function that accepts a list of messages
+Provides an async `achat` function that accepts a list of messages
 [{"role": "user"|"assistant"|"system", "content": "..."}, ...]
-and returns the assistant reply string.
+and returns the assistant reply string, plus a blocking `chat` with the
+same signature. Both reuse pooled keep-alive connections (HTTP/2 when the
+h2 package is installed); pool size and timeouts come from the
+OPENROUTER_* environment variables below.
 
 Loads OPENROUTER_API_KEY from a .env file (python-dotenv).
 """
@@ -11,16 +14,26 @@ from __future__ import annotations
 import os
 import json
 import time
-from typing import List, Dict, Any
+import asyncio
+import logging
+import threading
+import weakref
+from typing import List, Dict, Any, Optional, AsyncIterator
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
+from metrics import OPENROUTER_REQUESTS, OPENROUTER_SECONDS
+
+logger = logging.getLogger(__name__)
+
 # Load .env from the backend folder so the key is found regardless of process cwd
 _here = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(dotenv_path=os.path.join(_here, ".env"))
 
-BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Point OPENROUTER_BASE_URL at mock_openrouter.py (e.g. http://127.0.0.1:8100/api/v1) to run offline
+API_BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+BASE_URL = f"{API_BASE}/chat/completions"
 # Use OPENROUTER_MODEL from .env, or fall back to this default
 DEFAULT_MODEL = os.getenv("OPENROUTER_MODEL", "tngtech/deepseek-r1t2-chimera:free")
 SYSTEM_PROMPT = (
@@ -29,9 +42,58 @@ SYSTEM_PROMPT = (
 )
 
 
+# Connection pool and timeouts shared by every AI endpoint
+MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+POOL_TIMEOUT = float(os.getenv("OPENROUTER_POOL_TIMEOUT", "10"))
+
+try:
+    import h2  # noqa: F401  (httpx only needs it importable)
+    HTTP2 = os.getenv("OPENROUTER_HTTP2", "1") != "0"
+except ImportError:  # optional: without it connections stay on HTTP/1.1 keep-alive
+    HTTP2 = False
+
+# Tests swap in an httpx.MockTransport here
+_transport = None
+_sync_client: Optional[httpx.Client] = None
+# An async client's pool belongs to the event loop it was first used on
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
 
 class OpenRouterError(Exception):
-    pass
+    """Any failed OpenRouter call.
+
+    ``status_code`` is the upstream HTTP status when there was one and
+    ``retry_after`` the delay in seconds it asked for. ``retryable`` marks
+    failures worth retrying: rate limits, server errors and network errors.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        if retryable is None:
+            retryable = status_code is not None and (status_code == 429 or status_code >= 500)
+        self.retryable = retryable
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 def _get_api_key() -> str:
     key = (os.getenv("OPENROUTER_API_KEY") or "").strip()
@@ -39,19 +101,41 @@ def _get_api_key() -> str:
         raise OpenRouterError("Missing or invalid OPENROUTER_API_KEY. Set it in backend/.env")
     return key
 
-def chat(messages: List[Dict[str, str]], *, model: str = DEFAULT_MODEL, temperature: float = 0.7, max_tokens: int = 3000) -> str:
-    """Send a chat completion request to OpenRouter.
+def _client_options() -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT),
+        # Ignore system proxy settings so OpenRouter is reached directly
+        "trust_env": False,
+        "http2": HTTP2,
+    }
 
-    Args:
-        messages: List of {role, content}. A system prompt is injected if not already present.
-        model: Model identifier.
-        temperature: Sampling temperature.
-        max_tokens: Response token cap (advisory depending on model behavior).
-    Returns:
-        Assistant message content string.
-    Raises:
-        OpenRouterError on any failure.
-    """
+def _get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            options = _client_options()
+            if _transport is not None:
+                options["transport"] = _transport
+            client = _async_clients[loop] = httpx.AsyncClient(**options)
+        return client
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    with _clients_lock:
+        if _sync_client is None:
+            options = _client_options()
+            if _transport is not None:
+                options["transport"] = _transport
+            _sync_client = httpx.Client(**options)
+        return _sync_client
+
+def _prepare(messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int):
     if not isinstance(messages, list):  # Basic validation
         raise OpenRouterError("messages must be a list")
 
@@ -80,29 +164,16 @@ def chat(messages: List[Dict[str, str]], *, model: str = DEFAULT_MODEL, temperat
         "X-Title": "Tagore Writing Assistant",
         "Content-Type": "application/json",
     }
+    return payload, headers
 
-    try:
-        start = time.time()
-        # Use a session that ignores system proxy (trust_env=False) so OpenRouter is reached directly
-        session = requests.Session()
-        session.trust_env = False
-        resp = session.post(
-            BASE_URL,
-            headers=headers,
-            data=json.dumps(payload),
-            timeout=60,
-        )
-        duration = time.time() - start
-    except requests.RequestException as e:
-        raise OpenRouterError(f"Network error: {e}") from e
-
+def _parse(resp: httpx.Response, duration: float) -> str:
     if resp.status_code >= 400:
         # Try to parse JSON error detail
         try:
             detail = resp.json()
         except Exception:  # pragma: no cover - defensive
             detail = resp.text
-        raise OpenRouterError(f"OpenRouter error {resp.status_code}: {detail}")
+        raise OpenRouterError(f"OpenRouter error {resp.status_code}: {detail}", resp.status_code, _retry_after(resp))
 
     try:
         data = resp.json()
@@ -120,4 +191,106 @@ def chat(messages: List[Dict[str, str]], *, model: str = DEFAULT_MODEL, temperat
         raise OpenRouterError("Empty assistant response")
     return content
 
-__all__ = ["chat", "OpenRouterError"]
+async def achat(messages: List[Dict[str, str]], *, model: str = DEFAULT_MODEL, temperature: float = 0.7, max_tokens: int = 3000) -> str:
+    """Send a chat completion request to OpenRouter without blocking the event loop.
+
+    Args:
+        messages: List of {role, content}. A system prompt is injected if not already present.
+        model: Model identifier.
+        temperature: Sampling temperature.
+        max_tokens: Response token cap (advisory depending on model behavior).
+    Returns:
+        Assistant message content string.
+    Raises:
+        OpenRouterError on any failure.
+    """
+    payload, headers = _prepare(messages, model, temperature, max_tokens)
+    start = time.time()
+    try:
+        resp = await _get_async_client().post(BASE_URL, headers=headers, json=payload)
+        duration = time.time() - start
+    except httpx.HTTPError as e:
+        _record_upstream("network_error", time.time() - start, model)
+        raise OpenRouterError(f"Network error: {e}", retryable=True) from e
+    _record_upstream(resp.status_code, duration, model)
+    return _parse(resp, duration)
+
+async def astream_chat(messages: List[Dict[str, str]], *, model: str = DEFAULT_MODEL, temperature: float = 0.7, max_tokens: int = 3000) -> AsyncIterator[str]:
+    """Like `achat`, but yields the reply piece by piece as OpenRouter streams it.
+
+    Closing the generator early (e.g. the browser went away) closes the
+    upstream connection, which stops the generation.
+    """
+    payload, headers = _prepare(messages, model, temperature, max_tokens)
+    payload["stream"] = True
+    start = time.time()
+    status: Any = "network_error"
+    received = False
+    try:
+        async with _get_async_client().stream("POST", BASE_URL, headers=headers, json=payload) as resp:
+            status = resp.status_code
+            if resp.status_code >= 400:
+                body = (await resp.aread()).decode("utf-8", "replace")
+                raise OpenRouterError(f"OpenRouter error {resp.status_code}: {body[:500]}", resp.status_code, _retry_after(resp))
+            async for line in resp.aiter_lines():
+                # Server-sent events: "data: {...}" lines; ":" lines are keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    logger.warning("openrouter stream skipped malformed chunk=%r", data[:200])
+                    continue
+                if chunk.get("error"):
+                    raise OpenRouterError(f"OpenRouter stream error: {chunk['error']}")
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    received = True
+                    yield delta
+    except httpx.HTTPError as e:
+        raise OpenRouterError(f"Network error: {e}", retryable=True) from e
+    except (GeneratorExit, asyncio.CancelledError):
+        status = "cancelled"
+        raise
+    finally:
+        _record_upstream(status, time.time() - start, model)
+    if not received:
+        raise OpenRouterError("Empty assistant response")
+
+def chat(messages: List[Dict[str, str]], *, model: str = DEFAULT_MODEL, temperature: float = 0.7, max_tokens: int = 3000) -> str:
+    """Blocking form of `achat` for scripts and tests, on its own pooled client."""
+    payload, headers = _prepare(messages, model, temperature, max_tokens)
+    start = time.time()
+    try:
+        resp = _get_sync_client().post(BASE_URL, headers=headers, json=payload)
+        duration = time.time() - start
+    except httpx.HTTPError as e:
+        _record_upstream("network_error", time.time() - start, model)
+        raise OpenRouterError(f"Network error: {e}", retryable=True) from e
+    _record_upstream(resp.status_code, duration, model)
+    return _parse(resp, duration)
+
+async def aclose() -> None:
+    """Close pooled connections; called on application shutdown."""
+    global _sync_client
+    with _clients_lock:
+        clients = list(_async_clients.items())
+        _async_clients.clear()
+        sync_client, _sync_client = _sync_client, None
+    loop = asyncio.get_running_loop()
+    for client_loop, client in clients:
+        if client_loop is loop:
+            await client.aclose()
+    if sync_client is not None:
+        sync_client.close()
+
+def _record_upstream(status, duration: float, model: str) -> None:
+    OPENROUTER_REQUESTS.inc(status=status)
+    OPENROUTER_SECONDS.observe(duration, status=status)
+    logger.info("openrouter call model=%s status=%s duration=%.3f", model, status, duration)
+
+__all__ = ["achat", "astream_chat", "chat", "aclose", "OpenRouterError"]
@@ -0,0 +1,180 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from metrics import FILE_OP_SECONDS
+
+# Bump when rendering changes so cached PDFs from the old layout are not reused
+RENDER_VERSION = 1
+DEFAULT_OPTIONS = {"font": "Arial", "font_size": 12, "line_height": 6, "margin": 15}
+# Core fonts FPDF can render without a font file, and the accepted (min, max) of numeric options
+FONTS = ("Arial", "Helvetica", "Times", "Courier")
+OPTION_RANGES = {"font_size": (4, 96), "line_height": (1, 100), "margin": (0, 80)}
+
+def render_pdf(content, options):
+    """Lay out ``content`` as a PDF and return its bytes. Runs in a worker process."""
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_margins(options["margin"], options["margin"], options["margin"])
+    pdf.set_auto_page_break(True, options["margin"])
+    pdf.add_page()
+    pdf.set_font(options["font"], size=options["font_size"])
+    # The core fonts are latin-1 only; anything else becomes "?" rather than failing the export
+    text = content.encode("latin-1", "replace").decode("latin-1")
+    # multi_cell flows and wraps each paragraph to the page width
+    pdf.multi_cell(0, options["line_height"], text)
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+class PDFExporter:
+    """Renders PDFs in a process pool and keeps them in a size-bounded disk cache.
+
+    Cached files are keyed by a hash of the content and render options, so
+    exporting an unchanged document again is a file lookup. Identical exports
+    running at the same time share one render.
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, workers=2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.workers = workers
+        os.makedirs(cache_dir, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._renders = {}
+        self.hits = 0
+        self.misses = 0
+
+    def options(self, overrides=None):
+        """Render options with ``overrides`` applied; raises ValueError for bad values."""
+        if overrides is None:
+            overrides = {}
+        if not isinstance(overrides, dict):
+            raise ValueError("options must be an object")
+        options = dict(DEFAULT_OPTIONS)
+        for key, value in overrides.items():
+            if key not in DEFAULT_OPTIONS:
+                continue
+            if isinstance(value, bool):
+                raise ValueError(f"{key} must be a {type(DEFAULT_OPTIONS[key]).__name__}")
+            try:
+                value = type(DEFAULT_OPTIONS[key])(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a {type(DEFAULT_OPTIONS[key]).__name__}")
+            if key == "font" and value not in FONTS:
+                raise ValueError(f"font must be one of {', '.join(FONTS)}")
+            if key in OPTION_RANGES:
+                low, high = OPTION_RANGES[key]
+                if not low <= value <= high:
+                    raise ValueError(f"{key} must be between {low} and {high}")
+            options[key] = value
+        return options
+
+    def cache_key(self, content, options):
+        h = hashlib.sha256()
+        h.update(json.dumps([RENDER_VERSION, options], sort_keys=True).encode("utf-8"))
+        h.update(content.encode("utf-8"))
+        return h.hexdigest()
+
+    async def export(self, content, options=None):
+        """Path of a PDF rendering of ``content``, from the cache when possible."""
+        options = self.options(options)
+        key = self.cache_key(content, options)
+        path = self.cached(key)
+        if path is not None:
+            return path
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            render = self._renders.get(key)
+            if render is None:
+                render = self._renders[key] = loop.create_task(self._render(key, content, options))
+                render.add_done_callback(lambda _: self._renders.pop(key, None))
+        return await asyncio.shield(render)
+
+    def export_blocking(self, content, options=None):
+        """Synchronous ``export`` for worker threads; waits on the process pool."""
+        options = self.options(options)
+        key = self.cache_key(content, options)
+        path = self.cached(key)
+        if path is not None:
+            return path
+        with FILE_OP_SECONDS.time(op="pdf_render"):
+            if self.workers > 0:
+                data = self._executor().submit(render_pdf, content, options).result()
+            else:
+                data = render_pdf(content, options)
+        return self.store(key, data)
+
+    async def _render(self, key, content, options):
+        loop = asyncio.get_running_loop()
+        with FILE_OP_SECONDS.time(op="pdf_render"):
+            if self.workers > 0:
+                data = await loop.run_in_executor(self._executor(), render_pdf, content, options)
+            else:
+                data = await loop.run_in_executor(None, render_pdf, content, options)
+        return await loop.run_in_executor(None, self.store, key, data)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Forking the threaded server could deadlock a worker on an inherited lock
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def cached(self, key):
+        path = os.path.join(self.cache_dir, key + ".pdf")
+        try:
+            # Touch on hit so eviction drops the least recently used PDFs
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def store(self, key, data):
+        path = os.path.join(self.cache_dir, key + ".pdf")
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pdf"):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "rendering": len(self._renders)}
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
@@ -0,0 +1,145 @@
+import os
+import re
+import logging
+import sqlite3
+import threading
+from metrics import SQLITE_QUERY_SECONDS
+
+class SearchIndex:
+    """Full-text index over the documents store, kept in SQLite FTS5.
+
+    Documents are indexed as FileManager reports saves, deletes and renames.
+    The (mtime_ns, size) recorded for each document lets ``sync`` bring the
+    index up to date after a restart by re-reading only what changed.
+    """
+
+    def __init__(self, db_path="search.db"):
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_documents (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER, size INTEGER)"
+            )
+            # rowid of the FTS row is the id of its search_documents row
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(content, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def handle_file_event(self, event, path, content=None, meta=None, new_path=None):
+        """FileManager listener keeping the index in step with the documents store."""
+        if event == "saved":
+            self.index_document(path, content or "", meta)
+        elif event == "deleted":
+            self.remove_document(path)
+        elif event == "renamed":
+            self.move_document(path, new_path)
+
+    def index_document(self, path, content, meta=None):
+        mtime_ns, size = meta if meta else (None, None)
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="search", query="index"), self._conn:
+            row = self._conn.execute("SELECT id FROM search_documents WHERE path = ?", (path,)).fetchone()
+            if row:
+                doc_id = row[0]
+                self._conn.execute("UPDATE search_documents SET mtime_ns = ?, size = ? WHERE id = ?", (mtime_ns, size, doc_id))
+                self._conn.execute("DELETE FROM search_fts WHERE rowid = ?", (doc_id,))
+            else:
+                doc_id = self._conn.execute(
+                    "INSERT INTO search_documents (path, mtime_ns, size) VALUES (?, ?, ?)", (path, mtime_ns, size)
+                ).lastrowid
+            self._conn.execute("INSERT INTO search_fts (rowid, content) VALUES (?, ?)", (doc_id, content))
+
+    def remove_document(self, path):
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="search", query="remove"), self._conn:
+            for (doc_id,) in self._conn.execute(
+                "SELECT id FROM search_documents WHERE path = ? OR substr(path, 1, ?) = ?", (path, *_prefix(path))
+            ).fetchall():
+                self._conn.execute("DELETE FROM search_fts WHERE rowid = ?", (doc_id,))
+                self._conn.execute("DELETE FROM search_documents WHERE id = ?", (doc_id,))
+
+    def move_document(self, old_path, new_path):
+        # Also covers renamed directories: every path below old_path moves with it
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="search", query="move"), self._conn:
+            rows = self._conn.execute(
+                "SELECT id, path FROM search_documents WHERE path = ? OR substr(path, 1, ?) = ?", (old_path, *_prefix(old_path))
+            ).fetchall()
+            for doc_id, path in rows:
+                moved = new_path + path[len(old_path):]
+                # The rename replaced whatever was indexed at the destination
+                for (other_id,) in self._conn.execute(
+                    "SELECT id FROM search_documents WHERE path = ? AND id != ?", (moved, doc_id)
+                ).fetchall():
+                    self._conn.execute("DELETE FROM search_fts WHERE rowid = ?", (other_id,))
+                    self._conn.execute("DELETE FROM search_documents WHERE id = ?", (other_id,))
+                self._conn.execute("UPDATE search_documents SET path = ? WHERE id = ?", (moved, doc_id))
+
+    def sync(self, file_mgr):
+        """Re-index files whose (mtime_ns, size) differ from what was indexed and drop vanished ones."""
+        current = file_mgr.file_metadata()
+        with self._lock:
+            indexed = {path: (mtime_ns, size) for path, mtime_ns, size in self._conn.execute(
+                "SELECT path, mtime_ns, size FROM search_documents"
+            )}
+        for path in indexed.keys() - current.keys():
+            self.remove_document(path)
+        changed = 0
+        for path, meta in current.items():
+            if indexed.get(path) != tuple(meta):
+                self.index_document(path, file_mgr.load_file(path), meta)
+                changed += 1
+        return changed
+
+    def search(self, query, notebook=None, limit=20, offset=0):
+        """Ranked matches for ``query``: words must all appear, "quoted phrases" match
+        exactly and a trailing * matches a prefix. Returns a list of
+        {path, score, snippet} with matches wrapped in <mark> tags.
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT d.path, bm25(search_fts) AS score, "
+            "snippet(search_fts, 0, '<mark>', '</mark>', '…', 16) "
+            "FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid "
+            "WHERE search_fts MATCH ?"
+        )
+        params = [match]
+        if notebook:
+            # Same semantics as FileManager.list_files: root files, plus paths
+            # starting with the notebook prefix
+            sql += " AND (instr(d.path, ?) = 0 OR substr(d.path, 1, ?) = ?)"
+            params.extend([os.sep, len(notebook), notebook])
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="search", query="search"):
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"path": path, "score": round(-score, 4), "snippet": snippet} for path, score, snippet in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _fts_query(query):
+    # Quote every term so user input can never be read as FTS5 syntax
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query or ""):
+        if phrase.strip():
+            terms.append('"' + phrase.replace('"', '""') + '"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.replace('"', "").rstrip("*")
+            if word:
+                terms.append('"' + word + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def _prefix(path):
+    # (length, prefix) arguments matching every path below a directory
+    prefix = path.rstrip(os.sep) + os.sep
+    return len(prefix), prefix
@@ -0,0 +1,341 @@
+"""Spell checking against a precompiled, memory-mapped word index.
+
+The index is built once from a word list (one word per line, optionally
+followed by a frequency count as in SymSpell dictionaries) and written to a
+binary file that later starts load with a single mmap:
+
+    python spell_checker.py /usr/share/dict/words spell.idx
+
+Layout after the header: sorted 64-bit hashes of every deletion variant
+(SymSpell) with the matching word ids, word counts, and the sorted words as
+UTF-8 with their offsets. Membership is a binary search over the words;
+suggestions look up the deletions of the misspelled word.
+"""
+import os
+import re
+import sys
+import mmap
+import time
+import bisect
+import struct
+import hashlib
+import logging
+import sqlite3
+import threading
+from metrics import SQLITE_QUERY_SECONDS
+
+MAGIC = b"TGSPELL1"
+# magic, max_distance, prefix_length, words, deletes, source size, source mtime_ns
+HEADER = struct.Struct("<8sIIIIQQ")
+MAX_DISTANCE = 2
+# Deletions are generated from a word's first letters only, which keeps the
+# index small; candidates are then verified against the whole word
+PREFIX_LENGTH = 7
+_TOKEN = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+_ENTRY = re.compile(r"^[^\W\d_]+(?:'[^\W\d_]+)*$")
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def _deletes(word, max_distance):
+    """``word`` and every string made by removing up to ``max_distance`` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))} - found
+        found |= frontier
+    return found
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or ``limit + 1`` once it is certain to exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def read_word_list(path):
+    """{word: count} from a word list; words are lowercased, entries with digits or symbols skipped."""
+    words = {}
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            word = parts[0].lower().replace("’", "'")
+            if not _ENTRY.match(word):
+                continue
+            count = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+            words[word] = max(words.get(word, 0), min(count, 0xFFFFFFFF))
+    return words
+
+def build_index(words_path, index_path, max_distance=MAX_DISTANCE, prefix_length=PREFIX_LENGTH):
+    """Compile ``words_path`` into a binary index at ``index_path`` (written atomically)."""
+    started = time.perf_counter()
+    counts = read_word_list(words_path)
+    encoded = sorted(word.encode("utf-8") for word in counts)
+    pairs = []
+    for i, raw in enumerate(encoded):
+        for variant in _deletes(raw.decode("utf-8")[:prefix_length], max_distance):
+            pairs.append((_hash(variant), i))
+    pairs.sort()
+
+    source = os.stat(words_path)
+    offsets = [0]
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    tmp = f"{index_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, max_distance, prefix_length, len(encoded), len(pairs), source.st_size, source.st_mtime_ns))
+        f.write(struct.pack(f"<{len(pairs)}Q", *(h for h, _ in pairs)))
+        f.write(struct.pack(f"<{len(pairs)}I", *(i for _, i in pairs)))
+        f.write(struct.pack(f"<{len(encoded)}I", *(counts[raw.decode("utf-8")] for raw in encoded)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(b"".join(encoded))
+    os.replace(tmp, index_path)
+    logging.getLogger(__name__).info("spell index built words=%d deletes=%d seconds=%.2f",
+                                     len(encoded), len(pairs), time.perf_counter() - started)
+
+class SpellIndex:
+    """A word index written by build_index, memory-mapped read-only."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.max_distance, self.prefix_length, self.words, self.deletes,
+         self.source_size, self.source_mtime_ns) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a spell index")
+        view = memoryview(self._mmap)
+        pos = HEADER.size
+        self._hashes = view[pos:pos + 8 * self.deletes].cast("Q")
+        pos += 8 * self.deletes
+        self._ids = view[pos:pos + 4 * self.deletes].cast("I")
+        pos += 4 * self.deletes
+        self._counts = view[pos:pos + 4 * self.words].cast("I")
+        pos += 4 * self.words
+        self._offsets = view[pos:pos + 4 * (self.words + 1)].cast("I")
+        self._blob = pos + 4 * (self.words + 1)
+
+    def matches(self, words_path):
+        """Whether the index was built from ``words_path`` as it is now."""
+        source = os.stat(words_path)
+        return (source.st_size, source.st_mtime_ns) == (self.source_size, self.source_mtime_ns)
+
+    def word(self, i):
+        return self._mmap[self._blob + self._offsets[i]:self._blob + self._offsets[i + 1]].decode("utf-8")
+
+    def count(self, i):
+        return self._counts[i]
+
+    def __len__(self):
+        return self.words
+
+    def __contains__(self, word):
+        target = word.encode("utf-8")
+        lo, hi = 0, self.words
+        while lo < hi:
+            mid = (lo + hi) // 2
+            raw = self._mmap[self._blob + self._offsets[mid]:self._blob + self._offsets[mid + 1]]
+            if raw < target:
+                lo = mid + 1
+            elif raw > target:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def candidates(self, word, max_distance):
+        """Ids of words sharing a deletion variant with ``word``'s prefix."""
+        ids = set()
+        for variant in _deletes(word[:self.prefix_length], min(max_distance, self.max_distance)):
+            h = _hash(variant)
+            i = bisect.bisect_left(self._hashes, h)
+            while i < self.deletes and self._hashes[i] == h:
+                ids.add(self._ids[i])
+                i += 1
+        return ids
+
+    def close(self):
+        for view in (self._hashes, self._ids, self._counts, self._offsets):
+            view.release()
+        self._mmap.close()
+
+class SpellChecker:
+    """Spelling checks and suggestions from a SpellIndex plus per-user dictionaries.
+
+    Custom words live in SQLite and are kept in memory per user once used,
+    together with their own deletion index for suggestions. Without an index
+    the checker is unavailable.
+    """
+
+    def __init__(self, index=None, user_db="user_words.db", max_distance=MAX_DISTANCE, max_suggestions=5):
+        self.index = index
+        self.max_distance = max_distance
+        self.max_suggestions = max_suggestions
+        self.logger = logging.getLogger(__name__)
+        self._users = {}  # user -> (words, {deletion variant: {words}})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(user_db, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self.lookups = 0
+        self.create_table()
+
+    @classmethod
+    def open(cls, words_path, index_path, **kwargs):
+        """Load ``index_path``, (re)building it first when ``words_path`` is newer."""
+        index = None
+        if os.path.exists(index_path):
+            try:
+                index = SpellIndex(index_path)
+            except (OSError, ValueError, struct.error) as e:
+                logging.getLogger(__name__).warning("spell index unreadable path=%s error=%s", index_path, e)
+        if words_path and os.path.exists(words_path) and (index is None or not index.matches(words_path)):
+            if index is not None:
+                index.close()
+            build_index(words_path, index_path)
+            index = SpellIndex(index_path)
+        return cls(index, **kwargs)
+
+    @property
+    def available(self):
+        return self.index is not None
+
+    def create_table(self):
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS user_words (user TEXT NOT NULL, word TEXT NOT NULL, PRIMARY KEY (user, word))")
+
+    def _user(self, user):
+        if not user:
+            return set(), {}
+        with self._lock:
+            entry = self._users.get(user)
+            if entry is None:
+                with SQLITE_QUERY_SECONDS.time(store="user_words", query="get"):
+                    words = {row[0] for row in self._conn.execute("SELECT word FROM user_words WHERE user = ?", (user,))}
+                entry = self._users[user] = (words, _deletion_index(words, self.max_distance))
+            return entry
+
+    def user_words(self, user):
+        return sorted(self._user(user)[0])
+
+    def add_words(self, user, words):
+        words = {w.strip().lower().replace("’", "'") for w in words if w and w.strip()}
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="user_words", query="put"), self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO user_words (user, word) VALUES (?, ?)", [(user, w) for w in words])
+            self._users.pop(user, None)
+        return self.user_words(user)
+
+    def remove_words(self, user, words):
+        words = {w.strip().lower().replace("’", "'") for w in words if w and w.strip()}
+        with self._lock, SQLITE_QUERY_SECONDS.time(store="user_words", query="delete"), self._conn:
+            self._conn.executemany("DELETE FROM user_words WHERE user = ? AND word = ?", [(user, w) for w in words])
+            self._users.pop(user, None)
+        return self.user_words(user)
+
+    def known(self, word, user=None):
+        return self._known(word.lower().replace("’", "'"), self._user(user)[0])
+
+    def _known(self, word, custom):
+        self.lookups += 1
+        if word in custom or word in self.index:
+            return True
+        # Possessives of known words ("Frodo's" once "frodo" is known)
+        return word.endswith("'s") and (word[:-2] in custom or word[:-2] in self.index)
+
+    def suggest(self, word, user=None, limit=None):
+        """Up to ``limit`` known words closest to ``word``, nearest and most frequent first."""
+        return self._suggest(word, self._user(user), limit or self.max_suggestions)
+
+    def _suggest(self, word, custom, limit):
+        lower = word.lower().replace("’", "'")
+        scored = {}
+        for i in self.index.candidates(lower, self.max_distance):
+            candidate = self.index.word(i)
+            distance = edit_distance(lower, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                scored[candidate] = (distance, -self.index.count(i))
+        words, deletions = custom
+        for variant in _deletes(lower[:PREFIX_LENGTH], self.max_distance):
+            for candidate in deletions.get(variant, ()):
+                distance = edit_distance(lower, candidate, self.max_distance)
+                if distance <= self.max_distance:
+                    # The user's own words win ties with the dictionary
+                    scored[candidate] = (distance, -0xFFFFFFFF - 1)
+        best = sorted(scored, key=lambda w: (scored[w], w))[:limit]
+        return [_match_case(w, word) for w in best]
+
+    def check(self, text, user=None):
+        """Misspelled words in ``text`` with offsets and suggestions, in one pass.
+
+        Each distinct word is looked up (and given suggestions) once however
+        often it occurs.
+        """
+        custom = self._user(user)
+        verdicts = {}
+        misspellings = []
+        total = 0
+        for match in _TOKEN.finditer(text or ""):
+            token = match.group()
+            total += 1
+            if len(token) < 2 or (token.isupper() and len(token) <= 5):
+                # Single letters and acronyms
+                continue
+            key = token.lower().replace("’", "'")
+            if key not in verdicts:
+                verdicts[key] = None if self._known(key, custom[0]) else self._suggest(key, custom, self.max_suggestions)
+            suggestions = verdicts[key]
+            if suggestions is not None:
+                misspellings.append({
+                    "word": token,
+                    "offset": match.start(),
+                    "length": len(token),
+                    "suggestions": [_match_case(s, token) for s in suggestions],
+                })
+        return {"misspellings": misspellings, "words": total, "unique": len(verdicts)}
+
+    def stats(self):
+        return {
+            "words": len(self.index) if self.index is not None else 0,
+            "deletes": self.index.deletes if self.index is not None else 0,
+            "users_loaded": len(self._users),
+            "lookups": self.lookups,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        if self.index is not None:
+            self.index.close()
+
+def _deletion_index(words, max_distance):
+    index = {}
+    for word in words:
+        for variant in _deletes(word[:PREFIX_LENGTH], max_distance):
+            index.setdefault(variant, set()).add(word)
+    return index
+
+def _match_case(suggestion, original):
+    if original.isupper() and len(original) > 1:
+        return suggestion.upper()
+    if original[:1].isupper():
+        return suggestion[:1].upper() + suggestion[1:]
+    return suggestion
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python spell_checker.py WORD_LIST INDEX_PATH")
+    logging.basicConfig(level=logging.INFO)
+    build_index(sys.argv[1], sys.argv[2])
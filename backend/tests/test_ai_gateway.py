@@ -0,0 +1,146 @@
+import sys
+import os
+import asyncio
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from ai_gateway import AIGateway, PriorityLimiter, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from openrouter_client import OpenRouterError
+
+def test_identical_requests_share_one_call():
+    calls = []
+
+    async def chat(messages, **kwargs):
+        calls.append(messages)
+        await asyncio.sleep(0.01)
+        return "reply"
+
+    gateway = AIGateway(chat)
+
+    async def main():
+        same = [{"role": "user", "content": "hi"}]
+        return await asyncio.gather(*(gateway.chat(same, session=str(i)) for i in range(5)),
+                                    gateway.chat([{"role": "user", "content": "other"}]))
+
+    assert asyncio.run(main()) == ["reply"] * 6
+    assert len(calls) == 2
+    assert gateway.stats()["coalesced"] == 4
+
+def test_limiter_serves_priority_and_respects_sessions():
+    limiter = PriorityLimiter(max_concurrent=1, per_session=1)
+    order = []
+
+    async def user(name, session, priority):
+        await limiter.acquire(session, priority)
+        order.append(name)
+        await asyncio.sleep(0.01)
+        limiter.release(session)
+
+    async def main():
+        await limiter.acquire("a")
+        tasks = [asyncio.ensure_future(user("bulk", "b", PRIORITY_BULK)),
+                 asyncio.ensure_future(user("chat", "c", PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0)
+        limiter.release("a")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["chat", "bulk"]
+    assert limiter.active == 0
+
+def test_limiter_does_not_queue_behind_a_session_at_its_limit():
+    limiter = PriorityLimiter(max_concurrent=4, per_session=2)
+
+    async def main():
+        await limiter.acquire("a")
+        await limiter.acquire("a")
+        third = asyncio.ensure_future(limiter.acquire("a"))
+        await asyncio.sleep(0)
+        other = asyncio.ensure_future(limiter.acquire("b"))
+        await asyncio.wait_for(other, 1)
+        assert not third.done() and limiter.active == 3
+        limiter.release("a")
+        await third
+        limiter.release("a")
+        limiter.release("a")
+        limiter.release("b")
+
+    asyncio.run(main())
+    assert limiter.active == 0 and limiter.waiting() == 0
+
+def test_retries_rate_limits_then_opens_breaker():
+    attempts = []
+
+    async def chat(messages, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OpenRouterError("slow down", 429, retry_after=0.01)
+        if messages[0]["content"] == "ok":
+            return "fine"
+        raise OpenRouterError("upstream down", 502)
+
+    gateway = AIGateway(chat, max_retries=1, base_delay=0.001, breaker_threshold=2, breaker_cooldown=60)
+
+    async def main():
+        assert await gateway.chat([{"role": "user", "content": "ok"}]) == "fine"
+        with pytest.raises(OpenRouterError):
+            await gateway.chat([{"role": "user", "content": "fail"}])
+        with pytest.raises(OpenRouterError) as info:
+            await gateway.chat([{"role": "user", "content": "ok"}])
+        return info.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 503 and error.retry_after > 0
+    assert len(attempts) == 4
+    assert gateway.stats()["breaker_open"] == 1
+
+def test_client_errors_are_not_retried():
+    attempts = []
+
+    async def chat(messages, **kwargs):
+        attempts.append(1)
+        raise OpenRouterError("bad request", 400)
+
+    gateway = AIGateway(chat, base_delay=0.001)
+    with pytest.raises(OpenRouterError):
+        asyncio.run(gateway.chat([]))
+    assert len(attempts) == 1
+
+def test_half_open_trial_is_released():
+    replies = []
+
+    async def chat(messages, **kwargs):
+        raise replies.pop(0)
+
+    async def stream_chat(messages, **kwargs):
+        yield "partial"
+        yield "rest"
+
+    gateway = AIGateway(chat, stream_chat, max_retries=0, breaker_threshold=2, breaker_cooldown=0.05)
+
+    async def open_breaker():
+        replies.extend([OpenRouterError("down", 502), OpenRouterError("down", 502)])
+        for _ in range(2):
+            with pytest.raises(OpenRouterError):
+                await gateway.chat([{"role": "user", "content": "x"}])
+        assert gateway.breaker.state == "open"
+        await asyncio.sleep(0.06)
+
+    async def main():
+        # A client error on the trial means the upstream is answering again
+        await open_breaker()
+        replies.append(OpenRouterError("bad request", 400))
+        with pytest.raises(OpenRouterError) as info:
+            await gateway.chat([{"role": "user", "content": "bad"}])
+        assert info.value.status_code == 400
+        assert gateway.breaker.state == "closed"
+
+        # A trial stream abandoned by its client lets the next call try
+        await open_breaker()
+        tokens = gateway.stream([{"role": "user", "content": "story"}])
+        assert await tokens.__anext__() == "partial"
+        await tokens.aclose()
+        assert gateway.breaker.state == "half-open"
+        assert [d async for d in gateway.stream([{"role": "user", "content": "story"}])] == ["partial", "rest"]
+        assert gateway.breaker.state == "closed"
+
+    asyncio.run(main())
@@ -1,10 +1,37 @@
 import os
+import json
+import time
+import shutil
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
+
+# main builds its services on import: point every file they keep at a scratch
+# directory so a test run leaves the checkout alone
+DATA_DIR = tempfile.mkdtemp(prefix="tagore-api-")
+for var, name in {
+    "TAGORE_DOCUMENTS_DIR": "documents",
+    "TAGORE_DRAFTS_DB": "drafts.db",
+    "TAGORE_SEARCH_DB": "search.db",
+    "TAGORE_HISTORY_DB": "history.db",
+    "TAGORE_CONCEPT_CACHE_DB": "concept_maps.db",
+    "TAGORE_SPELL_INDEX": "spell.idx",
+    "TAGORE_SPELL_USER_DB": "user_words.db",
+}.items():
+    os.environ[var] = os.path.join(DATA_DIR, name)
+
+import main
 from main import app
+from spell_checker import SpellChecker
+from file_manager import content_hash
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def remove_data_dir():
+    yield
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
 def test_root():
     resp = client.get("/")
     assert resp.status_code == 200
@@ -32,6 +59,144 @@ def test_file_crud():
     resp = client.delete(f"/api/file/{new_filename}")
     assert resp.status_code == 200
 
+def test_file_patch():
+    filename = "apipatch.txt"
+    resp = client.post(f"/api/file/{filename}", json={"content": "one two"})
+    base_hash = resp.json()["hash"]
+    resp = client.patch(f"/api/file/{filename}", json={"base_hash": base_hash, "ops": [{"op": "insert", "pos": 3, "text": " and"}]})
+    assert resp.status_code == 200
+    assert client.get(f"/api/file/{filename}").json()["content"] == "one and two"
+    # Stale base is rejected with the current hash
+    resp = client.patch(f"/api/file/{filename}", json={"base_hash": base_hash, "ops": []})
+    assert resp.status_code == 409
+    assert resp.json()["detail"]["current_hash"] != base_hash
+    client.delete(f"/api/file/{filename}")
+    resp = client.patch(f"/api/file/{filename}", json={"base_hash": content_hash(""), "ops": []})
+    assert resp.status_code == 404
+
+def test_search():
+    filename = "apisearch.txt"
+    client.post(f"/api/file/{filename}", json={"content": "a xylophone in the attic"})
+    client.post(f"/api/file/{filename}/flush")
+    resp = client.get("/api/search", params={"q": "xylophone"})
+    assert resp.status_code == 200
+    assert filename in [r["path"] for r in resp.json()["results"]]
+    client.delete(f"/api/file/{filename}")
+    assert client.get("/api/search", params={"q": "xylophone"}).json()["results"] == []
+
+def test_compile_stream():
+    client.post("/api/file/apicompile1.txt", json={"content": "first"})
+    client.post("/api/file/apicompile2.txt", json={"content": "second"})
+    names = ["apicompile2.txt", "apicompile1.txt"]
+    resp = client.post("/api/compile", json={"filenames": names})
+    expected = "--- apicompile2.txt ---\nsecond\n--- apicompile1.txt ---\nfirst\n"
+    assert resp.json()["compiled"] == expected
+    resp = client.post("/api/compile", json={"filenames": names, "stream": True})
+    assert resp.text == expected
+    resp = client.post("/api/compile", json={"manifest": names, "stream": True, "format": "ndjson"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert resp.text.splitlines()[-1] == '{"done": true, "count": 2}'
+    for name in names:
+        client.delete(f"/api/file/{name}")
+
+def test_export_pdf():
+    resp = client.post("/api/export/pdf", json={"filename": "apiexport", "content": "Chapter one\n" * 50})
+    assert resp.status_code == 200
+    assert resp.content.startswith(b"%PDF")
+    client.delete("/api/file/apiexport.pdf")
+    for options in ("large", {"font_size": 0}):
+        resp = client.post("/api/export/pdf", json={"filename": "apiexport", "content": "x", "options": options})
+        assert resp.status_code == 400
+
+def test_export_job():
+    client.post("/api/file/apiexportjob.txt", json={"content": "bundle me"})
+    resp = client.post("/api/export/jobs", json={"filenames": ["apiexportjob.txt"], "format": "txt"})
+    assert resp.status_code == 202
+    job_id = resp.json()["id"]
+    for _ in range(100):
+        if client.get(f"/api/export/jobs/{job_id}").json()["status"] == "completed":
+            break
+        time.sleep(0.02)
+    resp = client.get(f"/api/export/jobs/{job_id}/download")
+    assert resp.text == "--- apiexportjob.txt ---\nbundle me\n"
+    assert client.post("/api/export/jobs", json={"format": "txt"}).status_code == 400
+    client.delete("/api/file/apiexportjob.txt")
+
+def test_ai_chat_stream(monkeypatch):
+    async def fake_stream(messages, **kwargs):
+        for piece in ["Once", " upon"]:
+            yield piece
+
+    monkeypatch.setattr(main, "or_stream_chat", fake_stream)
+    resp = client.post("/api/ai/chat/stream", json={"messages": [{"role": "user", "content": "story"}]})
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = resp.text.strip().split("\n\n")
+    assert events[:2] == ['data: {"delta": "Once"}', 'data: {"delta": " upon"}']
+    assert events[-1].startswith("event: done\ndata: ")
+    done = json.loads(events[-1].split("data: ", 1)[1])
+    assert done["reply"] == "Once upon" and done["context"]["dropped"] == 0
+
+def test_concept_map_cache(monkeypatch):
+    calls = []
+
+    async def fake_chat(messages, **kwargs):
+        calls.append(messages)
+        return '{"nodes": [{"title": "Frodo", "type": "character"}, {"title": "Ring", "type": "idea"}], "links": []}'
+
+    monkeypatch.setattr(main, "or_chat", fake_chat)
+    text = "Frodo carries the Ring %f" % time.time()
+    first = client.post("/api/ai/concept-map", json={"text": text}).json()
+    again = client.post("/api/ai/concept-map", json={"text": "  " + text + "\n"}).json()
+    assert first["cached"] is False and again["cached"] is True
+    assert again["nodes"] == first["nodes"]
+    assert client.post("/api/ai/concept-map", json={"text": text, "bypass_cache": True}).json()["cached"] is False
+    assert len(calls) == 2
+
+    # A reply cut off mid-object is returned but not cached
+    async def truncated_chat(messages, **kwargs):
+        calls.append(messages)
+        return '{"nodes": [{"title": "Frodo", "type": "character"}], "links": [{"sourceIndex": 0, "targ'
+
+    monkeypatch.setattr(main, "or_chat", truncated_chat)
+    text = "Frodo drops the Ring %f" % time.time()
+    first = client.post("/api/ai/concept-map", json={"text": text}).json()
+    assert first["partial"] is True and first["cached"] is False
+    assert client.post("/api/ai/concept-map", json={"text": text}).json()["cached"] is False
+    assert len(calls) == 4
+
+def test_concept_map_chunked(monkeypatch):
+    async def fake_chat(messages, **kwargs):
+        name = messages[-1]["content"].split()[-1]
+        return '{"nodes": [{"title": "%s", "type": "character"}, {"title": "Shire", "type": "place"}],' \
+               ' "links": [{"sourceIndex": 0, "targetIndex": 1}]}' % name
+
+    monkeypatch.setattr(main, "or_chat", fake_chat)
+    monkeypatch.setattr(main, "CONCEPT_CHUNK_CHARS", 60)
+    text = "\n\n".join(f"Paragraph {i} {time.time()} about Hobbit{i}" for i in range(4))
+    result = client.post("/api/ai/concept-map", json={"text": text, "chunked": True}).json()
+    assert result["chunks"] == 4 and result["cached"] is False
+    assert [n["title"] for n in result["nodes"]].count("Shire") == 1
+    assert len(result["nodes"]) == 5
+    lines = client.post("/api/ai/concept-map", json={"text": text, "chunked": True, "stream": True, "bypass_cache": True}).text.splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[-1])["complete"] is True
+
+def test_concept_map_stream(monkeypatch):
+    reply = 'Here it is: {"nodes": [{"title": "Sam", "type": "character"}, {"title": "Mordor", "type": "place"}],' \
+            ' "links": [{"sourceIndex": 0, "targetIndex": 1, "type": "extends"}]}'
+
+    async def fake_stream(messages, **kwargs):
+        for i in range(0, len(reply), 7):
+            yield reply[i:i + 7]
+
+    monkeypatch.setattr(main, "or_stream_chat", fake_stream)
+    text = "Sam walks into Mordor %f" % time.time()
+    lines = [json.loads(line) for line in client.post("/api/ai/concept-map", json={"text": text, "stream": True}).text.splitlines()]
+    assert [len(line["nodes"]) for line in lines[:2]] == [1, 2]
+    assert lines[-1]["complete"] is True and lines[-1]["links"][0]["type"] == "extends"
+    cached = client.post("/api/ai/concept-map", json={"text": text, "stream": True}).text.splitlines()
+    assert len(cached) == 1 and json.loads(cached[0])["cached"] is True
+
 def test_drafts():
     filename = "draft_api.txt"
     content = "draft content"
@@ -57,6 +222,31 @@ def test_grammar_check():
     assert resp.status_code == 200
     assert "corrections" in resp.json() or isinstance(resp.json(), dict)
 
+def test_grammar_check_batch():
+    client.post("/api/file/apigrammar1.txt", json={"content": "It is is here."})
+    client.post("/api/file/apigrammar2.txt", json={"content": "All fine."})
+    names = ["apigrammar1.txt", "apigrammar2.txt", "apigrammar-missing.txt"]
+    resp = client.post("/api/grammar-check/batch", json={"filenames": names})
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    results = {line["filename"]: line for line in lines[:-1]}
+    assert results["apigrammar1.txt"]["corrections"][0]["rule"] == "repeated"
+    assert results["apigrammar2.txt"]["corrections"] == []
+    assert results["apigrammar-missing.txt"] == {"filename": "apigrammar-missing.txt", "error": "File not found"}
+    assert lines[-1] == {"complete": True, "total": 3, "cached": 0, "failed": 1}
+    assert client.post("/api/grammar-check/batch", json={}).status_code == 400
+    client.delete("/api/file/apigrammar1.txt")
+    client.delete("/api/file/apigrammar2.txt")
+
+def test_spell_check(monkeypatch, tmp_path):
+    words = tmp_path / "words.txt"
+    words.write_text("the\ncat\nsat\n", encoding="utf-8")
+    monkeypatch.setattr(main, "spell", SpellChecker.open(str(words), str(tmp_path / "spell.idx"), user_db=":memory:"))
+    resp = client.post("/api/spell-check", json={"text": "The cta sat"})
+    assert resp.json()["misspellings"] == [{"word": "cta", "offset": 4, "length": 3, "suggestions": ["cat", "sat"]}]
+    client.post("/api/spell/dictionary", json={"user": "u1", "words": ["cta"]})
+    assert client.get("/api/spell/suggest", params={"word": "cta", "user": "u1"}).json()["known"] is True
+    main.spell.close()
+
 def test_history():
     filename = "hist.txt"
     content = "history content"
@@ -68,6 +258,13 @@ def test_history():
     assert resp.status_code == 200
     assert "history" in resp.json()
 
+def test_metrics():
+    client.get("/api/files")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'tagore_http_requests_total{method="GET",route="/api/files",status="200"}' in resp.text
+    assert "tagore_component_stat" in resp.text
+
 def test_cloud_sync_status():
     resp = client.get("/cloud-sync/status")
     assert resp.status_code == 200
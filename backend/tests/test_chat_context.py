@@ -0,0 +1,52 @@
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from chat_context import ChatContext, estimate_tokens
+from openrouter_client import SYSTEM_PROMPT, OpenRouterError
+
+def turns(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * 100} for i in range(n)]
+
+def test_short_history_is_sent_whole_with_system_prompt():
+    async def summarize(messages):
+        raise AssertionError("nothing to summarize")
+
+    context = ChatContext(summarize, budget_tokens=100000)
+    prepared, stats = asyncio.run(context.prepare(turns(3)))
+    assert prepared[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert prepared[1:] == turns(3)
+    assert stats["dropped"] == 0 and stats["messages_sent"] == 4
+
+def test_long_history_keeps_recent_turns_and_summarizes_incrementally():
+    requests = []
+
+    async def summarize(messages):
+        requests.append(messages[-1]["content"])
+        return f"summary {len(requests)}"
+
+    budget = estimate_tokens(SYSTEM_PROMPT) + 400 + 3 * 140
+    context = ChatContext(summarize, budget_tokens=budget, summary_tokens=400)
+    prepared, stats = asyncio.run(context.prepare(turns(10)))
+    assert prepared[1] == {"role": "system", "content": "Summary of the earlier conversation:\nsummary 1"}
+    assert prepared[2:] == turns(10)[-stats["messages_sent"] + 2:]
+    assert stats["estimated_tokens"] <= budget
+    assert stats["dropped"] == 10 - (stats["messages_sent"] - 2)
+
+    # Same history again: served from the cache
+    assert asyncio.run(context.prepare(turns(10)))[1]["summary_cached"] is True
+    # Two more turns: only the newly dropped ones are summarized, on top of the old summary
+    asyncio.run(context.prepare(turns(12)))
+    assert len(requests) == 2
+    assert requests[1].startswith("Previous summary:\nsummary 1")
+    assert "turn 0 " not in requests[1]
+
+def test_failed_summary_falls_back_to_dropping():
+    async def summarize(messages):
+        raise OpenRouterError("down", 503)
+
+    context = ChatContext(summarize, budget_tokens=estimate_tokens(SYSTEM_PROMPT) + 500)
+    prepared, stats = asyncio.run(context.prepare(turns(10)))
+    assert stats["summary_failed"] is True
+    assert all(m["content"] != "" for m in prepared)
+    assert prepared[-1] == turns(10)[-1]
@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from file_manager import FileManager
+from io_executor import IOExecutor
+from compiler import ManuscriptCompiler
+
+def collect(agen):
+    async def run():
+        return [chunk async for chunk in agen]
+    return asyncio.run(run())
+
+def test_streams_sections_in_order(tmp_path):
+    fm = FileManager(str(tmp_path))
+    names = [f"book/ch{i:02d}.txt" for i in range(20)]
+    for i, name in enumerate(names):
+        fm.save_file(name, f"chapter {i}")
+    io = IOExecutor(max_workers=4)
+    compiler = ManuscriptCompiler(fm, io, read_ahead=3)
+
+    text = b"".join(collect(compiler.stream_text(names))).decode()
+    assert text == "".join(f"--- {name} ---\nchapter {i}\n" for i, name in enumerate(names))
+    assert asyncio.run(compiler.compile(names)) == text
+
+    lines = [json.loads(line) for line in b"".join(collect(compiler.stream_ndjson(names))).splitlines()]
+    assert [line["filename"] for line in lines[:-1]] == names
+    assert lines[-1] == {"done": True, "count": 20}
+    io.shutdown()
+    fm.close()
+
+def test_read_ahead_is_bounded(tmp_path):
+    fm = FileManager(str(tmp_path))
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+    load = fm.load_file
+
+    def counting_load(name):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            time.sleep(0.01)
+            return load(name)
+        finally:
+            with lock:
+                in_flight["now"] -= 1
+
+    fm.load_file = counting_load
+    io = IOExecutor(max_workers=8)
+    compiler = ManuscriptCompiler(fm, io, read_ahead=2)
+    collect(compiler.stream_text([f"missing{i}.txt" for i in range(10)]))
+    assert in_flight["max"] == 2
+    io.shutdown()
+    fm.close()
+
+def test_stored_manifest(tmp_path):
+    fm = FileManager(str(tmp_path))
+    fm.save_file("novel/manifest.txt", "# running order\nb.txt\n\na.txt\n")
+    compiler = ManuscriptCompiler(fm, None)
+    assert compiler.resolve(manifest="novel/manifest.txt") == ["novel/b.txt", "novel/a.txt"]
+    fm.save_file("novel/order.json", '{"chapters": ["a.txt"]}')
+    assert compiler.resolve(manifest="novel/order.json") == ["novel/a.txt"]
+    assert compiler.resolve(["x.txt"], manifest=["y.txt"]) == ["y.txt"]
+    fm.close()
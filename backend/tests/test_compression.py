@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from compression import CompressionMiddleware
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+@app.get("/big")
+def big():
+    return {"text": "word " * 500}
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("hi")
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse((f"line {i}\n" for i in range(3)), media_type="application/x-ndjson")
+
+client = TestClient(app)
+
+def test_large_json_is_gzipped():
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert int(resp.headers["content-length"]) < 2500
+    assert resp.json()["text"].startswith("word word")
+
+def test_small_and_unnegotiated_responses_pass_through():
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+def test_streams_are_compressed_per_chunk():
+    resp = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.text == "line 0\nline 1\nline 2\n"
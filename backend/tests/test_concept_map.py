@@ -0,0 +1,133 @@
+import sys
+import os
+import time
+import asyncio
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from concept_map import (
+    ConceptMapCache, ConceptMapExtractor, build_concept_map, parse_concept_map, normalize_text, cache_key,
+    split_chunks, merge_concept_maps, iter_chunked_concept_map, iter_concept_map,
+)
+import pytest
+
+def test_parse_validates_and_extracts_json():
+    reply = 'Sure!\n```json\n{"nodes": [{"title": "Ahab", "type": "Character"}, {"title": "Whale", "type": "beast"}],' \
+            ' "links": [{"sourceIndex": 0, "targetIndex": 1, "type": "hunts"}, {"sourceIndex": 0, "targetIndex": 9}]}\n```'
+    result = parse_concept_map(reply)
+    assert result["nodes"] == [{"title": "Ahab", "type": "character"}, {"title": "Whale", "type": "default"}]
+    assert result["links"] == [{"sourceIndex": 0, "targetIndex": 1, "type": "relates-to", "label": None}]
+
+def test_extractor_emits_nodes_and_links_as_they_arrive():
+    reply = 'Map {draft} follows: {"nodes": [{"title": "A {b}", "type": "idea"}, {"title": "Say \\"hi\\"", "type": "theme"}],' \
+            ' "links": [{"sourceIndex": 0, "targetIndex": 1, "type": "supports"}]} trailing {"x": 1}'
+    extractor = ConceptMapExtractor()
+    sizes = []
+    for char in reply:
+        if extractor.feed(char):
+            graph = extractor.graph()
+            sizes.append((len(graph["nodes"]), len(graph["links"])))
+    assert sizes == [(1, 0), (2, 0), (2, 1)]
+    result = extractor.close()
+    assert [n["title"] for n in result["nodes"]] == ["A {b}", 'Say "hi"']
+    assert result["links"][0]["type"] == "supports"
+
+def test_extractor_edge_cases():
+    # A truncated reply keeps the nodes that arrived whole
+    truncated = parse_concept_map('{"nodes": [{"title": "A"}, {"title": "B"}], "links": [{"sourceIndex": 0, "targ')
+    assert [n["title"] for n in truncated["nodes"]] == ["A", "B"] and truncated["links"] == []
+    assert truncated["partial"] is True and "partial" not in parse_concept_map('{"nodes": [{"title": "A"}]}')
+    assert merge_concept_maps([truncated, {"nodes": [], "links": []}])["partial"] is True
+    # An unbalanced brace in prose does not hide the map
+    assert parse_concept_map('Use { carefully. {"nodes": [{"title": "C"}], "links": []}')["nodes"][0]["title"] == "C"
+    with pytest.raises(ValueError):
+        parse_concept_map("No JSON here, sorry.")
+    with pytest.raises(ValueError):
+        parse_concept_map('{"nodes": [')
+
+def test_iter_concept_map_streams_graphs():
+    reply = '{"nodes": [{"title": "A"}, {"title": "B"}], "links": [{"sourceIndex": 1, "targetIndex": 0}]}'
+
+    async def stream_chat(messages, **kwargs):
+        for i in range(0, len(reply), 5):
+            yield reply[i:i + 5]
+
+    async def main():
+        return [item async for item in iter_concept_map("text", stream_chat, "model")]
+
+    items = asyncio.run(main())
+    assert [complete for _, complete in items] == [False, False, False, True]
+    assert items[-1][0]["links"][0]["sourceIndex"] == 1
+
+def test_build_sends_normalized_text():
+    sent = []
+
+    async def chat(messages, **kwargs):
+        sent.append(messages[-1]["content"])
+        return '{"nodes": [], "links": []}'
+
+    text = normalize_text("  Call me\n\n Ishmael.  ")
+    assert asyncio.run(build_concept_map(text, chat, "model")) == {"nodes": [], "links": []}
+    assert sent[0].endswith("\n\nCall me Ishmael.")
+
+def test_cache_tiers_and_ttl(tmp_path):
+    db = str(tmp_path / "maps.db")
+    key = cache_key(normalize_text("text"), "model", 0.3)
+    assert key != cache_key(normalize_text("text"), "other-model", 0.3)
+    cache = ConceptMapCache(db, ttl=60)
+    cache.put(key, {"nodes": [{"title": "A", "type": "idea"}], "links": []})
+    cache.close()
+
+    # A fresh instance has an empty memory tier and reads through to disk
+    cache = ConceptMapCache(db, ttl=60)
+    assert cache.get(key)["nodes"][0]["title"] == "A"
+    assert cache.get(key) is not None
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+    cache.close()
+
+    cache = ConceptMapCache(db, ttl=0.01)
+    cache.put(key, {"nodes": [], "links": []})
+    time.sleep(0.02)
+    assert cache.get(key) is None
+    cache.close()
+
+def test_split_chunks_on_paragraphs_and_headings():
+    text = "\n\n".join(["Chapter 1", "a" * 40, "b" * 40, "Chapter 2", "c" * 40, "d" * 300 + ". " + "e" * 50])
+    chunks = split_chunks(text, max_chars=100)
+    assert chunks[0] == "Chapter 1 " + "a" * 40 + " " + "b" * 40
+    assert chunks[1] == "Chapter 2 " + "c" * 40
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert "".join(chunks).count("d") == 300
+
+def test_merge_dedups_titles_and_remaps_links():
+    first = {"nodes": [{"title": "The Ring", "type": "default"}, {"title": "Frodo", "type": "character"}],
+             "links": [{"sourceIndex": 1, "targetIndex": 0, "type": "supports", "label": None}]}
+    second = {"nodes": [{"title": "Sauron", "type": "character"}, {"title": "ring!", "type": "idea"}],
+              "links": [{"sourceIndex": 0, "targetIndex": 1, "type": "causes", "label": "forged"},
+                        {"sourceIndex": 1, "targetIndex": 0, "type": "relates-to", "label": None}]}
+    merged = merge_concept_maps([first, second])
+    assert merged["nodes"] == [{"title": "The Ring", "type": "idea"}, {"title": "Frodo", "type": "character"},
+                               {"title": "Sauron", "type": "character"}]
+    assert {(l["sourceIndex"], l["targetIndex"], l["type"]) for l in merged["links"]} == {(1, 0, "supports"), (2, 0, "causes"), (0, 2, "relates-to")}
+
+def test_chunks_are_mapped_with_bounded_concurrency():
+    state = {"running": 0, "max": 0}
+
+    async def chat(messages, **kwargs):
+        state["running"] += 1
+        state["max"] = max(state["max"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        word = messages[-1]["content"].split()[-1]
+        if word == "broken":
+            return "no json here"
+        return '{"nodes": [{"title": "%s", "type": "idea"}], "links": []}' % word
+
+    async def run():
+        chunks = [f"chunk {i}" for i in range(10)] + ["broken"]
+        return [step async for step in iter_chunked_concept_map(chunks, chat, "model", concurrency=3)]
+
+    steps = asyncio.run(run())
+    assert state["max"] == 3
+    done, failed, graph = steps[-1]
+    assert (done, failed) == (11, 1)
+    assert [node["title"] for node in graph["nodes"]] == [str(i) for i in range(10)]
@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+from delta import make_delta, apply_delta, encode_delta, decode_delta
+
+def test_delta_round_trip():
+    base = "one\ntwo\nthree\nfour"
+    target = "zero\none\nthree\nfour\nfive\n"
+    ops = decode_delta(encode_delta(make_delta(base, target)))
+    assert apply_delta(base, ops) == target
+
+def test_delta_copies_unchanged_lines():
+    base = "".join(f"line {i}\n" for i in range(1000))
+    target = base.replace("line 500\n", "changed\n")
+    ops = make_delta(base, target)
+    assert ops == [[0, 500], "changed\n", [501, 499]]
+    assert apply_delta(base, ops) == target
+
+def test_delta_is_fast_on_long_manuscripts():
+    # Prose repeats blank lines and scene breaks; a few edits must not make
+    # the diff quadratic in the document length
+    paragraphs = [f"Paragraph {i} of the manuscript, long enough to be prose.\n\n" for i in range(6000)]
+    base = "* * *\n\n".join("".join(paragraphs[i:i + 40]) for i in range(0, 6000, 40))
+    assert len(base) > 300_000
+    lines = base.splitlines(keepends=True)
+    lines[100] = "An edited opening.\n"
+    lines.insert(6000, "\n")
+    del lines[-50]
+    target = "".join(lines)
+    start = time.perf_counter()
+    ops = make_delta(base, target)
+    assert time.perf_counter() - start < 0.5
+    assert apply_delta(base, ops) == target
+    assert sum(len(op) for op in ops if isinstance(op, str)) < 100
@@ -42,4 +42,49 @@ def test_add_and_get_drafts():
     filenames = [row[1] for row in drafts]
     assert "file1.txt" in filenames
     assert "file2.txt" in filenames
-    tracker.close()  # <-- Add this line
\ No newline at end of file
+    tracker.close()  # <-- Add this line
+
+def test_keyset_pagination_and_batch_insert():
+    tracker = DraftTracker(test_db)
+    tracker.add_drafts(["page.txt"] * 5)
+    first = tracker.get_drafts(limit=2, filename="page.txt")
+    second = tracker.get_drafts(limit=2, after=first[-1][0], filename="page.txt")
+    rest = tracker.get_drafts(after=second[-1][0], filename="page.txt")
+    ids = [row[0] for row in first + second + rest]
+    assert len(ids) == 5
+    assert ids == sorted(ids, reverse=True)
+    tracker.close()
+
+def test_revisions_round_trip_through_deltas():
+    tracker = DraftTracker(test_db, keyframe_interval=4)
+    paragraphs = [f"Paragraph {i} of a long chapter.\n" for i in range(200)]
+    versions = []
+    for i in range(10):
+        paragraphs[i * 7] = f"Edited paragraph in version {i}.\n"
+        versions.append("".join(paragraphs))
+        tracker.add_draft("novel.txt", versions[-1])
+    revisions = tracker.list_revisions("novel.txt")
+    assert len(revisions) == 10
+    for revision, expected in zip(reversed(revisions), versions):
+        assert tracker.get_revision(revision["id"])["content"] == expected
+
+    conn = tracker._connect()
+    full = conn.execute("SELECT COUNT(*) FROM draft_blobs WHERE base_hash IS NULL").fetchone()[0]
+    stored = conn.execute("SELECT SUM(LENGTH(data)) FROM draft_blobs").fetchone()[0]
+    assert full == 3  # newest plus keyframes
+    assert stored < 4 * len(versions[-1])
+
+    diff = tracker.diff_revisions(revisions[1]["id"], revisions[0]["id"])
+    assert "+Edited paragraph in version 9." in diff
+    tracker.close()
+
+def test_identical_revisions_share_a_blob():
+    tracker = DraftTracker(test_db)
+    tracker.add_draft("dup.txt", "same text\n")
+    tracker.add_draft("dup.txt", "same text\n")
+    assert len(tracker.list_revisions("dup.txt")) == 2
+    digest = tracker.list_revisions("dup.txt")[0]["hash"]
+    count = tracker._connect().execute("SELECT COUNT(*) FROM draft_blobs WHERE hash = ?", (digest,)).fetchone()[0]
+    assert count == 1
+    assert tracker.get_revision(999999) is None
+    tracker.close()
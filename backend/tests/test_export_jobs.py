@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+import zipfile
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from file_manager import FileManager
+from pdf_export import PDFExporter
+from export_jobs import ExportJobs
+
+def wait(jobs, job):
+    for _ in range(200):
+        if jobs.get(job.id).finished is not None:
+            return jobs.get(job.id)
+        time.sleep(0.02)
+    raise AssertionError("export job did not finish")
+
+def make_jobs(tmp_path, **kwargs):
+    fm = FileManager(str(tmp_path / "docs"))
+    for i in range(3):
+        fm.save_file(f"novel/ch{i}.txt", f"chapter {i}")
+    fm.save_file("loose.txt", "not in the notebook")
+    exporter = PDFExporter(str(tmp_path / "cache"), workers=0)
+    return fm, ExportJobs(fm, exporter, str(tmp_path / "out"), **kwargs)
+
+def test_exports_notebook_to_each_format(tmp_path):
+    fm, jobs = make_jobs(tmp_path)
+    names = jobs.resolve(notebook="novel")
+    assert names == [os.path.join("novel", f"ch{i}.txt") for i in range(3)]
+
+    job = wait(jobs, jobs.submit(names, "txt", "novel"))
+    assert job.to_dict()["progress"] == {"done": 3, "total": 3}
+    with open(job.path, encoding="utf-8") as f:
+        assert f.read().startswith(f"--- {names[0]} ---\nchapter 0\n")
+
+    job = wait(jobs, jobs.submit(names, "pdf"))
+    with open(job.path, "rb") as f:
+        assert f.read(4) == b"%PDF"
+
+    job = wait(jobs, jobs.submit(names, "zip"))
+    with zipfile.ZipFile(job.path) as bundle:
+        assert bundle.namelist() == ["novel/ch0.pdf", "novel/ch1.pdf", "novel/ch2.pdf"]
+    jobs.shutdown()
+    fm.close()
+
+def test_cancel_and_expire(tmp_path):
+    fm, jobs = make_jobs(tmp_path, max_concurrent=1, ttl=0.5)
+    fm.load_file = lambda name, load=fm.load_file: time.sleep(0.05) or load(name)
+    first = jobs.submit(["novel/ch0.txt"] * 20, "txt")
+    second = jobs.submit(["novel/ch1.txt"], "txt")
+    assert jobs.cancel(second.id).status == "cancelled"
+    jobs.cancel(first.id)
+    assert wait(jobs, first).status == "cancelled"
+    assert not os.path.exists(os.path.join(jobs.output_dir, f"{first.id}.txt"))
+    time.sleep(0.6)
+    assert jobs.get(first.id) is None
+    jobs.shutdown()
+    fm.close()
+
+def test_idle_sweep_and_paths_outside_the_documents(tmp_path):
+    fm, jobs = make_jobs(tmp_path, ttl=0.1, sweep_interval=0.05)
+    job = wait(jobs, jobs.submit(["novel/./ch0.txt"], "zip"))
+    with zipfile.ZipFile(job.path) as bundle:
+        assert bundle.namelist() == ["novel/ch0.pdf"]
+    # Expired without another submit or get
+    time.sleep(0.4)
+    assert os.listdir(jobs.output_dir) == [] and jobs.stats()["completed"] == 0
+    for bad in (["../secret.txt"], ["novel/../../secret.txt"], [os.path.abspath("x.txt")]):
+        with pytest.raises(ValueError):
+            jobs.submit(bad, "zip")
+    jobs.shutdown()
+    fm.close()
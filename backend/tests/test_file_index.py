@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from file_index import FileIndex
+
+def _write(base, rel_path, content="x"):
+    path = os.path.join(base, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def test_lists_notebook_and_root_files(tmp_path):
+    base = str(tmp_path)
+    _write(base, "root.txt")
+    _write(base, os.path.join("Physics", "a.txt"))
+    _write(base, os.path.join("Physics", "Sub", "b.txt"))
+    _write(base, os.path.join("History", "c.txt"))
+    index = FileIndex(base)
+    files, total = index.list("Physics")
+    assert sorted(files) == sorted(["root.txt", os.path.join("Physics", "a.txt"), os.path.join("Physics", "Sub", "b.txt")])
+    assert total == 3
+
+def test_sort_and_paginate(tmp_path):
+    base = str(tmp_path)
+    for i, size in enumerate([3, 1, 2]):
+        _write(base, os.path.join("nb", f"{i}.txt"), "x" * size)
+    index = FileIndex(base)
+    files, total = index.list("nb", sort="size", reverse=True, offset=1, limit=1)
+    assert files == [os.path.join("nb", "2.txt")]
+    assert total == 3
+
+def test_refresh_picks_up_external_changes(tmp_path):
+    base = str(tmp_path)
+    _write(base, os.path.join("nb", "old.txt"))
+    index = FileIndex(base)
+    os.remove(os.path.join(base, "nb", "old.txt"))
+    _write(base, os.path.join("nb", "new", "fresh.txt"))
+    index.refresh()
+    assert index.list("nb")[0] == [os.path.join("nb", "new", "fresh.txt")]
+
+def test_exported_pdfs_are_not_indexed(tmp_path):
+    base = str(tmp_path)
+    _write(base, "story.txt")
+    changes = []
+    index = FileIndex(base, on_change=lambda rel_path, meta: changes.append(rel_path))
+    _write(base, "story.pdf", "%PDF-1.3")
+    index.add("story.pdf")
+    index.refresh()
+    assert index.list()[0] == ["story.txt"] and changes == []
+
+def test_snapshot_round_trip(tmp_path):
+    base = str(tmp_path / "docs")
+    _write(base, os.path.join("nb", "a.txt"))
+    snapshot = str(tmp_path / "index.json")
+    FileIndex(base, snapshot_path=snapshot).close()
+    index = FileIndex(base, snapshot_path=snapshot)
+    assert index.list()[0] == [os.path.join("nb", "a.txt")]
+
+def test_refresh_picks_up_files_edited_in_place(tmp_path):
+    base = str(tmp_path / "docs")
+    path = os.path.join("nb", "a.txt")
+    _write(base, path, "short")
+    snapshot = str(tmp_path / "index.json")
+    FileIndex(base, snapshot_path=snapshot).close()
+    # Edited while the server was down: the directory mtime does not change
+    _write(base, path, "a longer body")
+    changes = []
+    index = FileIndex(base, snapshot_path=snapshot, on_change=lambda rel_path, meta: changes.append((rel_path, meta)))
+    assert index.entries()[path][1] == len("a longer body")
+
+    _write(base, path, "edited in place again")
+    index.refresh(stat_files=False)
+    assert changes == []
+    index.refresh()
+    assert changes == [(path, index.entries()[path])]
+    assert index.entries()[path][1] == len("edited in place again")
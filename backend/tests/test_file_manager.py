@@ -1,7 +1,9 @@
 import sys
 import os
+import threading
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
-from file_manager import FileManager
+import pytest
+from file_manager import FileManager, PatchConflict, content_hash
 
 test_dir = "test_documents"
 
@@ -30,3 +32,114 @@ def test_list_files():
 def test_load_missing_file():
     fm = FileManager(test_dir)
     assert fm.load_file("nonexistent.txt") == ""
+
+def test_write_behind_coalesces_until_flush():
+    fm = FileManager(test_dir, write_behind=True, flush_interval=60)
+    filename = "test_write_behind.txt"
+    fm.save_file(filename, "first")
+    fm.save_file(filename, "second")
+    assert fm.load_file(filename) == "second"
+    assert not os.path.exists(os.path.join(test_dir, filename))
+    assert fm.flush(filename) == 1
+    with open(os.path.join(test_dir, filename), encoding="utf-8") as f:
+        assert f.read() == "second"
+    fm.close()
+
+def test_save_leaves_no_temp_files():
+    fm = FileManager(test_dir)
+    fm.save_file("test_atomic.txt", "atomic")
+    assert not [f for f in os.listdir(test_dir) if f.endswith(".tmp")]
+
+def test_apply_patch_and_conflict():
+    fm = FileManager(test_dir)
+    filename = "test_patch.txt"
+    fm.save_file(filename, "Hello world")
+    ops = [
+        {"op": "replace", "pos": 6, "length": 5, "text": "there"},
+        {"op": "insert", "pos": 11, "text": "!"},
+        {"op": "delete", "pos": 0, "length": 1},
+    ]
+    new_hash = fm.apply_patch(filename, content_hash("Hello world"), ops)
+    assert fm.load_file(filename) == "ello there!"
+    assert new_hash == content_hash("ello there!")
+    with pytest.raises(PatchConflict) as exc:
+        fm.apply_patch(filename, content_hash("Hello world"), ops)
+    assert exc.value.current_hash == new_hash
+
+def test_patch_positions_are_utf16_and_file_must_exist():
+    fm = FileManager(test_dir)
+    filename = "test_patch_utf16.txt"
+    fm.save_file(filename, "🐋 whale")
+    # The emoji is two UTF-16 code units, as in the editor
+    fm.apply_patch(filename, content_hash("🐋 whale"), [{"op": "replace", "pos": 3, "length": 5, "text": "ship"}])
+    assert fm.load_file(filename) == "🐋 ship"
+    with pytest.raises(ValueError):
+        fm.apply_patch(filename, content_hash("🐋 ship"), [{"op": "insert", "pos": 1, "text": "x"}])
+    with pytest.raises(FileNotFoundError):
+        fm.apply_patch("test_patch_missing.txt", content_hash(""), [{"op": "insert", "pos": 0, "text": "x"}])
+    assert not os.path.exists(os.path.join(test_dir, "test_patch_missing.txt"))
+
+def test_patch_serializes_with_saves_without_blocking_loads():
+    fm = FileManager(test_dir)
+    filename = "test_patch_lock.txt"
+    fm.save_file(filename, "abc")
+    fm.save_file("test_patch_other.txt", "other")
+    with pytest.raises(ValueError):
+        fm.apply_patch(filename, content_hash("abc"), [{"op": "insert", "pos": True, "text": "x"}])
+
+    writing = threading.Event()
+    release = threading.Event()
+    write = fm._write_files
+
+    def slow_write(items):
+        writing.set()
+        release.wait(5)
+        write(items)
+
+    fm._write_files = slow_write
+    patch = threading.Thread(target=fm.apply_patch, args=(filename, content_hash("abc"), [{"op": "insert", "pos": 3, "text": "d"}]))
+    patch.start()
+    assert writing.wait(5)
+    fm._write_files = write
+    # Other files load while the patch is on disk I/O; a save of the same file waits for it
+    assert fm.load_file("test_patch_other.txt") == "other"
+    save = threading.Thread(target=fm.save_file, args=(filename, "saved last"))
+    save.start()
+    save.join(0.1)
+    assert save.is_alive()
+    release.set()
+    patch.join()
+    save.join()
+    assert fm.load_file(filename) == "saved last"
+
+def test_load_file_uses_cache_until_file_changes():
+    fm = FileManager(test_dir)
+    filename = "test_cache.txt"
+    fm.save_file(filename, "cached")
+    assert fm.load_file(filename) == "cached"
+    assert fm.load_file(filename) == "cached"
+    assert fm.cache_stats()["hits"] == 2
+    # An external edit changes mtime/size and must not be served stale
+    with open(os.path.join(test_dir, filename), "w", encoding="utf-8") as f:
+        f.write("edited elsewhere")
+    assert fm.load_file(filename) == "edited elsewhere"
+
+def test_cache_charges_encoded_bytes():
+    fm = FileManager(test_dir, cache_bytes=1000)
+    fm.save_file("test_cache_bytes.txt", "ছ" * 400)
+    assert fm.load_file("test_cache_bytes.txt") == "ছ" * 400
+    assert fm.cache_stats()["entries"] == 0
+    fm.save_file("test_cache_bytes.txt", "ছ" * 200)
+    assert fm.cache_stats()["bytes"] == 600
+
+def test_compressed_storage_round_trip_and_plain_files_still_load():
+    fm = FileManager(test_dir, compression="gzip", compression_min_bytes=16)
+    content = "It was a dark and stormy night. " * 50
+    fm.save_file("test_compressed.txt", content)
+    assert fm.is_compressed("test_compressed.txt")
+    assert os.path.getsize(os.path.join(test_dir, "test_compressed.txt")) < len(content)
+    assert FileManager(test_dir).load_file("test_compressed.txt") == content
+    # Small and pre-existing plain files stay readable
+    fm.save_file("test_small.txt", "tiny")
+    assert not fm.is_compressed("test_small.txt")
+    assert fm.load_file("test_small.txt") == "tiny"
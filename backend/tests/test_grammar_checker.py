@@ -1,7 +1,9 @@
 import sys
 import os
+import asyncio
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
-from grammar_checker import GrammarChecker, check_grammar
+from file_manager import FileManager
+from grammar_checker import GrammarChecker, BatchGrammarChecker, check_grammar
 
 def test_grammar_checker_correction():
     grammar = GrammarChecker()
@@ -11,6 +13,54 @@ def test_grammar_checker_correction():
 
 def test_check_grammar_function():
     text = "Some text."
-    corrections = check_grammar(text)
-    assert isinstance(corrections, list)
-    assert corrections and "error" in corrections[0] and "suggestion" in corrections[0] 
\ No newline at end of file
+    assert check_grammar(text) == []
+    corrections = check_grammar("I could of gone.")
+    assert corrections[0]["original"] == "could of" and corrections[0]["suggestion"] == "could have"
+
+def test_rules_and_offsets():
+    grammar = GrammarChecker(max_sentence_words=10)
+    text = "Title\n\nThe the letter was written , by Ana,then Bo!!\n" + " ".join(f"word{i}" for i in range(12)) + "."
+    found = {c["rule"]: c for c in grammar.check(text)["corrections"]}
+    assert set(found) == {"repeated", "passive", "space_before", "no_space_after", "doubled", "long_sentence"}
+    for c in found.values():
+        assert text[c["offset"]:c["offset"] + c["length"]] == c["original"]
+    assert found["repeated"]["suggestion"] == "The"
+    assert found["long_sentence"]["offset"] == text.index("word0")
+
+def test_only_changed_paragraphs_are_rechecked():
+    grammar = GrammarChecker()
+    text = "First line is fine.\nSecond has has a repeat.\nThird is fine too."
+    assert grammar.check(text)["checked"] == 3
+    edited = text.replace("Third", "Third line")
+    result = grammar.check("New opening line.\n" + edited)
+    assert result["paragraphs"] == 4 and result["checked"] == 2
+    repeat = result["corrections"][0]
+    assert repeat["original"] == "has has"
+    assert repeat["offset"] == len("New opening line.\n") + text.index("has has")
+
+def test_batch_checks_notebook_in_process_pool(tmp_path):
+    fm = FileManager(str(tmp_path / "docs"))
+    for i in range(3):
+        fm.save_file(f"novel/ch{i}.txt", f"Chapter {i} has has a repeat.")
+    fm.save_file("loose.txt", "not in the notebook")
+    batch = BatchGrammarChecker(fm, workers=2)
+
+    async def run(names):
+        return [result async for result in batch.check_files(names)]
+
+    try:
+        names = batch.resolve(notebook="novel")
+        assert names == [os.path.join("novel", f"ch{i}.txt") for i in range(3)]
+        first = asyncio.run(run(names))
+        assert sorted(r["filename"] for r in first) == names
+        assert all(not r["cached"] and r["corrections"][0]["original"] == "has has" for r in first)
+
+        fm.save_file("novel/ch1.txt", "Chapter one is fine.")
+        second = {r["filename"]: r for r in asyncio.run(run(names))}
+        assert [second[name]["cached"] for name in names] == [True, False, True]
+        assert second[names[1]]["corrections"] == []
+        assert batch.stats()["pool_started"] == 1
+        assert asyncio.run(run(["novel/missing.txt"])) == [{"filename": "novel/missing.txt", "error": "File not found"}]
+    finally:
+        batch.shutdown()
+        fm.close()
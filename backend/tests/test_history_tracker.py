@@ -1,6 +1,8 @@
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import delta
+import history_tracker
 from history_tracker import HistoryTracker
 
 def test_log_and_get_history():
@@ -13,4 +15,46 @@ def test_log_and_get_history():
     assert hist[0]["filename"] == "file1.txt"
     assert hist[0]["content"] == "content1"
     assert hist[1]["filename"] == "file2.txt"
-    assert hist[1]["content"] == "content2" 
\ No newline at end of file
+    assert hist[1]["content"] == "content2" 
+
+def test_history_is_bounded_and_stored_as_deltas():
+    history = HistoryTracker(max_entries=20, keyframe_interval=5)
+    lines = [f"line {i}\n" for i in range(500)]
+    expected = []
+    for i in range(30):
+        lines[i] = f"edit {i}\n"
+        expected.append("".join(lines))
+        history.log("book.txt", expected[-1])
+    entries = history.get_history()
+    assert len(entries) == 20
+    assert [e["content"] for e in entries] == expected[-20:]
+    full = history._conn.execute("SELECT COUNT(*) FROM history WHERE base_id IS NULL").fetchone()[0]
+    assert full == 4
+
+def test_get_history_decodes_each_delta_once(monkeypatch):
+    history = HistoryTracker()
+    for i in range(40):
+        history.log("book.txt", "".join(f"line {j}\n" for j in range(i, i + 100)))
+        history.log("notes.txt", f"note {i}\n")
+    applied = []
+
+    def counting_apply(base, ops):
+        applied.append(ops)
+        return delta.apply_delta(base, ops)
+
+    monkeypatch.setattr(history_tracker, "apply_delta", counting_apply)
+    entries = history.get_history(filename="book.txt")
+    assert entries[5]["content"].startswith("line 5\n")
+    stored = history._conn.execute("SELECT COUNT(*) FROM history WHERE base_id IS NOT NULL AND filename = 'book.txt'").fetchone()[0]
+    assert stored > 30 and len(applied) == stored
+
+def test_history_filters_and_pages():
+    history = HistoryTracker()
+    for i in range(5):
+        history.log("a.txt", f"a{i}")
+        history.log("b.txt", f"b{i}")
+    page = history.get_history(filename="a.txt", limit=2, offset=1, newest_first=True)
+    assert [e["content"] for e in page] == ["a3", "a2"]
+    assert history.count(filename="b.txt") == 5
+    assert history.get_history(since=2**40) == []
+    history.close()
@@ -0,0 +1,26 @@
+import sys
+import os
+import asyncio
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from io_executor import IOExecutor
+
+def test_runs_off_loop_and_counts():
+    io = IOExecutor(max_workers=2)
+
+    def boom():
+        raise OSError("disk gone")
+
+    async def main():
+        results = await asyncio.gather(*(io.run(pow, 2, i) for i in range(5)))
+        with pytest.raises(OSError):
+            await io.run(boom)
+        return results
+
+    assert asyncio.run(main()) == [1, 2, 4, 8, 16]
+    stats = io.stats()
+    assert stats["completed"] == 5
+    assert stats["failed"] == 1
+    assert stats["queued"] == 0 and stats["active"] == 0
+    assert 1 <= stats["max_queued"] <= 6
+    io.shutdown()
@@ -0,0 +1,25 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from lru_cache import LRUCache
+
+def test_evicts_least_recently_used_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", "aaaa", 4)
+    cache.put("b", "bbbb", 4)
+    assert cache.get("a") == "aaaa"
+    cache.put("c", "cccc", 4)
+    assert "b" not in cache
+    assert cache.get("a") == "aaaa"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 8
+
+def test_validator_mismatch_is_a_miss():
+    cache = LRUCache()
+    cache.put("k", "v", 1, validator=(1, 1))
+    assert cache.get("k", validator=(1, 1)) == "v"
+    assert cache.get("k", validator=(2, 1)) is None
+    assert "k" not in cache
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
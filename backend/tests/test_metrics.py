@@ -0,0 +1,24 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from metrics import Counter, Histogram, REGISTRY, render
+
+def test_counter_and_histogram_render_prometheus_text():
+    counter = Counter("test_things_total", "Things.", ("kind",))
+    histogram = Histogram("test_wait_seconds", "Waits.", buckets=(0.1, 1.0))
+    try:
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        text = render()
+        assert "# TYPE test_things_total counter" in text
+        assert 'test_things_total{kind="a"} 3' in text
+        assert 'test_wait_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_wait_seconds_bucket{le="1.0"} 2' in text
+        assert 'test_wait_seconds_bucket{le="+Inf"} 3' in text
+        assert "test_wait_seconds_count 3" in text
+    finally:
+        REGISTRY.remove(counter)
+        REGISTRY.remove(histogram)
@@ -0,0 +1,70 @@
+import sys
+import os
+import json
+import asyncio
+import httpx
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import openrouter_client
+from mock_openrouter import MockConfig, create_app
+from openrouter_client import achat, astream_chat, OpenRouterError
+from bench_ai import percentile, summarize
+
+@pytest.fixture
+def mock(monkeypatch):
+    def use(**options):
+        config = MockConfig(latency="fixed:0", seed=1, **options)
+        monkeypatch.setattr(openrouter_client, "_transport", httpx.ASGITransport(app=create_app(config)))
+        return config
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "mock")
+    yield use
+    openrouter_client._async_clients.clear()
+
+def test_chat_and_stream_against_mock(mock):
+    config = mock(reply_words=12, stream_chunks=4)
+
+    async def main():
+        reply = await achat([{"role": "user", "content": "hello"}])
+        deltas = [d async for d in astream_chat([{"role": "user", "content": "hello"}])]
+        return reply, deltas
+
+    reply, deltas = asyncio.run(main())
+    assert len(reply.split()) == 12
+    assert len(deltas) == 4 and len("".join(deltas).split()) == 12
+    assert config.requests == 2
+
+def test_concept_map_reply_is_json(mock):
+    mock()
+    messages = [{"role": "system", "content": "Build a concept map."},
+                {"role": "user", "content": "Lighthouses guide sailors through storms"}]
+    reply = asyncio.run(achat(messages))
+    graph = json.loads(reply)
+    assert [n["title"] for n in graph["nodes"]] == ["Lighthouses", "Sailors", "Storms", "Through"]
+    assert len(graph["links"]) == 3
+
+def test_rate_limit_and_malformed(mock):
+    mock(rate_limit=1.0, retry_after=3)
+    with pytest.raises(OpenRouterError) as info:
+        asyncio.run(achat([{"role": "user", "content": "hi"}]))
+    assert info.value.status_code == 429 and info.value.retry_after == 3
+
+    mock(malformed=1.0)
+    with pytest.raises(OpenRouterError):
+        asyncio.run(achat([{"role": "user", "content": "hi"}]))
+
+def test_latency_distributions():
+    assert MockConfig(latency="fixed:0.2").delay() == 0.2
+    assert 0.1 <= MockConfig(latency="uniform:0.1:0.3", seed=1).delay() <= 0.3
+    assert MockConfig(latency="lognormal:0.5:0.1", seed=1).delay() > 0
+    with pytest.raises(ValueError):
+        MockConfig(latency="gamma:1").delay()
+
+def test_bench_percentiles():
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.5
+    assert percentile(values, 99) == 0.99
+    assert percentile([], 95) == 0.0
+    report = summarize("chat", values, [], {"429": 2}, 2.0)
+    assert report["requests"] == 102 and report["throughput_rps"] == 50.0
+    assert report["latency_ms"]["p95"] == 950.0
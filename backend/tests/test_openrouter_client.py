@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+import asyncio
+import httpx
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+import openrouter_client
+from openrouter_client import achat, chat, OpenRouterError
+
+@pytest.fixture
+def upstream(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content))
+        if seen[-1]["messages"][-1]["content"] == "fail":
+            return httpx.Response(429, json={"error": "rate limited"}, headers={"Retry-After": "7"})
+        return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": " hi "}}]})
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(openrouter_client, "_transport", httpx.MockTransport(handler))
+    monkeypatch.setattr(openrouter_client, "_sync_client", None)
+    yield seen
+    openrouter_client._async_clients.clear()
+
+def test_achat_reuses_one_pooled_client(upstream):
+    async def main():
+        replies = await asyncio.gather(*(achat([{"role": "user", "content": "hey"}]) for _ in range(3)))
+        assert len(openrouter_client._async_clients) == 1
+        await openrouter_client.aclose()
+        return replies
+
+    assert asyncio.run(main()) == ["hi", "hi", "hi"]
+    # The system prompt is injected ahead of the user's messages
+    assert upstream[0]["messages"][0]["role"] == "system"
+
+def test_sync_chat_and_errors(upstream):
+    assert chat([{"role": "user", "content": "hey"}]) == "hi"
+    with pytest.raises(OpenRouterError, match="429") as info:
+        chat([{"role": "user", "content": "fail"}])
+    assert (info.value.status_code, info.value.retry_after, info.value.retryable) == (429, 7.0, True)
+    with pytest.raises(OpenRouterError):
+        chat("not a list")
+
+def test_astream_chat_relays_deltas(monkeypatch):
+    body = (
+        ": OPENROUTER PROCESSING\n\n"
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+        "data: not json\n\n"
+        'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(openrouter_client, "_transport", httpx.MockTransport(handler))
+
+    async def main():
+        try:
+            return [delta async for delta in openrouter_client.astream_chat([{"role": "user", "content": "hi"}])]
+        finally:
+            await openrouter_client.aclose()
+
+    assert asyncio.run(main()) == ["Hel", "lo"]
@@ -0,0 +1,39 @@
+import sys
+import os
+import asyncio
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from pdf_export import PDFExporter, render_pdf, DEFAULT_OPTIONS
+
+def test_render_flows_long_text_across_pages():
+    data = render_pdf("A long paragraph that needs wrapping. " * 2000 + "\nnaïve — ünïcode", DEFAULT_OPTIONS)
+    assert data.startswith(b"%PDF")
+    assert data.count(b"/Type /Page\n") > 1
+
+def test_export_is_cached_by_content_and_options(tmp_path):
+    exporter = PDFExporter(str(tmp_path), workers=1)
+
+    async def run():
+        first, again = await asyncio.gather(exporter.export("hello"), exporter.export("hello"))
+        bigger = await exporter.export("hello", {"font_size": 20})
+        return first, again, bigger
+
+    first, again, bigger = asyncio.run(run())
+    assert first == again
+    assert bigger != first
+    assert len(os.listdir(tmp_path)) == 2
+    assert asyncio.run(exporter.export("hello")) == first
+    assert exporter.stats()["hits"] == 1
+    exporter.shutdown()
+
+def test_cache_is_size_bounded(tmp_path):
+    exporter = PDFExporter(str(tmp_path), max_bytes=1, workers=0)
+    paths = [asyncio.run(exporter.export(f"document {i}")) for i in range(3)]
+    assert os.listdir(tmp_path) == [os.path.basename(paths[-1])]
+
+def test_options_are_validated(tmp_path):
+    exporter = PDFExporter(str(tmp_path), workers=0)
+    assert exporter.options({"font_size": "14", "margin": 0})["font_size"] == 14
+    for bad in ("big", {"font_size": 0}, {"margin": -5}, {"line_height": "tall"}, {"font": "Comic"}, {"font_size": None}):
+        with pytest.raises(ValueError):
+            exporter.options(bad)
@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from file_manager import FileManager
+from search_index import SearchIndex
+
+def test_phrase_notebook_and_snippets(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.index_document(os.path.join("Physics", "a.txt"), "The quantum cat sat on the mat.")
+    index.index_document(os.path.join("Biology", "b.txt"), "A cat is a quantum of mammal.")
+    assert [r["path"] for r in index.search('"quantum cat"')] == [os.path.join("Physics", "a.txt")]
+    assert [r["path"] for r in index.search("cat", notebook="Biology")] == [os.path.join("Biology", "b.txt")]
+    # Root files are in every notebook, as in FileManager.list_files
+    index.index_document("loose.txt", "A loose cat.")
+    assert sorted(r["path"] for r in index.search("cat", notebook="Biology")) == [os.path.join("Biology", "b.txt"), "loose.txt"]
+    assert "<mark>cat</mark>" in index.search("cat")[0]["snippet"]
+    # Stray quotes are not FTS5 syntax errors
+    assert len(index.search('quant* "cat')) == 2
+    index.close()
+
+def test_follows_file_manager_and_syncs_after_restart(tmp_path):
+    docs = str(tmp_path / "docs")
+    db = str(tmp_path / "search.db")
+    fm = FileManager(docs)
+    index = SearchIndex(db)
+    fm.add_listener(index.handle_file_event)
+    fm.save_file(os.path.join("nb", "one.txt"), "dragons everywhere")
+    assert [r["path"] for r in index.search("dragons")] == [os.path.join("nb", "one.txt")]
+    fm.rename_file(os.path.join("nb", "one.txt"), os.path.join("nb", "two.txt"))
+    assert [r["path"] for r in index.search("dragons")] == [os.path.join("nb", "two.txt")]
+    index.close()
+
+    # Edited while no index was listening: a sync re-reads only that file
+    with open(os.path.join(docs, "nb", "two.txt"), "w", encoding="utf-8") as f:
+        f.write("wizards now")
+    index = SearchIndex(db)
+    assert index.sync(FileManager(docs)) == 1
+    assert index.search("dragons") == []
+    assert index.search("wizards")[0]["path"] == os.path.join("nb", "two.txt")
+    index.close()
@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+from spell_checker import SpellChecker, SpellIndex, edit_distance
+
+WORDS = "hello 50\nhell 5\nworld 40\nword 30\nspelling\nthere 90\ntheir 80\nthe 1000\nis\nfine\ncafé\n"
+
+def make(tmp_path, words=WORDS):
+    path = tmp_path / "words.txt"
+    path.write_text(words, encoding="utf-8")
+    return SpellChecker.open(str(path), str(tmp_path / "spell.idx"), user_db=str(tmp_path / "users.db")), path
+
+def test_index_membership_and_rebuild(tmp_path):
+    spell, path = make(tmp_path)
+    assert spell.known("Hello") and spell.known("café") and spell.known("world's")
+    assert not spell.known("helo")
+    index = SpellIndex(str(tmp_path / "spell.idx"))
+    assert len(index) == 11 and index.matches(str(path))
+    index.close()
+    spell.close()
+
+    # A changed word list is recompiled on the next start
+    time.sleep(0.01)
+    spell, _ = make(tmp_path, WORDS + "hobbit\n")
+    assert spell.known("hobbit")
+    spell.close()
+
+def test_suggestions_rank_by_distance_then_frequency(tmp_path):
+    spell, _ = make(tmp_path)
+    assert spell.suggest("helo")[:2] == ["hello", "hell"]
+    assert spell.suggest("Thier")[0] == "Their"
+    assert spell.suggest("wrold")[0] == "world"
+    assert spell.suggest("spleling") == ["spelling"]
+    assert edit_distance("abc", "acb", 2) == 1 and edit_distance("a", "abcd", 2) == 3
+    spell.close()
+
+def test_check_document_and_user_dictionary(tmp_path):
+    spell, _ = make(tmp_path)
+    text = "Hello wrold, the Frodo is fine. Frodo NASA a"
+    result = spell.check(text)
+    assert [(m["word"], m["offset"]) for m in result["misspellings"]] == [("wrold", 6), ("Frodo", 17), ("Frodo", 32)]
+    assert result["misspellings"][0]["suggestions"][0] == "world"
+
+    assert spell.add_words("ana", ["Frodo", "Baggins"]) == ["baggins", "frodo"]
+    assert [m["word"] for m in spell.check(text, user="ana")["misspellings"]] == ["wrold"]
+    assert spell.suggest("Frdo", user="ana") == ["Frodo"]
+    assert spell.check(text, user="bob")["misspellings"][1]["word"] == "Frodo"
+    assert spell.remove_words("ana", ["frodo"]) == ["baggins"]
+    spell.close()
+
+def test_unavailable_without_word_list(tmp_path):
+    spell = SpellChecker.open(str(tmp_path / "missing.txt"), str(tmp_path / "spell.idx"), user_db=":memory:")
+    assert not spell.available and spell.stats()["words"] == 0
+    spell.close()
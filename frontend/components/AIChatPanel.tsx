@@ -92,6 +92,7 @@ export default function AIChatPanel({
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [input, setInput] = useState("");
   const [sending, setSending] = useState(false);
+  const streamAbortRef = useRef<AbortController | null>(null);
   const [textareaHeight, setTextareaHeight] = useState(MIN_TEXTAREA_HEIGHT);
   const scrollRef = useRef<HTMLDivElement | null>(null);
   const panelRef = useRef<HTMLDivElement | null>(null);
@@ -188,6 +189,48 @@ export default function AIChatPanel({
     [handlePointerMove, stopResizing, open]
   );
 
+  // Reads the SSE stream from /api/ai/chat/stream, calling onDelta per token.
+  // Returns false when streaming is unavailable so the caller can fall back.
+  const streamReply = async (
+    history: { role: string; content: string }[],
+    onDelta: (delta: string) => void,
+    signal: AbortSignal
+  ) => {
+    const res = await fetch("http://localhost:8000/api/ai/chat/stream", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ messages: history }),
+      signal,
+    });
+    if (!res.ok || !res.body) return false;
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf("\n\n");
+      while (boundary !== -1) {
+        const event = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf("\n\n");
+        const type = event.match(/^event: (.*)$/m)?.[1] ?? "message";
+        const data = event.match(/^data: (.*)$/m)?.[1];
+        if (!data) continue;
+        const payload = JSON.parse(data);
+        if (type === "error") throw new Error(payload.detail || "Streaming failed");
+        if (type === "message" && payload.delta) onDelta(payload.delta);
+      }
+    }
+    return true;
+  };
+
+  // Stop paying for tokens nobody will see when the panel unmounts
+  useEffect(() => {
+    return () => streamAbortRef.current?.abort();
+  }, []);
+
   const sendMessage = async (content: string) => {
     if (!content.trim()) return;
     const userMsg: ChatMessage = {
@@ -198,16 +241,46 @@ export default function AIChatPanel({
     setMessages((prev) => [...prev, userMsg]);
     setInput("");
     setSending(true);
+    const history = [
+      ...messages,
+      { role: "user", content: content.trim() },
+    ].map((m) => ({ role: m.role, content: m.content }));
+    const assistantId = crypto.randomUUID();
+    let streamed = "";
+    const controller = new AbortController();
+    streamAbortRef.current = controller;
     try {
+      const ok = await streamReply(
+        history,
+        (delta) => {
+          streamed += delta;
+          const assistant: ChatMessage = { id: assistantId, role: "assistant", content: streamed };
+          setMessages((prev) =>
+            prev.some((m) => m.id === assistantId)
+              ? prev.map((m) => (m.id === assistantId ? assistant : m))
+              : [...prev, assistant]
+          );
+        },
+        controller.signal
+      ).catch((e) => {
+        // Fall back to the plain endpoint only if nothing was shown yet
+        if (streamed || controller.signal.aborted) throw e;
+        return false;
+      });
+      if (ok) {
+        if (!streamed) {
+          setMessages((prev) => [
+            ...prev,
+            { id: assistantId, role: "assistant", content: "(Empty response)" },
+          ]);
+        }
+        return;
+      }
       const res = await fetch("http://localhost:8000/api/ai/chat", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          messages: [
-            ...messages,
-            { role: "user", content: content.trim() },
-          ].map((m) => ({ role: m.role, content: m.content })),
-        }),
+        body: JSON.stringify({ messages: history }),
+        signal: controller.signal,
       });
       if (!res.ok) {
         const err = await res.json().catch(() => ({}));
@@ -215,12 +288,13 @@ export default function AIChatPanel({
       }
       const data = await res.json();
       const assistant: ChatMessage = {
-        id: crypto.randomUUID(),
+        id: assistantId,
         role: "assistant",
         content: data.reply || "(Empty response)",
       };
       setMessages((prev) => [...prev, assistant]);
     } catch (e: any) {
+      if (controller.signal.aborted) return;
       const assistant: ChatMessage = {
         id: crypto.randomUUID(),
         role: "assistant",
@@ -228,6 +302,7 @@ export default function AIChatPanel({
       };
       setMessages((prev) => [...prev, assistant]);
     } finally {
+      if (streamAbortRef.current === controller) streamAbortRef.current = null;
       setSending(false);
     }
   };
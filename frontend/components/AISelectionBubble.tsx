@@ -655,18 +655,38 @@ export function AISelectionBubble({ editor }: AISelectionBubbleProps) {
       const response = await fetch("http://localhost:8000/api/ai/concept-map", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ text: fullText }),
+        body: JSON.stringify({ text: fullText, stream: true }),
       });
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errBody = await response.json().catch(() => ({}));
         const detail = errBody.detail ?? `Request failed (${response.status})`;
         throw new Error(typeof detail === "string" ? detail : JSON.stringify(detail));
       }
-      const data = await response.json();
-      const nodes = data.nodes ?? [];
-      const links = data.links ?? [];
-      setConceptMapFromAI(fullText, nodes, links);
-      setUIState("hidden");
+      // NDJSON: each line is the graph so far, so the map fills in as the model replies
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let shown = false;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let newline = buffer.indexOf("\n");
+        while (newline !== -1) {
+          const line = buffer.slice(0, newline).trim();
+          buffer = buffer.slice(newline + 1);
+          newline = buffer.indexOf("\n");
+          if (!line) continue;
+          const data = JSON.parse(line);
+          if (data.error) throw new Error(data.error);
+          setConceptMapFromAI(fullText, data.nodes ?? [], data.links ?? []);
+          if (!shown) {
+            shown = true;
+            setUIState("hidden");
+          }
+        }
+      }
+      if (!shown) throw new Error("Failed to generate concept map.");
     } catch (error) {
       console.error("AI Concept Map error:", error);
       toast({